@@ -2,22 +2,35 @@
 
 import os  # <--- Ensure os is imported
 import datetime
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
-from flask_migrate import Migrate
-from werkzeug.security import generate_password_hash, check_password_hash
-from dotenv import load_dotenv
+from .hashing import PasswordHasher
+from .ratelimit import RateLimiter
+from .storage import Storage
+from .metrics import Metrics
+from .profiler import RequestProfiler
+from .assets import Assets
+from . import database
 
 # Globally initialize extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': database.RoutingSession})  # replica-aware, see database.py
 login_manager = LoginManager()
-migrate = Migrate()
+hasher = PasswordHasher()
+limiter = RateLimiter()
+storage = Storage()
+metrics = Metrics()
+profiler = RequestProfiler()
+assets = Assets()
 basedir = os.path.abspath(os.path.dirname(__file__))
-load_dotenv(os.path.join(basedir, '..', '.env'))
 
 
 def create_app():
+    # Read .env here rather than at import time, so importing the package has no side effects
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(basedir, '..', '.env'))
+
     app = Flask(__name__)
 
     # Configuration
@@ -33,21 +46,236 @@ def create_app():
 
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+    # Engine profile (see app/database.py). Server databases: a QueuePool per worker process.
+    app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 5))
+    app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    app.config['DB_POOL_TIMEOUT'] = int(os.environ.get('DB_POOL_TIMEOUT', 30))  # seconds to wait for a connection
+    app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # seconds
+    app.config['DB_POOL_PRE_PING'] = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    # SQLite: pragmas run on every new connection
+    app.config['SQLITE_JOURNAL_MODE'] = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    app.config['SQLITE_SYNCHRONOUS'] = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    app.config['SQLITE_MMAP_SIZE'] = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))  # bytes, 0 = off
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = database.engine_options(app.config)
+    # Read replicas (comma-separated URLs): reads of @replica_reads views are spread over them,
+    # except for clients that wrote within the sticky window (read-your-writes)
+    app.config['DATABASE_REPLICA_URLS'] = [
+        url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()
+    ]
+    app.config['DATABASE_REPLICA_STICKY_SECONDS'] = int(os.environ.get('DATABASE_REPLICA_STICKY_SECONDS', 5))
+    app.config['SQLALCHEMY_BINDS'] = database.replica_binds(app.config)
+
+    # ASGI entry point (asgi.py): async engine for the natively served endpoints
+    # (default: DATABASE_URL with an async driver) and the status long-poll cap in seconds
+    app.config['ASYNC_DATABASE_URL'] = os.environ.get('ASYNC_DATABASE_URL')
+    app.config['ASGI_STATUS_MAX_WAIT'] = float(os.environ.get('ASGI_STATUS_MAX_WAIT', 30))
+
+    # Password hashing: work factor (changing it rehashes users transparently at login)
+    # and a bounded process pool so PBKDF2 never runs on the request workers
+    app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 0))  # 0 = cores / WEB_CONCURRENCY
+    app.config['WEB_CONCURRENCY'] = int(os.environ.get('WEB_CONCURRENCY', 1))  # web worker processes (gunicorn reads it too)
+    app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get('PASSWORD_HASH_QUEUE', 8))  # waiting slots
+    app.config['PASSWORD_HASH_TIMEOUT'] = int(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))  # seconds
+
+    # Login / password-reset rate limits ("attempts/seconds"), per client IP and per email.
+    # RATELIMIT_STORAGE_URL=redis://... shares the buckets between workers and nodes.
+    app.config['RATELIMIT_LOGIN_PER_IP'] = os.environ.get('RATELIMIT_LOGIN_PER_IP', '20/60')
+    app.config['RATELIMIT_LOGIN_PER_EMAIL'] = os.environ.get('RATELIMIT_LOGIN_PER_EMAIL', '5/60')
+    app.config['RATELIMIT_RESET_PER_IP'] = os.environ.get('RATELIMIT_RESET_PER_IP', '5/300')
+    app.config['RATELIMIT_RESET_PER_EMAIL'] = os.environ.get('RATELIMIT_RESET_PER_EMAIL', '3/900')
+    app.config['RATELIMIT_STORAGE_URL'] = os.environ.get('RATELIMIT_STORAGE_URL')
+    app.config['RATELIMIT_MAX_KEYS'] = int(os.environ.get('RATELIMIT_MAX_KEYS', 100000))  # in-memory buckets
+    # Number of trusted reverse proxies in front of the app (so remote_addr is the real client)
+    app.config['PROXY_FIX_HOPS'] = int(os.environ.get('PROXY_FIX_HOPS', 0))
+
+    # user_loader cache (seconds / entries); invalidated on profile updates and password resets
+    app.config['USER_CACHE_TTL'] = int(os.environ.get('USER_CACHE_TTL', 30))
+    app.config['USER_CACHE_SIZE'] = int(os.environ.get('USER_CACHE_SIZE', 10000))
+
+    # Background threads that resize/encode uploaded avatars into their size variants
+    app.config['AVATAR_WORKERS'] = int(os.environ.get('AVATAR_WORKERS', 2))
+    app.config['AVATAR_MAX_BYTES'] = int(os.environ.get('AVATAR_MAX_BYTES', 5 * 1024 * 1024))  # per upload
+    app.config['AVATAR_MAX_PIXELS'] = int(os.environ.get('AVATAR_MAX_PIXELS', 40_000_000))  # decompression-bomb guard
+    # Unreferenced avatar files are deleted once older than the grace period (seconds);
+    # a pass runs after an avatar swap at most once per interval (0 = only via 'flask gc-avatars')
+    app.config['AVATAR_GC_GRACE'] = int(os.environ.get('AVATAR_GC_GRACE', 86400))
+    app.config['AVATAR_GC_INTERVAL'] = int(os.environ.get('AVATAR_GC_INTERVAL', 3600))
+
+    # Downloader: all yt-dlp jobs share one supervisor event loop
+    app.config['DOWNLOAD_MAX_CONCURRENT'] = int(os.environ.get('DOWNLOAD_MAX_CONCURRENT', 4))
+    app.config['DOWNLOAD_TIMEOUT'] = int(os.environ.get('DOWNLOAD_TIMEOUT', 3600))  # seconds per job
+    app.config['DOWNLOAD_CONCURRENT_FRAGMENTS'] = int(os.environ.get('DOWNLOAD_CONCURRENT_FRAGMENTS', 4))
+    app.config['DOWNLOAD_BATCH_MAX_ITEMS'] = int(os.environ.get('DOWNLOAD_BATCH_MAX_ITEMS', 200))
+    # Re-queue downloads interrupted by a crash/restart (see downloader.resume_incomplete_jobs);
+    # runs in the background on a worker's first request, not during boot
+    app.config['DOWNLOAD_RESUME_ON_STARTUP'] = os.environ.get('DOWNLOAD_RESUME_ON_STARTUP', 'true').lower() == 'true'
+    # Journaled jobs are leased to their worker, which renews the lease every third of this
+    # period (seconds); a job whose lease runs out is re-queued by another worker
+    app.config['DOWNLOAD_LEASE_SECONDS'] = int(os.environ.get('DOWNLOAD_LEASE_SECONDS', 90))
+    # Toolchain: explicit locations (optional, else PATH) and in-process yt_dlp probes
+    app.config['FFMPEG_LOCATION'] = os.environ.get('FFMPEG_LOCATION')  # directory or full path to ffmpeg
+    app.config['YTDLP_PATH'] = os.environ.get('YTDLP_PATH')
+    # In-process probes save an interpreter start per probe but have no overall timeout
+    # (only per-read socket timeouts); off = '--dump-json' subprocess killed after 120s
+    app.config['YTDLP_API_MODE'] = os.environ.get('YTDLP_API_MODE', 'false').lower() == 'true'
+    # Concurrent ffmpeg merges/transcodes per worker process (0 = one per CPU core), run at lowered priority
+    app.config['POSTPROCESS_WORKERS'] = int(os.environ.get('POSTPROCESS_WORKERS', 0))
+    app.config['POSTPROCESS_NICE'] = int(os.environ.get('POSTPROCESS_NICE', 10))
+
+    # File storage: empty = local disk (single node); 's3://bucket/prefix' = S3-compatible
+    # object storage shared by all nodes (requires boto3; S3_ENDPOINT_URL for MinIO etc.)
+    app.config['AVATAR_STORAGE_URL'] = os.environ.get('AVATAR_STORAGE_URL', '')
+    app.config['DOWNLOAD_STORAGE_URL'] = os.environ.get('DOWNLOAD_STORAGE_URL', '')
+    app.config['S3_ENDPOINT_URL'] = os.environ.get('S3_ENDPOINT_URL')
+    app.config['S3_MULTIPART_CHUNK_MB'] = int(os.environ.get('S3_MULTIPART_CHUNK_MB', 8))
+    # Public (CDN) base URL for the avatar bucket; required when AVATAR_STORAGE_URL is s3://
+    app.config['AVATAR_PUBLIC_URL'] = os.environ.get('AVATAR_PUBLIC_URL')
+    app.config['STORAGE_PRESIGN_EXPIRES'] = int(os.environ.get('STORAGE_PRESIGN_EXPIRES', 3600))  # seconds
+
+    # JSON API (/api/v1): page sizes, batch-GET cap and bearer token lifetime (seconds)
+    app.config['API_PAGE_SIZE'] = int(os.environ.get('API_PAGE_SIZE', 50))
+    app.config['API_MAX_PAGE_SIZE'] = int(os.environ.get('API_MAX_PAGE_SIZE', 200))
+    app.config['API_MAX_IDS'] = int(os.environ.get('API_MAX_IDS', 100))
+    app.config['API_TOKEN_MAX_AGE'] = int(os.environ.get('API_TOKEN_MAX_AGE', 30 * 86400))
+    # Exports (/api/v1/<resource>/export) are streamed; rows fetched per server-side cursor batch
+    app.config['EXPORT_BATCH_SIZE'] = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+    # Bulk imports ('flask import', POST /api/v1/<resource>/import): rows per INSERT, batches per
+    # transaction, invalid rows listed in the report, and the upload size cap in bytes
+    app.config['IMPORT_BATCH_SIZE'] = int(os.environ.get('IMPORT_BATCH_SIZE', 1000))
+    app.config['IMPORT_TRANSACTION_BATCHES'] = int(os.environ.get('IMPORT_TRANSACTION_BATCHES', 10))
+    app.config['IMPORT_MAX_ERRORS'] = int(os.environ.get('IMPORT_MAX_ERRORS', 100))
+    app.config['IMPORT_MAX_BYTES'] = int(os.environ.get('IMPORT_MAX_BYTES', 256 * 1024 * 1024))
+
+    # Request/SQL instrumentation exposed in Prometheus format at /metrics. The endpoint is never
+    # public: scrapes need 'Authorization: Bearer <METRICS_TOKEN>' (or a logged-in admin)
+    app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+
+    # Operators (profiler access); comma-separated emails
+    app.config['ADMIN_EMAILS'] = {
+        email.strip().lower() for email in os.environ.get('ADMIN_EMAILS', '').split(',') if email.strip()
+    }
+    # Opt-in request profiling: 'sampling' (collapsed stacks per endpoint) or 'cprofile' (.prof per request).
+    # Profiles requests carrying PROFILER_HEADER from an admin, plus a random PROFILER_SAMPLE_RATE fraction.
+    app.config['PROFILER_ENABLED'] = os.environ.get('PROFILER_ENABLED', 'false').lower() == 'true'
+    # cprofile traces one request per process at a time; concurrent requests go unprofiled
+    app.config['PROFILER_MODE'] = os.environ.get('PROFILER_MODE', 'sampling')
+    app.config['PROFILER_SAMPLE_RATE'] = float(os.environ.get('PROFILER_SAMPLE_RATE', 0.0))
+    app.config['PROFILER_INTERVAL'] = float(os.environ.get('PROFILER_INTERVAL', 0.005))  # seconds between samples
+    app.config['PROFILER_HEADER'] = os.environ.get('PROFILER_HEADER', 'X-Profile')
+    app.config['PROFILER_DIR'] = os.environ.get('PROFILER_DIR')  # default: instance/profiles
+
+    # Static assets (see app/assets.py): content-hashed URLs cached as immutable, served
+    # precompressed (brotli needs the optional 'brotli' package, else gzip)
+    app.config['ASSETS_FINGERPRINT'] = os.environ.get('ASSETS_FINGERPRINT', 'true').lower() == 'true'
+    # On-the-fly compression of HTML/JSON/text responses (disable if the proxy compresses)
+    app.config['COMPRESS_RESPONSES'] = os.environ.get('COMPRESS_RESPONSES', 'true').lower() == 'true'
+    app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))  # bytes
+    app.config['COMPRESS_LEVEL'] = int(os.environ.get('COMPRESS_LEVEL', 6))  # gzip 1-9
+
+    # Jinja: compiled templates cached on disk and shared by all workers (default: instance/jinja-cache),
+    # and every template loaded at boot so no request pays for a compile after a deploy
+    app.config['TEMPLATE_BYTECODE_CACHE'] = os.environ.get('TEMPLATE_BYTECODE_CACHE', 'true').lower() == 'true'
+    app.config['TEMPLATE_CACHE_DIR'] = os.environ.get('TEMPLATE_CACHE_DIR')
+    app.config['TEMPLATE_WARMUP'] = os.environ.get('TEMPLATE_WARMUP', 'true').lower() == 'true'
+
+    if app.config['PROXY_FIX_HOPS']:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        hops = app.config['PROXY_FIX_HOPS']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops, x_host=hops)
+
     # --- RESTORED: Initialize extensions with the app ---
     db.init_app(app)
+    database.init_app(app, db)
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
-    migrate.init_app(app, db)
+    # Alembic is only needed by the 'flask db' commands; importing it costs every worker ~0.2s at boot
+    if click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+    hasher.init_app(app)
+    limiter.init_app(app)
+    user_cache.init_app(app)
+    storage.init_app(app)
+    metrics.init_app(app)
+    profiler.init_app(app)
+    assets.init_app(app)  # after metrics, so response sizes are the compressed ones
     # --- END RESTORED ---
 
-    # --- Database Initialization ---
-    from . import models
-    with app.app_context():
-        # NOTE: db.create_all() only creates tables if they don't exist.
-        # For a new PostgreSQL DB, this will create your tables.
-        db.create_all()
+    # ffmpeg and yt-dlp are located/version-checked on first use, not at boot (see toolchain.get)
+    from . import toolchain
+    toolchain.init_app(app)
+
+    # --- Database ---
+    # The schema is managed by migrations only ('flask adopt-schema && flask db upgrade' once
+    # per deploy, see procfile); workers never create tables, so concurrent boots cannot race on DDL.
+
+    # Template helper for responsive avatar <picture> markup
+    from .utils import avatar_sources, avatar_cache_headers, collect_unreferenced_avatars
+    app.jinja_env.globals['avatar_sources'] = avatar_sources
+    # Content-hashed avatar files are served as immutable
+    app.after_request(avatar_cache_headers)
+
+    @app.cli.command('adopt-schema')
+    def adopt_schema_command():
+        """Stamp a database created by db.create_all() (no migration history) so 'flask db upgrade' works."""
+        from flask_migrate import stamp
+
+        revision = database.unversioned_schema_revision(db.engine)
+        if revision is None:
+            click.echo('Nothing to adopt: the database is empty or already under migrations.')
+            return
+        stamp(revision=revision)
+        click.echo(f"Stamped the existing schema at {revision}; 'flask db upgrade' applies the rest.")
 
-        # --- Register Blueprints (MUST BE LAST) ---
+    @app.cli.command('gc-avatars')
+    @click.option('--grace', type=int, default=None, help='Minimum file age in seconds (default: AVATAR_GC_GRACE).')
+    def gc_avatars_command(grace):
+        """Delete profile picture files that no user references."""
+        removed = collect_unreferenced_avatars(app, grace)
+        click.echo(f"Removed {removed} unreferenced avatar files.")
+
+    @app.cli.command('import')
+    @click.argument('resource', type=click.Choice(['posts', 'tasks', 'links']))
+    @click.argument('file', type=click.File('rb'))
+    @click.option('--user', 'owner', required=True, help='Email or username of the user who will own the rows.')
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), default=None,
+                  help='File format (default: from the file extension).')
+    @click.option('--batch-size', type=int, default=None, help='Rows per INSERT (default: IMPORT_BATCH_SIZE).')
+    @click.option('--transaction-batches', type=int, default=None,
+                  help='Batches per transaction (default: IMPORT_TRANSACTION_BATCHES).')
+    def import_command(resource, file, owner, fmt, batch_size, transaction_batches):
+        """Bulk-import posts, tasks or links from a CSV or NDJSON file ('-' reads stdin)."""
+        from .importer import import_rows, detect_format, ImportFormatError
+
+        fmt = fmt or detect_format(filename=file.name)
+        if fmt is None:
+            raise click.UsageError('Cannot tell the format from the file name; pass --format.')
+        user = User.query.filter((User.email == owner.strip().lower()) | (User.username == owner.strip())).first()
+        if user is None:
+            raise click.UsageError(f"No user with email or username '{owner}'.")
+
+        last_echo = [0.0]
+
+        def progress(report, seconds):
+            if seconds - last_echo[0] >= 5:  # Called after every commit; print every few seconds
+                last_echo[0] = seconds
+                click.echo(f"  {report['inserted']} rows imported ({report['inserted'] / seconds:.0f} rows/s)",
+                           err=True)
+
+        try:
+            report = import_rows(resource, file, fmt, user.id,
+                                 batch_size or app.config['IMPORT_BATCH_SIZE'],
+                                 transaction_batches or app.config['IMPORT_TRANSACTION_BATCHES'],
+                                 app.config['IMPORT_MAX_ERRORS'], progress)
+        except ImportFormatError as e:
+            raise click.ClickException(str(e))
+        for error in report['errors']:
+            click.echo(f"  line {error['line']}: {error['message']}", err=True)
+        click.echo(f"Imported {report['inserted']} {resource} for {user.username} ({report['rejected']} rejected) "
+                   f"in {report['seconds']} s, {report['rows_per_sec']} rows/s.")
 
     # 1. Import all blueprints
     from .blueprints.main.routes import main as main_bp
@@ -56,6 +284,7 @@ def create_app():
     from .blueprints.tasks.routes import tasks as tasks_bp
     from .blueprints.shortener.routes import short as shortener_bp
     from .blueprints.downloader.routes import downloader as downloader_bp
+    from .blueprints.api.routes import api as api_bp
 
     # 2. Register all blueprints (Only once for each)
     app.register_blueprint(main_bp)
@@ -64,14 +293,21 @@ def create_app():
     app.register_blueprint(tasks_bp, url_prefix='/tasks')
     app.register_blueprint(shortener_bp, url_prefix='/links')
     app.register_blueprint(downloader_bp, url_prefix='/downloader')
+    app.register_blueprint(api_bp, url_prefix='/api/v1')
+
+    # Templates: bytecode cache, render metrics and warm-up (skipped for CLI commands)
+    from . import templating
+    templating.init_app(app, warm=click.get_current_context(silent=True) is None)
 
     return app
 
 
 # User Loader (CRITICAL: Must be able to access the User model)
 from .models import User
+from .user_cache import user_cache, load_cached_user
 
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
\ No newline at end of file
+    # Served from the short-TTL user cache when possible (no SELECT per request)
+    return load_cached_user(int(user_id))
\ No newline at end of file
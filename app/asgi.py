@@ -0,0 +1,211 @@
+# asgi.py
+
+import os
+import json
+import time
+import asyncio
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qsl
+
+from itsdangerous import BadSignature
+from sqlalchemy import select, update
+from werkzeug.exceptions import HTTPException
+from werkzeug.routing import RequestRedirect
+from werkzeug.urls import iri_to_uri
+
+from app import db, metrics, database
+from app.models import ShortLink
+from app.toolchain import probe_async, ProbeError, ProbeTimeout
+from app.blueprints.downloader.routes import (
+    download_tasks, task_status_payload, build_download_options, probe_arguments
+)
+
+# Async drivers used when ASYNC_DATABASE_URL is not set
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg', 'mysql': 'mysql+aiomysql'}
+STATUS_POLL_INTERVAL = 0.25  # seconds between checks of a long-polled download task
+
+
+def async_database_url(app):
+    """ASYNC_DATABASE_URL, or the primary's URL (as resolved by Flask-SQLAlchemy) with an async driver."""
+    if app.config['ASYNC_DATABASE_URL']:
+        return app.config['ASYNC_DATABASE_URL']
+    with app.app_context():
+        url = db.engine.url
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None:
+        raise RuntimeError(f"No async driver known for '{url.get_backend_name()}'; set ASYNC_DATABASE_URL.")
+    return url.set(drivername=driver)
+
+
+class AsyncApp:
+    """
+    ASGI application (see asgi.py at the project root). The endpoints whose cost is
+    waiting rather than computing are served natively on the event loop:
+
+    - shortener.redirect_to_url   async SQLAlchemy engine
+    - downloader.download_status  optional long-poll (?wait=<seconds>)
+    - downloader.probe_options    yt-dlp probe awaited as a subprocess
+
+    Everything else (and any request those cannot answer on their own, such as an
+    unknown short code or a client without a session) is handed to the Flask app
+    through asgiref's WSGI adapter, so both modes serve identical URLs. Requests served
+    natively skip Flask's request hooks (rate limiting, profiling, replica routing);
+    they are still recorded in the request metrics.
+
+    Requires the optional packages asgiref, an ASGI server (uvicorn) and an async
+    database driver (aiosqlite / asyncpg).
+    """
+
+    def __init__(self, flask_app):
+        from asgiref.wsgi import WsgiToAsgi
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.handlers = {
+            'shortener.redirect_to_url': self.redirect_to_url,
+            'downloader.download_status': self.download_status,
+            'downloader.probe_options': self.probe_options,
+        }
+
+        config = flask_app.config
+        self.engine = create_async_engine(async_database_url(flask_app), **database.engine_options(config))
+        database.configure_engine(self.engine.sync_engine, config)
+
+    # ------------------------------------------------------
+    # 1. ASGI PROTOCOL
+    # ------------------------------------------------------
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+
+        adapter = self._url_adapter(scope)
+        try:
+            endpoint, view_args = adapter.match(scope['path'], method=scope['method'])
+        except (HTTPException, RequestRedirect):
+            endpoint = None  # 404/405/redirects are rendered by Flask
+        handler = self.handlers.get(endpoint)
+        if handler is None:
+            return await self.wsgi(scope, receive, send)
+
+        start = time.perf_counter()
+        if metrics.enabled:
+            metrics.in_flight.inc()
+        try:
+            response = await handler(scope, adapter, **view_args)
+        finally:
+            if metrics.enabled:
+                metrics.in_flight.dec()
+        if response is None:
+            return await self.wsgi(scope, receive, send)
+
+        status, headers, body = response
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': headers + [(b'content-length', str(len(body)).encode())]})
+        await send({'type': 'http.response.body', 'body': body})
+        if metrics.enabled:
+            metrics.requests.observe(time.perf_counter() - start, endpoint, scope['method'], status)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    # --- Helpers ---
+
+    def _url_adapter(self, scope):
+        host = dict(scope['headers']).get(b'host', b'localhost').decode('latin-1')
+        return self.flask_app.url_map.bind(host, script_name=scope.get('root_path') or None,
+                                           url_scheme=scope.get('scheme', 'http'))
+
+    def _session_user_id(self, scope):
+        """The Flask-Login user id from the signed session cookie, or None."""
+        cookie_header = b'; '.join(value for name, value in scope['headers'] if name == b'cookie')
+        morsel = SimpleCookie(cookie_header.decode('latin-1')).get(self.flask_app.config['SESSION_COOKIE_NAME'])
+        if morsel is None:
+            return None
+        serializer = self.flask_app.session_interface.get_signing_serializer(self.flask_app)
+        try:
+            session = serializer.loads(
+                morsel.value, max_age=int(self.flask_app.permanent_session_lifetime.total_seconds()))
+        except BadSignature:
+            return None
+        user_id = session.get('_user_id')
+        return int(user_id) if user_id is not None else None
+
+    @staticmethod
+    def _query(scope):
+        return dict(parse_qsl(scope['query_string'].decode('latin-1')))
+
+    @staticmethod
+    def _json(status, payload):
+        return status, [(b'content-type', b'application/json')], json.dumps(payload).encode()
+
+    # ------------------------------------------------------
+    # 2. ASYNC ENDPOINTS (None = let Flask answer)
+    # ------------------------------------------------------
+
+    async def redirect_to_url(self, scope, adapter, code):
+        async with self.engine.begin() as conn:
+            link = (await conn.execute(
+                select(ShortLink.id, ShortLink.url).where(ShortLink.short_url == code)
+            )).first()
+            if link is None:
+                return None  # Flask flashes the error and redirects home
+            await conn.execute(update(ShortLink).where(ShortLink.id == link.id)
+                               .values(clicks=ShortLink.clicks + 1))
+        return 302, [(b'location', iri_to_uri(link.url).encode('latin-1'))], b''
+
+    async def download_status(self, scope, adapter, task_key):
+        user_id = self._session_user_id(scope)
+        if user_id is None:
+            return None  # Remember-me cookie or login redirect: Flask-Login handles it
+
+        task = download_tasks.get(task_key)
+        if not task or not task_key.endswith(f"_{user_id}"):
+            return self._json(404, {'status': 'not_found', 'message': 'Task not found or unauthorized.'})
+
+        # Long-poll: hold the connection (not a worker) until the task changes or the wait ends
+        try:
+            wait = min(max(float(self._query(scope).get('wait', 0)), 0),
+                       self.flask_app.config['ASGI_STATUS_MAX_WAIT'])
+        except ValueError:
+            wait = 0
+        seen = (task['status'], task['progress'])
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline and (task['status'], task['progress']) == seen:
+            await asyncio.sleep(STATUS_POLL_INTERVAL)
+
+        return self._json(200, task_status_payload(
+            task_key, task, lambda endpoint, **values: adapter.build(endpoint, values)))
+
+    async def probe_options(self, scope, adapter):
+        user_id = self._session_user_id(scope)
+        if user_id is None:
+            return None
+
+        try:
+            url, profile_key = probe_arguments(self._query(scope))
+        except ValueError as e:
+            return self._json(400, {'status': 'error', 'message': str(e)})
+
+        cookies_path = os.path.join(self.flask_app.instance_path, 'cookies.txt')
+        try:
+            data = await probe_async(self.flask_app, url, cookies_path, timeout=120)
+        except ProbeTimeout:
+            return self._json(504, {'status': 'error', 'message': 'Timed out fetching video data.'})
+        except ProbeError as e:
+            self.flask_app.logger.error(f"yt-dlp probe error: {e}")
+            return self._json(502, {'status': 'error', 'message': 'Error fetching video data. Check URL.'})
+
+        title, options = build_download_options(
+            data, url, profile_key, user_id, lambda endpoint, **values: adapter.build(endpoint, values))
+        return self._json(200, {'status': 'ok', 'title': title, 'options': options})
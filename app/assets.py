@@ -0,0 +1,183 @@
+# assets.py
+
+import os
+import re
+import gzip
+import hashlib
+import mimetypes
+import threading
+from flask import request, current_app
+
+ASSET_DIRS = ('css', 'js')  # under the static folder; profile_pics are content-addressed already
+DIGEST_LENGTH = 12
+FINGERPRINT_RE = re.compile(r'^(?P<root>.+)\.(?P<digest>[0-9a-f]{%d})(?P<ext>\.[^./]+)$' % DIGEST_LENGTH)
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/plain', 'text/css', 'text/csv', 'text/javascript', 'application/javascript',
+    'application/json', 'application/x-ndjson', 'application/xml', 'image/svg+xml',
+}
+DYNAMIC_BROTLI_QUALITY = 4  # on-the-fly: roughly gzip's speed at a smaller size
+
+
+def _brotli():
+    try:
+        import brotli  # Optional dependency; without it only gzip is offered
+    except ImportError:
+        return None
+    return brotli
+
+
+def _accepted(encodings):
+    """The first of `encodings` the client accepts (q > 0), else 'identity'."""
+    for encoding in encodings:
+        if request.accept_encodings[encoding]:
+            return encoding
+    return 'identity'
+
+
+class Asset:
+    """One static file: its content hash and its identity/gzip/brotli bodies (compressed on first use)."""
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = os.stat(path).st_mtime
+        with open(path, 'rb') as f:
+            data = f.read()
+        self.digest = hashlib.sha256(data).hexdigest()[:DIGEST_LENGTH]
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.bodies = {'identity': data}
+
+    def body(self, encoding):
+        """The body for `encoding`, or None when that encoding would not make it smaller."""
+        if encoding not in self.bodies:
+            data = self.bodies['identity']
+            if encoding == 'br':
+                compressed = _brotli().compress(data, quality=11)
+            else:
+                compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            self.bodies[encoding] = compressed if len(compressed) < len(data) else None
+        return self.bodies[encoding]
+
+
+class Assets:
+    """
+    Build-free static asset pipeline.
+
+    - url_for('static', filename='css/style.css') yields 'css/style.<hash>.css'; a URL
+      whose hash matches the current content is served as immutable for a year, so a
+      deploy changes the URL instead of relying on revalidation.
+    - Assets are served from memory, precompressed once per worker with brotli (if the
+      optional 'brotli' package is installed) or gzip, per the client's Accept-Encoding.
+    - HTML/JSON/text responses of at least COMPRESS_MIN_SIZE bytes are compressed on the
+      fly. Streamed and file responses (exports, downloads) are passed through untouched.
+    """
+
+    def __init__(self):
+        self._manifest = None  # { 'css/style.css': Asset }
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.extensions['assets'] = self
+        self.static_folder = app.static_folder
+        self.reload = app.debug  # re-hash edited files during development
+        self.min_size = app.config['COMPRESS_MIN_SIZE']
+        self.level = app.config['COMPRESS_LEVEL']
+
+        app.view_functions['static'] = self.static_view
+        if app.config['ASSETS_FINGERPRINT']:
+            app.url_defaults(self._fingerprint_url)
+        if app.config['COMPRESS_RESPONSES']:
+            app.after_request(self._compress_response)
+
+    # --- Manifest ---
+
+    def _load_manifest(self):
+        with self._lock:
+            if self._manifest is not None:
+                return
+            manifest = {}
+            for directory in ASSET_DIRS:
+                top = os.path.join(self.static_folder, directory)
+                for root, _, files in os.walk(top):
+                    for name in files:
+                        path = os.path.join(root, name)
+                        manifest[os.path.relpath(path, self.static_folder).replace(os.sep, '/')] = Asset(path)
+            self._manifest = manifest
+
+    def asset(self, filename):
+        """The Asset for a static filename, or None if it is not part of the pipeline."""
+        if self._manifest is None:
+            self._load_manifest()
+        asset = self._manifest.get(filename)
+        if asset is not None and self.reload and os.stat(asset.path).st_mtime != asset.mtime:
+            asset = self._manifest[filename] = Asset(asset.path)
+        return asset
+
+    def _fingerprint_url(self, endpoint, values):
+        """url_defaults hook: static asset URLs carry their content hash."""
+        if endpoint != 'static' or 'filename' not in values:
+            return
+        asset = self.asset(values['filename'])
+        if asset is not None:
+            root, ext = os.path.splitext(values['filename'])
+            values['filename'] = f"{root}.{asset.digest}{ext}"
+
+    # --- Serving ---
+
+    def static_view(self, filename):
+        """Replaces Flask's static view; files outside the pipeline are served as before."""
+        immutable = False
+        match = FINGERPRINT_RE.match(filename)
+        if match:
+            asset = self.asset(match['root'] + match['ext'])
+            # A stale hash (page cached across a deploy) still gets the current file, just not cached
+            immutable = asset is not None and asset.digest == match['digest']
+        else:
+            asset = self.asset(filename)
+        if asset is None:
+            return current_app.send_static_file(filename)
+
+        encodings = ('br', 'gzip') if _brotli() else ('gzip',)
+        encoding = _accepted(e for e in encodings if asset.body(e) is not None)
+        response = current_app.response_class(asset.body(encoding), mimetype=asset.mimetype)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        response.set_etag(f"{asset.digest}-{encoding}")
+        response.cache_control.public = True
+        if immutable:
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+    def _compress_response(self, response):
+        """after_request hook: compresses buffered text responses the client accepts compressed."""
+        if (response.direct_passthrough or response.is_streamed
+                or response.mimetype not in COMPRESSIBLE_TYPES
+                or 'Content-Encoding' in response.headers
+                or response.status_code < 200 or response.status_code in (204, 206, 304)):
+            return response
+        response.vary.add('Accept-Encoding')
+        if response.content_length is not None and response.content_length < self.min_size:
+            return response
+
+        encoding = _accepted(('br', 'gzip') if _brotli() else ('gzip',))
+        if encoding == 'identity':
+            return response
+        data = response.get_data()
+        if encoding == 'br':
+            compressed = _brotli().compress(data, quality=DYNAMIC_BROTLI_QUALITY)
+        else:
+            compressed = gzip.compress(data, compresslevel=self.level)
+        if len(compressed) >= len(data):
+            return response
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f"{etag}-{encoding}", weak)
+        return response
@@ -0,0 +1,342 @@
+#api/routes.py
+
+import io
+import csv
+import json
+import base64
+import binascii
+import datetime
+from flask import Blueprint, request, g, current_app, stream_with_context
+from flask_login import current_user
+from sqlalchemy import select
+from werkzeug.exceptions import RequestEntityTooLarge
+from app import db, limiter
+from app.database import replica_reads
+from app.hashing import HashingBusy
+from app.importer import import_rows, detect_format, ImportFormatError
+from app.models import User, Post, Task, ShortLink
+
+try:
+    import orjson  # Optional dependency: faster, compact serialization with native datetimes
+except ImportError:
+    orjson = None
+
+# Versioned JSON API; url_prefix='/api/v1' is set on registration in __init__.py
+api = Blueprint('api', __name__)
+
+# Exposed resources: selectable fields (sparse fieldsets pick a subset), joins needed by
+# some fields, and whether rows are scoped to the authenticated user. 'id' drives the cursor.
+RESOURCES = {
+    'posts': {
+        'model': Post,
+        'owned': False,  # The blog is public
+        'fields': {
+            'id': Post.id, 'title': Post.title, 'content': Post.content,
+            'date_posted': Post.date_posted, 'user_id': Post.user_id, 'author': User.username,
+        },
+        'joins': {'author': (User, User.id == Post.user_id)},
+    },
+    'tasks': {
+        'model': Task,
+        'owned': True,
+        'fields': {
+            'id': Task.id, 'title': Task.title, 'content': Task.content,
+            'completed': Task.completed, 'date_posted': Task.date_posted,
+        },
+    },
+    'links': {
+        'model': ShortLink,
+        'owned': True,
+        'fields': {
+            'id': ShortLink.id, 'url': ShortLink.url, 'short_url': ShortLink.short_url,
+            'clicks': ShortLink.clicks, 'date_created': ShortLink.date_created,
+        },
+    },
+}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status, self.message, self.headers = status, message, headers
+
+
+# ----------------------------------------------------
+# 1. SERIALIZATION / ERRORS
+# ----------------------------------------------------
+
+def _json_default(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def api_response(payload, status=200, headers=None):
+    """Compact JSON (orjson when installed); datetimes are ISO 8601 either way."""
+    if orjson is not None:
+        body = orjson.dumps(payload)
+    else:
+        body = json.dumps(payload, separators=(',', ':'), default=_json_default)
+    return current_app.response_class(body, status=status, headers=headers, mimetype='application/json')
+
+
+@api.errorhandler(ApiError)
+def handle_api_error(error):
+    return api_response({'status': 'error', 'message': error.message}, error.status, error.headers)
+
+
+@api.errorhandler(RequestEntityTooLarge)
+def handle_too_large(error):
+    limit_mb = (request.max_content_length or 0) // (1024 * 1024)
+    return api_response({'status': 'error', 'message': f"The upload is larger than {limit_mb} MB."}, 413)
+
+
+# ----------------------------------------------------
+# 2. AUTHENTICATION
+# ----------------------------------------------------
+
+@api.before_request
+def authenticate():
+    """'Authorization: Bearer <token>' (see /tokens), or the browser session for same-origin scripts."""
+    if request.endpoint == 'api.issue_token':
+        return
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        user = User.verify_api_token(header[len('Bearer '):].strip(), current_app.config['API_TOKEN_MAX_AGE'])
+        if user is None:
+            raise ApiError(401, 'Invalid or expired token.', {'WWW-Authenticate': 'Bearer error="invalid_token"'})
+        g.api_user_id, g.api_token_auth = user.id, True
+    elif current_user.is_authenticated:
+        g.api_user_id = current_user.id
+    else:
+        raise ApiError(401, 'Authentication required.', {'WWW-Authenticate': 'Bearer'})
+
+
+@api.route('/tokens', methods=['POST'])
+def issue_token():
+    """Exchanges email + password (JSON or form) for an API token; rate limited like the login form."""
+    data = request.get_json(silent=True) or request.form
+    email = str(data.get('email') or '').strip().lower()
+    password = str(data.get('password') or '')
+
+    retry_after = limiter.check_request('login', email=email or None)
+    if retry_after:
+        raise ApiError(429, 'Too many attempts.', {'Retry-After': str(retry_after)})
+
+    user = User.query.filter_by(email=email).first() if email else None
+    try:
+        password_ok = user is not None and user.check_password(password)
+    except HashingBusy:
+        raise ApiError(503, 'The server is busy right now. Please try again in a moment.')
+    if not password_ok:
+        raise ApiError(401, 'Invalid email or password.')
+
+    return api_response({'token': user.get_api_token(),
+                         'expires_in': current_app.config['API_TOKEN_MAX_AGE']}, 201)
+
+
+# ----------------------------------------------------
+# 3. COLLECTIONS (cursor pagination, sparse fieldsets, batch GET)
+# ----------------------------------------------------
+
+def encode_cursor(last_id):
+    return base64.urlsafe_b64encode(json.dumps({'id': last_id}).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        last_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))['id']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise ApiError(400, 'Invalid cursor.')
+    if not isinstance(last_id, int):
+        raise ApiError(400, 'Invalid cursor.')
+    return last_id
+
+
+def _int_list(raw, name, maximum):
+    try:
+        values = [int(value) for value in raw.split(',') if value.strip()]
+    except ValueError:
+        raise ApiError(400, f"'{name}' must be a comma-separated list of integers.")
+    if not values or len(values) > maximum:
+        raise ApiError(400, f"'{name}' takes 1 to {maximum} values.")
+    return values
+
+
+def _requested_fields(resource):
+    raw = request.args.get('fields')
+    if not raw:
+        return list(resource['fields'])
+    fields = list(dict.fromkeys(field.strip() for field in raw.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in resource['fields']]
+    if unknown or not fields:
+        raise ApiError(400, f"Unknown fields: {', '.join(unknown) or '(none)'}. "
+                            f"Available: {', '.join(resource['fields'])}.")
+    return fields
+
+
+def _page_size():
+    config = current_app.config
+    try:
+        limit = int(request.args.get('limit', config['API_PAGE_SIZE']))
+    except ValueError:
+        raise ApiError(400, "'limit' must be an integer.")
+    return min(max(limit, 1), config['API_MAX_PAGE_SIZE'])
+
+
+def build_select(resource, fields, owner_id=None, with_id=True):
+    """SELECT of `fields` (plus 'id' first if with_id), labelled by field name, scoped to owner_id."""
+    model = resource['model']
+    selected = (['id'] + [field for field in fields if field != 'id']) if with_id else fields
+    stmt = select(*(resource['fields'][field].label(field) for field in selected))
+    for field in selected:
+        if field in resource.get('joins', {}):
+            stmt = stmt.join(*resource['joins'][field])
+    if owner_id is not None:
+        stmt = stmt.where(model.user_id == owner_id)
+    return stmt
+
+
+def list_resource(name):
+    """
+    One page of a collection, newest first: {'data': [...], 'next_cursor': str | None}.
+    Only the requested columns are selected; pages are keyset-paginated on the primary
+    key (WHERE id < cursor), so deep pages cost the same as the first one.
+    """
+    resource = RESOURCES[name]
+    model = resource['model']
+    fields = _requested_fields(resource)
+    stmt = build_select(resource, fields, g.api_user_id if resource['owned'] else None)
+    stmt = stmt.order_by(model.id.desc())
+
+    next_cursor = None
+    if request.args.get('ids'):
+        # Batch GET: ids that do not exist (or are not the caller's) are simply absent
+        ids = _int_list(request.args['ids'], 'ids', current_app.config['API_MAX_IDS'])
+        rows = db.session.execute(stmt.where(model.id.in_(ids))).all()
+    else:
+        limit = _page_size()
+        if request.args.get('cursor'):
+            stmt = stmt.where(model.id < decode_cursor(request.args['cursor']))
+        rows = db.session.execute(stmt.limit(limit + 1)).all()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].id)
+
+    return {'data': [{field: row._mapping[field] for field in fields} for row in rows],
+            'next_cursor': next_cursor}
+
+
+@api.route('/posts')
+@replica_reads
+def list_posts():
+    return api_response(list_resource('posts'))
+
+
+@api.route('/tasks')
+@replica_reads
+def list_tasks():
+    return api_response(list_resource('tasks'))
+
+
+@api.route('/links')
+@replica_reads
+def list_links():
+    return api_response(list_resource('links'))
+
+
+# ----------------------------------------------------
+# 4. EXPORTS (streamed CSV / NDJSON)
+# ----------------------------------------------------
+
+EXPORT_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+def _csv_chunk(rows, buffer, writer):
+    writer.writerows([value.isoformat() if isinstance(value, datetime.datetime) else value for value in row]
+                     for row in rows)
+    chunk = buffer.getvalue().encode()
+    buffer.seek(0)
+    buffer.truncate()
+    return chunk
+
+
+def _ndjson_chunk(rows, fields):
+    if orjson is not None:
+        return b''.join(orjson.dumps(dict(zip(fields, row))) + b'\n' for row in rows)
+    return ''.join(json.dumps(dict(zip(fields, row)), separators=(',', ':'), default=_json_default) + '\n'
+                   for row in rows).encode()
+
+
+def export_chunks(stmt, fields, fmt, batch_size):
+    """
+    Yields the encoded export batch by batch. yield_per streams the result through a
+    server-side cursor (where the driver has one), so only one batch of rows is in
+    memory at any time, however many rows the user has.
+    """
+    result = db.session.execute(stmt, execution_options={'yield_per': batch_size})
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        for rows in result.partitions():
+            yield _csv_chunk(rows, buffer, writer)
+    else:
+        for rows in result.partitions():
+            yield _ndjson_chunk(rows, fields)
+
+
+@api.route('/<any(posts, tasks, links):name>/export')
+@replica_reads
+def export_resource(name):
+    """
+    All of the caller's own rows as ?format=csv (default) or ndjson, oldest first,
+    streamed as they are read. ?fields= works as for the collections.
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        raise ApiError(400, f"'format' must be one of: {', '.join(EXPORT_FORMATS)}.")
+    resource = RESOURCES[name]
+    fields = _requested_fields(resource)
+    stmt = build_select(resource, fields, g.api_user_id, with_id=False).order_by(resource['model'].id)
+
+    filename = f"{name}-{datetime.date.today().isoformat()}.{fmt}"
+    chunks = export_chunks(stmt, fields, fmt, current_app.config['EXPORT_BATCH_SIZE'])
+    # stream_with_context keeps the request (and its DB session) alive until the last chunk
+    return current_app.response_class(stream_with_context(chunks), mimetype=EXPORT_FORMATS[fmt],
+                                      headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+
+# ----------------------------------------------------
+# 5. IMPORTS (streamed CSV / NDJSON uploads, bulk inserted)
+# ----------------------------------------------------
+
+@api.route('/<any(posts, tasks, links):name>/import', methods=['POST'])
+def import_resource(name):
+    """
+    Imports rows for the caller from a CSV or NDJSON upload: either the raw request body
+    (Content-Type text/csv or application/x-ndjson) or a multipart 'file'. ?format=
+    overrides the detected format. Token-authenticated only, so a third-party page cannot
+    submit a form into a logged-in browser's account. Responds with the import report;
+    very large migrations are better run with 'flask import', outside the request timeout.
+    """
+    if not g.get('api_token_auth'):
+        raise ApiError(401, 'Imports need an API token (Authorization: Bearer).', {'WWW-Authenticate': 'Bearer'})
+    config = current_app.config
+    request.max_content_length = config['IMPORT_MAX_BYTES']
+
+    upload = request.files.get('file') if request.mimetype == 'multipart/form-data' else None
+    if upload is not None:
+        stream, fmt = upload.stream, detect_format(upload.filename, upload.mimetype)
+    else:
+        stream, fmt = request.stream, detect_format(mimetype=request.mimetype)
+    fmt = request.args.get('format', fmt)
+    if fmt not in EXPORT_FORMATS:
+        raise ApiError(400, f"Cannot tell the format; pass ?format= ({', '.join(EXPORT_FORMATS)}).")
+
+    try:
+        report = import_rows(name, stream, fmt, g.api_user_id, config['IMPORT_BATCH_SIZE'],
+                             config['IMPORT_TRANSACTION_BATCHES'], config['IMPORT_MAX_ERRORS'])
+    except ImportFormatError as e:
+        raise ApiError(400, str(e))
+    return api_response(report)
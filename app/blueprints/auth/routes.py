@@ -2,13 +2,16 @@
 
 import os
 from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, abort
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import login_user, current_user, logout_user, login_required
 from sqlalchemy.exc import IntegrityError
-from app import db
+from werkzeug.exceptions import RequestEntityTooLarge
+from app import db, hasher, limiter
+from app.database import replica_reads
+from app.hashing import HashingBusy
 from app.models import User
 from app.forms import RegistrationForm, LoginForm, RequestResetForm, ResetPasswordForm, EditProfileForm
-from app.utils import save_base64_picture, delete_picture  # Helper for saving images
+from app.utils import stage_uploaded_picture, stage_base64_picture, queue_avatar_processing  # Profile image helpers
+from app.user_cache import user_cache
 
 
 # --- HELPER FUNCTION: SIMULATED EMAIL ---
@@ -24,6 +27,20 @@ def send_reset_email(user):
 
 auth = Blueprint('auth', __name__, template_folder='templates', url_prefix='/auth')
 
+# Shown when the password hashing pool is saturated (backpressure)
+BUSY_MESSAGE = 'The server is busy right now. Please try again in a moment.'
+
+
+def rate_limited(scope, template, title, form):
+    """Charges this POST to the rate limiter; returns a 429 response if over the limit, else None."""
+    if request.method != 'POST':
+        return None
+    retry_after = limiter.check_request(scope, email=request.form.get('email'))
+    if not retry_after:
+        return None
+    flash(f'Too many attempts. Please wait {retry_after} seconds and try again.', 'danger')
+    return render_template(template, title=title, form=form), 429, {'Retry-After': str(retry_after)}
+
 
 # ----------------------------------------------------
 # 1. LOGIN / LOGOUT / REGISTER
@@ -36,12 +53,16 @@ def register():
 
     form = RegistrationForm()
     if form.validate_on_submit():
-        hashed_password = generate_password_hash(form.password.data, method='pbkdf2:sha256')
         user = User(
             username=form.username.data.strip().lower(),
-            email=form.email.data.strip().lower(),
-            password_hash=hashed_password
+            email=form.email.data.strip().lower()
         )
+        try:
+            user.set_password(form.password.data)
+        except HashingBusy:
+            flash(BUSY_MESSAGE, 'danger')
+            return render_template('register.html', title='Register', form=form), 503
+
         try:
             db.session.add(user)
             db.session.commit()
@@ -63,9 +84,24 @@ def login():
         return redirect(url_for('main.home'))
 
     form = LoginForm()
+    # Checked before validation: rejected attempts never touch the DB or the hasher
+    limited = rate_limited('login', 'login.html', 'Login', form)
+    if limited:
+        return limited
+
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data.strip().lower()).first()
-        if user and check_password_hash(user.password_hash, form.password.data):
+        try:
+            password_ok = user is not None and user.check_password(form.password.data)
+            # Transparent upgrade when PASSWORD_HASH_METHOD (work factor) has changed
+            if password_ok and hasher.needs_rehash(user.password_hash):
+                user.set_password(form.password.data)
+                db.session.commit()
+        except HashingBusy:
+            flash(BUSY_MESSAGE, 'danger')
+            return render_template('login.html', title='Login', form=form), 503
+
+        if password_ok:
             login_user(user)
             next_page = request.args.get('next')
             flash(f"Welcome back, {user.username}!", 'success')
@@ -94,6 +130,10 @@ def reset_request():
         return redirect(url_for('main.home'))
 
     form = RequestResetForm()
+    limited = rate_limited('reset', 'reset_request.html', 'Request Reset', form)
+    if limited:
+        return limited
+
     if form.validate_on_submit():
         user = User.query.filter_by(email=form.email.data.strip().lower()).first()
 
@@ -123,11 +163,14 @@ def reset_token(token):
 
     form = ResetPasswordForm()
     if form.validate_on_submit():
-        # Hash and save the new password
-        hashed_password = generate_password_hash(form.password.data, method='pbkdf2:sha256')
-
-        user.password_hash = hashed_password
+        # Hash (in the hashing pool) and save the new password
+        try:
+            user.set_password(form.password.data)
+        except HashingBusy:
+            flash(BUSY_MESSAGE, 'danger')
+            return render_template('reset_token.html', title='Reset Password', form=form), 503
         db.session.commit()
+        user_cache.invalidate(user.id)
 
         flash('Your password has been reset. You can now log in.', 'success')
         return redirect(url_for('auth.login'))
@@ -141,6 +184,9 @@ def reset_token(token):
 @auth.route("/profile", methods=['GET', 'POST'])
 @login_required
 def profile():
+    # Hard cap for this view, enforced by the multipart parser while it streams the body
+    request.max_content_length = current_app.config['AVATAR_MAX_BYTES'] + 64 * 1024
+
     # Instantiate form with current user's data on GET request
     # NOTE: obj=current_user loads initial data, but doesn't handle validation/submission logic automatically
     form = EditProfileForm(obj=current_user)
@@ -165,21 +211,20 @@ def profile():
 
         # --- 2. IMAGE REPLACEMENT LOGIC ---
 
-        # 1. Initialize variables for potential image update
-        new_image_file = None
-        cropped_data = request.form.get('image_data_uri')  # Data from Cropper.js
+        # 1. Stage the new picture (validated here; resizing/encoding happens in the background)
+        staged_picture = None
+        cropped_file = request.files.get('avatar')  # Binary Blob from Cropper.js
+        cropped_data = request.form.get('image_data_uri')  # Legacy Base64 data URI
 
-        if cropped_data:
-            old_picture = current_user.image_file
+        if (cropped_file and cropped_file.filename) or cropped_data:
             try:
-                # Save the new Base64 image and get its unique filename
-                new_image_file = save_base64_picture(cropped_data)
-
-                # Delete the old file only after the new one is successfully saved
-                delete_picture(old_picture)
+                if cropped_file and cropped_file.filename:
+                    staged_picture = stage_uploaded_picture(cropped_file)
+                else:
+                    staged_picture = stage_base64_picture(cropped_data)
 
             except Exception as e:
-                # If image processing fails, flash the error and halt the entire process.
+                # If the image is invalid, flash the error and halt the entire process.
                 # No DB operation has occurred yet, so no rollback is strictly necessary,
                 # but we flash and redirect immediately.
                 flash(str(e), 'error')  # Changed danger to error
@@ -193,29 +238,42 @@ def profile():
         current_user.country = form.country.data
         current_user.state = form.state.data
 
-        # Apply image update if a new file was successfully created
-        if new_image_file:
-            current_user.image_file = new_image_file
-
         try:
             db.session.commit()
-            flash('Your profile has been updated successfully.', 'success')
-            return redirect(url_for('auth.user_profile', username=current_user.username))
+            user_cache.invalidate(current_user.id)
         except IntegrityError:
             # Catching rare commit errors (e.g., unexpected race condition)
             db.session.rollback()
+            if staged_picture:
+                os.remove(staged_picture)
             flash('An unexpected error occurred during profile update.', 'error')  # Changed danger to error
             return redirect(url_for('auth.profile'))
 
+        if staged_picture:
+            # The worker swaps image_file (and deletes the old files) once all variants exist
+            queue_avatar_processing(current_user.id, staged_picture)
+            flash('Your profile has been updated. Your new picture will appear in a few seconds.', 'success')
+        else:
+            flash('Your profile has been updated successfully.', 'success')
+        return redirect(url_for('auth.user_profile', username=current_user.username))
+
     # GET request or form validation failed
     return render_template('profile.html', title='Account Settings', form=form, active_page='profile')
 
 
+@auth.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    limit_mb = current_app.config['AVATAR_MAX_BYTES'] // (1024 * 1024)
+    flash(f'That upload is too large. Profile images must be under {limit_mb} MB.', 'error')
+    return redirect(url_for('auth.profile'))
+
+
 # ----------------------------------------------------
 # 4. PUBLIC PROFILE VIEW (READ-ONLY)
 # ----------------------------------------------------
 
 @auth.route("/profile/<username>", methods=['GET'])
+@replica_reads
 def user_profile(username):
     # Retrieve the target user object or abort with a 404
     user = User.query.filter_by(username=username).first()
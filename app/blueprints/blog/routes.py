@@ -3,6 +3,7 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, abort
 from flask_login import login_required, current_user
 from app import db
+from app.database import replica_reads
 from app.models import Post
 from app.forms import PostForm
 from sqlalchemy import or_
@@ -11,6 +12,7 @@ blog = Blueprint('blog', __name__, template_folder='templates')  # Removed url_p
 
 
 @blog.route('/')
+@replica_reads
 def blog_index():
     """
     Displays all blog posts with search filtering capabilities.
@@ -46,8 +48,8 @@ def new_post():
         post = Post(
             title=form.title.data,
             content=form.content.data,
-            # REFACTOR: Use the relationship attribute 'post_author' instead of 'user_id'
-            post_author=current_user
+            # current_user may be a CachedUser (see app/user_cache.py), so assign the id
+            user_id=current_user.id
         )
 
         db.session.add(post)
@@ -61,6 +63,7 @@ def new_post():
 
 
 @blog.route("/post/<int:post_id>/view", methods=['GET'])
+@replica_reads
 def view_post(post_id):
     """
     Displays a single blog post.
@@ -80,7 +83,7 @@ def edit_post(post_id):
     post = Post.query.get_or_404(post_id)
 
     # CRITICAL: Authorization check
-    if post.post_author.id != current_user.id:
+    if post.user_id != current_user.id:
         # REFACTOR: Use 'error' flash category for authorization failures
         flash('You are not authorized to edit this post.', 'error')
         return redirect(url_for('blog.view_post', post_id=post.id))  # Redirect back to view page
@@ -109,7 +112,7 @@ def delete_post(post_id):
     post = Post.query.get_or_404(post_id)
 
     # CRITICAL: Authorization check
-    if post.post_author.id != current_user.id:
+    if post.user_id != current_user.id:
         # REFACTOR: Use 'error' flash category for authorization failures
         flash('You are not authorized to delete this post.', 'error')
         return redirect(url_for('blog.view_post', post_id=post.id))  # Redirect back to view page
@@ -0,0 +1,130 @@
+#downloader/journal.py
+
+import os
+import uuid
+import socket
+import datetime
+
+from sqlalchemy.exc import SQLAlchemyError
+from app import db
+from app.models import DownloadJob
+
+# Identifies the worker process that owns a job, e.g. "web-1:4211:9f3c2a1b". The per-boot
+# nonce tells a restarted container apart from its predecessor even when the PID (often 1)
+# and hostname are reused.
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+RESUMABLE_STATUSES = ('queued', 'downloading', 'processing')
+
+
+# ------------------------------------------------------
+# 1. WRITES (a row exists only while its job is incomplete)
+# ------------------------------------------------------
+
+def record_job(app, task_key, user_id, url, format_id, profile_key, filepath, concurrent_fragments, batch_id=None):
+    """Persists everything needed to rebuild the yt-dlp command after a restart."""
+    with app.app_context():
+        job = DownloadJob.query.filter_by(task_key=task_key).first() or DownloadJob(task_key=task_key)
+        job.user_id = user_id
+        job.url = url
+        job.format_id = format_id
+        job.profile = profile_key
+        job.filepath = filepath
+        job.concurrent_fragments = concurrent_fragments
+        job.batch_id = batch_id
+        job.status = 'queued'
+        job.owner = WORKER_ID
+        job.heartbeat_at = datetime.datetime.utcnow()
+        db.session.add(job)
+        db.session.commit()
+
+
+def update_job(app, task_key, status):
+    """Records a status transition of a running job."""
+    with app.app_context():
+        DownloadJob.query.filter_by(task_key=task_key).update({'status': status})
+        db.session.commit()
+
+
+def finish_job(app, task_key):
+    """Removes a job that completed, failed or was cancelled; it must not be resumed."""
+    with app.app_context():
+        DownloadJob.query.filter_by(task_key=task_key).delete()
+        db.session.commit()
+
+
+def renew_leases(app):
+    """Extends the lease of every job this worker owns (one UPDATE); called periodically."""
+    with app.app_context():
+        try:
+            DownloadJob.query.filter_by(owner=WORKER_ID).update(
+                {'heartbeat_at': datetime.datetime.utcnow()}, synchronize_session=False)
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+
+
+# ------------------------------------------------------
+# 2. RECOVERY
+# ------------------------------------------------------
+
+def _owner_is_dead(job, lease_cutoff):
+    """
+    True if the job's owner is gone: its lease is stale (any node, any restart), or it
+    ran on this host under a PID that no longer exists or is now this (different) process.
+    """
+    if job.owner == WORKER_ID:
+        return False
+    if job.heartbeat_at is None or job.heartbeat_at < lease_cutoff:
+        return True
+    host, _, rest = (job.owner or '').partition(':')
+    pid = rest.split(':')[0]  # Owners written before the nonce are "host:pid"
+    if host != socket.gethostname() or not pid.isdigit():
+        return False  # Another node's live lease: leave it alone
+    if int(pid) == os.getpid():
+        return True  # Our PID, but an earlier boot (different nonce)
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        return False  # Exists but belongs to another user
+    return False
+
+
+def claim_orphaned_jobs(app):
+    """
+    Atomically takes over incomplete jobs whose worker died (crash or restart) or whose
+    lease (DOWNLOAD_LEASE_SECONDS) ran out. The conditional UPDATE guarantees two
+    workers never both resume the same job. Returns the claimed jobs as dicts.
+    """
+    with app.app_context():
+        now = datetime.datetime.utcnow()
+        lease_cutoff = now - datetime.timedelta(seconds=app.config['DOWNLOAD_LEASE_SECONDS'])
+        try:
+            candidates = DownloadJob.query.filter(DownloadJob.status.in_(RESUMABLE_STATUSES)).all()
+        except SQLAlchemyError:
+            # Table not migrated yet (e.g. during 'flask db upgrade')
+            db.session.rollback()
+            return []
+
+        claimed = []
+        for job in candidates:
+            if not _owner_is_dead(job, lease_cutoff):
+                continue
+            rows = DownloadJob.query.filter_by(id=job.id, owner=job.owner, heartbeat_at=job.heartbeat_at).update(
+                {'owner': WORKER_ID, 'status': 'queued', 'heartbeat_at': now}, synchronize_session=False
+            )
+            db.session.commit()
+            if rows == 1:
+                claimed.append(job)
+
+        # Detach plain values so they can be used outside the app context
+        return [
+            {
+                'task_key': job.task_key, 'user_id': job.user_id, 'url': job.url,
+                'format_id': job.format_id, 'profile': job.profile, 'filepath': job.filepath,
+                'concurrent_fragments': job.concurrent_fragments, 'batch_id': job.batch_id
+            }
+            for job in claimed
+        ]
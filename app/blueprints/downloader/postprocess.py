@@ -0,0 +1,64 @@
+#downloader/postprocess.py
+
+import os
+import shutil
+import asyncio
+
+# Lazily created on the supervisor loop; bounds the ffmpeg processes of this worker process
+_slots = None
+
+
+def _lower_priority(niceness):
+    """preexec_fn for ffmpeg: drop its CPU priority so request workers are never starved."""
+
+    def lower():
+        try:
+            os.nice(niceness)
+        except OSError:
+            pass
+
+    return lower if hasattr(os, 'nice') else None
+
+
+def _get_slots(max_workers=None):
+    """Returns the post-processing semaphore, sized to the core count by default."""
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(max_workers or os.cpu_count() or 1)
+    return _slots
+
+
+async def transcode(ffmpeg, inputs, ffmpeg_args, output, max_workers=None, niceness=10, timeout=None):
+    """
+    Merges/transcodes the downloaded streams into the final file, awaited on the
+    supervisor loop. Each ffmpeg is limited to one thread and at most max_workers run
+    at once, so that is the CPU budget. A timeout or cancellation kills ffmpeg.
+    Returns (return_code, last stderr lines).
+    """
+    command = [ffmpeg, '-hide_banner', '-loglevel', 'error', '-y']
+    for path in inputs:
+        command += ['-i', path]
+    for index in range(len(inputs)):
+        command += ['-map', f'{index}']
+    command += ['-threads', '1'] + list(ffmpeg_args) + [output]
+
+    # Idle I/O class (Linux only); ionice execs ffmpeg in place, so no extra process stays around
+    ionice = shutil.which('ionice')
+    if ionice:
+        command = [ionice, '-c', '3'] + command
+
+    async with _get_slots(max_workers):
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+            preexec_fn=_lower_priority(niceness),
+        )
+        try:
+            _, stderr = await asyncio.wait_for(process.communicate(), timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
+    return process.returncode, stderr.decode('utf-8', errors='replace')[-500:]
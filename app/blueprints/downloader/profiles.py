@@ -0,0 +1,86 @@
+#downloader/profiles.py
+
+# Each profile decides which streams are offered, what yt-dlp fetches, and
+# how the post-processing step turns the fetched streams into the final file.
+#   kind:        'video' (video-only stream + best audio) or 'audio' (audio-only stream)
+#   max_height:  cap on the offered video resolutions (None = no cap)
+#   source_ext:  only offer streams with this container (needed for stream copy)
+#   ext:         extension of the final file
+#   ffmpeg_args: codec arguments for the merge/transcode step
+DOWNLOAD_PROFILES = {
+    'mp4': {
+        'label': 'MP4 video - best quality (remux only)',
+        'kind': 'video', 'max_height': None, 'source_ext': None, 'ext': 'mp4',
+        'ffmpeg_args': ['-c', 'copy'],
+    },
+    'mp4-720': {
+        'label': 'MP4 video - up to 720p (remux only)',
+        'kind': 'video', 'max_height': 720, 'source_ext': None, 'ext': 'mp4',
+        'ffmpeg_args': ['-c', 'copy'],
+    },
+    'mp4-480-h264': {
+        'label': 'MP4 video - up to 480p (re-encode to H.264/AAC)',
+        'kind': 'video', 'max_height': 480, 'source_ext': None, 'ext': 'mp4',
+        'ffmpeg_args': ['-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23',
+                        '-c:a', 'aac', '-b:a', '128k', '-movflags', '+faststart'],
+    },
+    'm4a': {
+        'label': 'Audio only - M4A (remux only)',
+        'kind': 'audio', 'max_height': None, 'source_ext': 'm4a', 'ext': 'm4a',
+        'ffmpeg_args': ['-vn', '-c:a', 'copy'],
+    },
+    'mp3': {
+        'label': 'Audio only - MP3 (re-encode)',
+        'kind': 'audio', 'max_height': None, 'source_ext': None, 'ext': 'mp3',
+        'ffmpeg_args': ['-vn', '-c:a', 'libmp3lame', '-q:a', '2'],
+    },
+}
+
+DEFAULT_PROFILE = 'mp4'
+
+
+def profile_choices():
+    """(value, label) pairs for the downloader form's profile select."""
+    return [(key, profile['label']) for key, profile in DOWNLOAD_PROFILES.items()]
+
+
+def select_streams(formats, profile):
+    """Filters yt-dlp's format list down to the streams a profile can use, best first."""
+    if profile['kind'] == 'audio':
+        streams = [
+            f for f in formats
+            if f.get('acodec') not in (None, 'none') and f.get('vcodec') == 'none'
+        ]
+        sort_key = lambda f: f.get('abr') or 0
+    else:
+        streams = [
+            f for f in formats
+            if f.get('vcodec') not in (None, 'none') and f.get('acodec') == 'none'
+            and (profile['max_height'] is None or (f.get('height') or 0) <= profile['max_height'])
+        ]
+        sort_key = lambda f: f.get('height') or 0
+
+    if profile['source_ext']:
+        streams = [f for f in streams if f.get('ext') == profile['source_ext']]
+
+    streams.sort(key=sort_key, reverse=True)
+    return streams
+
+
+def format_selector(format_id, profile):
+    """
+    yt-dlp '-f' value. A comma (not '+') makes yt-dlp save the streams as
+    separate files, so the merge happens in our post-processing step instead.
+    """
+    if profile['kind'] == 'audio':
+        return format_id
+    return f"{format_id},bestaudio[ext=m4a]/bestaudio"
+
+
+def best_format(profile):
+    """Stream spec used when no specific stream was picked (batch/playlist downloads)."""
+    if profile['kind'] == 'audio':
+        return f"bestaudio[ext={profile['source_ext']}]" if profile['source_ext'] else 'bestaudio'
+    if profile['max_height']:
+        return f"bestvideo[height<={profile['max_height']}]"
+    return 'bestvideo'
@@ -3,23 +3,65 @@
 from flask import (
     Blueprint, render_template, request, redirect, url_for,
     flash, send_file, current_app, jsonify,
-    send_from_directory, abort
+    abort
 )
 from flask_login import login_required, current_user
 import os
-import threading
-import subprocess
-import json
+import shutil
+import asyncio
 import re
+import secrets
+import time
+import mimetypes
+import threading
 
-from app.forms import YouTubeDownloaderForm
+from app import storage, metrics
+from app.storage import StorageError
+from app.forms import YouTubeDownloaderForm, BatchDownloadForm
+from app import toolchain as tools
+from app.toolchain import probe, ProbeError, ProbeTimeout
+from app.blueprints.downloader.supervisor import supervisor
+from app.blueprints.downloader.profiles import (
+    DOWNLOAD_PROFILES, DEFAULT_PROFILE, profile_choices, select_streams, format_selector, best_format
+)
+from app.blueprints.downloader.postprocess import transcode
+from app.blueprints.downloader.journal import record_job, update_job, finish_job, claim_orphaned_jobs, renew_leases
 
 downloader = Blueprint('downloader', __name__, template_folder='templates')
 
 # In-memory storage for download progress
 download_tasks = {}
-# Structure: { task_key: {'progress': %, 'status': '...', 'filepath': '...', 'thread': obj, 'process': obj,
-#                         'cancel_requested': bool, 'error_message': '...', 'speed_str': '...', 'download_name': '...'} }
+# Structure: { task_key: {'progress': %, 'status': '...', 'filepath': '...',
+#                         'error_message': '...', 'speed_str': '...', 'download_name': '...'} }
+# The jobs themselves run on the shared DownloadSupervisor event loop (see supervisor.py).
+
+# In-memory storage for batch (playlist / multi-URL) downloads
+download_batches = {}
+# Structure: { batch_id: {'user_id': int, 'status': 'expanding'|'queued', 'task_keys': [...], 'errors': [...]} }
+
+# --- Metrics (read at scrape time, see app/metrics.py) ---
+def _tasks_by_status():
+    counts = {}
+    for task in list(download_tasks.values()):
+        key = (task.get('status', 'unknown'),)
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+metrics.gauge('downloader_jobs_queued', 'Download jobs waiting for a free slot.', callback=supervisor.queued_count)
+metrics.gauge('downloader_jobs_running', 'Download jobs currently running.', callback=supervisor.running_count)
+metrics.gauge('downloader_processes', 'Live yt-dlp subprocesses.', callback=supervisor.process_count)
+metrics.gauge('downloader_tasks', 'Tracked download tasks by status.', ('status',), callback=_tasks_by_status)
+
+
+# Task keys come back in URLs and name the job's work directory (.parts/<task_key>):
+# no separators, no leading dot ('.', '..'), and always the owner's '_<user_id>' suffix
+TASK_KEY_RE = re.compile(r'^[A-Za-z0-9_+=-][A-Za-z0-9._+=-]{0,199}$')
+
+
+def valid_task_key(task_key, user_id):
+    return bool(TASK_KEY_RE.match(task_key)) and task_key.endswith(f"_{user_id}")
+
 
 # --- Regex for parsing yt-dlp output ---
 PROGRESS_RE = re.compile(
@@ -28,186 +70,375 @@ PROGRESS_RE = re.compile(
 )
 
 
-# --- Background Download Function (using yt-dlp) ---
-def download_process_thread(app, url, format_id, task_key, filepath):
-    """Downloads a video stream in a separate thread using yt-dlp subprocess."""
+# --- Background Download Job (using yt-dlp, runs on the supervisor loop) ---
+async def download_job(app, url, format_id, profile_key, task_key, filepath, concurrent_fragments=1):
+    """
+    Downloads the selected stream(s) as a coroutine on the shared download supervisor,
+    then merges/transcodes them with a bounded number of concurrent, low-priority ffmpegs.
+    Partial streams survive a crash in the work directory and are continued on resume.
+    """
     global download_tasks
 
-    with app.app_context():
-        cookies_path = os.path.join(current_app.instance_path, 'cookies.txt')
+    profile = DOWNLOAD_PROFILES[profile_key]
+    cookies_path = os.path.join(app.instance_path, 'cookies.txt')
+
+    # Executables located once per process on first use (see app/toolchain.py). A missing
+    # tool surfaces as an OSError inside the try block below and marks the task as failed.
+    toolchain = tools.get(app)
+    ffmpeg = toolchain['ffmpeg'] or 'ffmpeg'
+
+    # Raw streams land in a per-task work directory until post-processing is done
+    if not TASK_KEY_RE.match(task_key):
+        # Second line of defence (initiate_download checks first): never rmtree outside .parts
+        app.logger.error(f"Refusing download job with unsafe task key {task_key!r}")
+        download_tasks.get(task_key, {}).update(status='error', error_message='Invalid task key.', speed_str='Error')
+        await asyncio.to_thread(finish_job, app, task_key)
+        return
+    work_dir = os.path.join(os.path.dirname(filepath), '.parts', task_key)
+    os.makedirs(work_dir, exist_ok=True)
+
+    command = (toolchain['ytdlp_command'] or ['yt-dlp']) + [
+        '--cookies', cookies_path,
+        '-f', format_selector(format_id, profile),
+        '--concurrent-fragments', str(concurrent_fragments),  # parallel DASH/HLS fragment fetching
+        '-o', os.path.join(work_dir, '%(format_id)s.%(ext)s'),
+        '--continue',  # resume .part files left by a previous run of this job
+        '--print', 'after_move:filepath', '--no-simulate',
+        '--progress',
+        '--no-playlist',
+        '--newline',
+        '-q', '--no-warnings',
+        url
+    ]
+    if toolchain['ffmpeg_dir']:
+        command[-1:-1] = ['--ffmpeg-location', toolchain['ffmpeg_dir']]
+
+    downloaded = []
+
+    def on_line(line):
+        match = PROGRESS_RE.search(line)
+        if match:
+            if task_key in download_tasks:
+                data = match.groupdict()
+                download_tasks[task_key]['progress'] = int(float(data['percent']))
+                download_tasks[task_key]['speed_str'] = data['speed']
+                download_tasks[task_key]['status'] = 'downloading'
+        elif line and os.path.isfile(line):
+            # '--print after_move:filepath' reports each finished stream
+            downloaded.append(line)
 
-        # --- FIX 1: Explicitly set FFmpeg path ---
-        # This tells yt-dlp exactly where to find ffmpeg.exe
-        ffmpeg_path = r'C:\ffmpeg'
+    task_info = download_tasks.get(task_key, {})
 
-        try:
-            command = [
-                'yt-dlp',
-                '--cookies', cookies_path,
-                '--ffmpeg-location', ffmpeg_path,  # <-- ADDED THIS LINE
-                '-f', f"{format_id}+bestaudio",
-                '-o', filepath,
-                '--progress',
-                '--no-playlist',
-                '--newline',
-                '-q', '--no-warnings',
-                '--merge-output-format', 'mp4',
-                url
+    try:
+        task_info['status'] = 'downloading'
+        await asyncio.to_thread(update_job, app, task_key, 'downloading')
+        return_code = await supervisor.run_process(command, on_line, timeout=app.config['DOWNLOAD_TIMEOUT'])
+        app.logger.debug(f"yt-dlp process for {task_key} finished with code {return_code}")
+
+        if return_code != 0:
+            raise Exception(f"yt-dlp exited with error code {return_code}")
+        if not downloaded:
+            # Streams finished by an earlier run are not always re-reported; pick them up from disk
+            downloaded = [
+                os.path.join(work_dir, f) for f in sorted(os.listdir(work_dir))
+                if not f.endswith(('.part', '.ytdl'))
             ]
+        if not downloaded:
+            raise Exception("Download finished but no streams were saved.")
+
+        # --- Post-processing (merge / transcode): an awaited ffmpeg, bounded per worker process ---
+        task_info['status'] = 'processing'
+        task_info['speed_str'] = 'Processing'
+        await asyncio.to_thread(update_job, app, task_key, 'processing')
+        ffmpeg_code, ffmpeg_error = await transcode(
+            ffmpeg, downloaded, profile['ffmpeg_args'], filepath, app.config['POSTPROCESS_WORKERS'],
+            app.config['POSTPROCESS_NICE'], timeout=app.config['DOWNLOAD_TIMEOUT']
+        )
+
+        if ffmpeg_code != 0 or not os.path.exists(filepath):
+            raise Exception(f"Post-processing failed. {ffmpeg_error}".strip())
+
+        # Hand the result to file storage (for the local default it is already in place)
+        storage_key = download_storage_key(app, filepath)
+        await asyncio.to_thread(storage.downloads.save_file, storage_key, filepath,
+                                mimetypes.guess_type(filepath)[0], None, True)
+
+        task_info['filepath'] = filepath
+        task_info['storage_key'] = storage_key
+        task_info['download_name'] = os.path.basename(filepath)
+        task_info['status'] = 'complete'
+        task_info['progress'] = 100
+        task_info['speed_str'] = "Complete"
+
+    except asyncio.CancelledError:
+        # Cancellation kills the subprocess instantly (see supervisor.run_process)
+        task_info['status'] = 'cancelled'
+        task_info['speed_str'] = 'Cancelled'
+        if os.path.exists(filepath):
+            try:
+                os.remove(filepath)
+            except OSError:
+                pass
 
-            process = subprocess.Popen(
-                command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                encoding='utf-8',
-                bufsize=1,
-                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-            )
+    except asyncio.TimeoutError:
+        stage = 'Post-processing' if task_info['status'] == 'processing' else 'Download'
+        task_info['status'] = 'error'
+        task_info['error_message'] = f'{stage} timed out.'
+        task_info['speed_str'] = 'Error'
+        app.logger.error(f"Download timed out for {task_key}")
 
-            if task_key in download_tasks:
-                download_tasks[task_key]['process'] = process
-
-            print(f"DEBUG: Started yt-dlp process for {task_key}...")
-
-            for line in iter(process.stdout.readline, ''):
-                if not line:
-                    break
-
-                task_info = download_tasks.get(task_key, {})
-                if task_info.get('cancel_requested'):
-                    process.terminate()
-                    raise Exception("Download cancelled by user.")
-
-                match = PROGRESS_RE.search(line.strip())
-                if match:
-                    data = match.groupdict()
-                    percentage = float(data['percent'])
-                    speed = data['speed']
-
-                    if task_key in download_tasks:
-                        download_tasks[task_key]['progress'] = int(percentage)
-                        download_tasks[task_key]['speed_str'] = speed
-                        download_tasks[task_key]['status'] = 'downloading'
-
-            process.stdout.close()
-            return_code = process.wait()
-            print(f"DEBUG: yt-dlp process for {task_key} finished with code {return_code}")
-
-            task_info = download_tasks.get(task_key, {})
-            if task_info.get('cancel_requested'):
-                raise Exception("Download cancelled by user.")
-
-            if return_code == 0:
-                # --- FIX 2: Simplify file check ---
-                # We told yt-dlp to create 'filepath'. We just
-                # need to check if that one specific file exists.
-                if os.path.exists(filepath):
-                    task_info['filepath'] = filepath
-                    task_info['download_name'] = os.path.basename(filepath)
-                    task_info['status'] = 'complete'
-                    task_info['progress'] = 100
-                    task_info['speed_str'] = "Complete"
-                else:
-                    # This error is now 100% correct. It means the merge failed.
-                    raise Exception("Download finished but output file not found. Merge failed.")
-                # --- END FIX 2 ---
+    except Exception as e:
+        task_info['status'] = 'error'
+        task_info['error_message'] = str(e)
+        task_info['speed_str'] = 'Error'
+        app.logger.error(f"Download job error for {task_key}: {e}")
+
+    finally:
+        # Reached only when the job really ended; a crash leaves the journal row and
+        # the partial files in place for resume_incomplete_jobs()
+        shutil.rmtree(work_dir, ignore_errors=True)
+        await asyncio.to_thread(finish_job, app, task_key)
+
+
+def download_storage_key(app, filepath):
+    """Storage key ('<user_id>/<filename>') for a file produced under instance/downloads/<user_id>/."""
+    return os.path.relpath(filepath, os.path.join(app.instance_path, 'downloads')).replace(os.sep, '/')
+
+
+def send_stored_download(key, download_name):
+    """Redirects to a presigned URL (object storage) or streams the file from local storage."""
+    url = storage.downloads.url(key, expires=storage.presign_expires, download_name=download_name)
+    if url:
+        return redirect(url)
+    return send_file(storage.downloads.local_path(key), as_attachment=True, download_name=download_name)
+
+
+def safe_filename(title, fallback, ext):
+    """Builds a filesystem-safe filename from a video title."""
+    safe_title = "".join(c for c in (title or '') if c.isalnum() or c in (' ', '.', '_', '-')).strip()
+    safe_title = safe_title[:60].strip()  # Truncate long titles
+    return f"{safe_title or fallback}.{ext}"
 
-            else:
-                raise Exception(f"yt-dlp exited with error code {return_code}")
 
+def queue_download(app, url, format_id, profile_key, task_key, filepath, concurrent_fragments,
+                   user_id, batch_id=None, journal=True):
+    """Registers a task in download_tasks, journals it, and hands its job to the supervisor."""
+    if journal:
+        record_job(app, task_key, user_id, url, format_id, profile_key, filepath, concurrent_fragments, batch_id)
+
+    download_tasks[task_key] = {
+        'progress': 0, 'status': 'starting', 'filepath': None,
+        'error_message': None, 'speed_str': 'Queued', 'download_name': None,
+        'title': os.path.splitext(os.path.basename(filepath))[0], 'batch_id': batch_id
+    }
+
+    tools.get(app)  # first-use discovery runs on this thread, never on the supervisor loop
+    supervisor.start(app.config['DOWNLOAD_MAX_CONCURRENT'])
+    supervisor.submit(task_key, download_job(app, url, format_id, profile_key, task_key,
+                                             filepath, concurrent_fragments))
+
+
+# --- Batch Expansion Job (playlists / URL lists -> individual download jobs) ---
+async def expand_batch_job(app, batch_id, urls, profile_key, concurrent_fragments, user_id, download_dir):
+    """Expands every URL (playlists included) into entries and queues one job per entry."""
+    batch = download_batches[batch_id]
+    cookies_path = os.path.join(app.instance_path, 'cookies.txt')
+    format_id = best_format(DOWNLOAD_PROFILES[profile_key])
+    file_ext = DOWNLOAD_PROFILES[profile_key]['ext']
+    max_items = app.config['DOWNLOAD_BATCH_MAX_ITEMS']
+
+    for url in urls:
+        entries = []
+
+        def on_line(line):
+            parts = line.split('\t')
+            if len(parts) == 3 and parts[2].startswith('http'):
+                entries.append(parts)
+
+        # --flat-playlist lists a playlist's entries without resolving each video
+        command = (tools.get(app)['ytdlp_command'] or ['yt-dlp']) + [
+            '--cookies', cookies_path,
+            '--no-update',
+            '--flat-playlist', '--yes-playlist',
+            '--print', '%(id)s\t%(title)s\t%(webpage_url,url)s',
+            '--no-warnings',
+            url
+        ]
+
+        try:
+            return_code = await supervisor.run_process(command, on_line, timeout=120)
+        except (asyncio.TimeoutError, OSError) as e:
+            app.logger.error(f"Batch {batch_id}: could not expand {url}: {e!r}")
+            return_code = None
+
+        if return_code != 0 or not entries:
+            batch['errors'].append(url)
+            continue
+
+        for entry_id, title, entry_url in entries:
+            if len(batch['task_keys']) >= max_items:
+                batch['errors'].append(f"{entry_url} (batch limit of {max_items} reached)")
+                continue
+
+            task_key = f"{entry_id}_{profile_key}_b{batch_id}_{user_id}"
+            filepath = os.path.join(download_dir, safe_filename(f"{title} {entry_id}", entry_id, file_ext))
+            batch['task_keys'].append(task_key)
+            # queue_download journals the job (database I/O): off the supervisor loop
+            await asyncio.to_thread(queue_download, app, entry_url, format_id, profile_key, task_key, filepath,
+                                    concurrent_fragments, user_id, batch_id=batch_id)
+
+    batch['status'] = 'queued'
+
+
+def resume_incomplete_jobs(app):
+    """
+    Recovery pass: re-queues journaled jobs whose worker died mid-download.
+    yt-dlp's --continue picks up the partial files, so completed bytes are kept.
+    """
+    jobs = claim_orphaned_jobs(app)
+
+    for job in jobs:
+        if job['profile'] not in DOWNLOAD_PROFILES:
+            finish_job(app, job['task_key'])
+            continue
+
+        if job['batch_id']:
+            batch = download_batches.setdefault(job['batch_id'], {
+                'user_id': job['user_id'], 'status': 'queued', 'task_keys': [], 'errors': []
+            })
+            batch['task_keys'].append(job['task_key'])
+
+        queue_download(app, job['url'], job['format_id'], job['profile'], job['task_key'], job['filepath'],
+                       job['concurrent_fragments'], job['user_id'], batch_id=job['batch_id'], journal=False)
+
+    if jobs:
+        app.logger.info(f"Resumed {len(jobs)} incomplete download job(s).")
+    return len(jobs)
+
+
+_resume_lock = threading.Lock()
+_resume_started = False
+
+
+def _lease_loop(app):
+    """Renews this worker's job leases and (if enabled) re-queues orphaned jobs, forever."""
+    interval = max(app.config['DOWNLOAD_LEASE_SECONDS'] / 3, 1)
+    while True:
+        try:
+            renew_leases(app)
+            if app.config['DOWNLOAD_RESUME_ON_STARTUP']:
+                resume_incomplete_jobs(app)
         except Exception as e:
-            print(f"DEBUG: Exception in download thread for {task_key}: {e}")
-            if task_key in download_tasks:
-                task_info = download_tasks[task_key]
-                if "cancelled by user" in str(e):
-                    task_info['status'] = 'cancelled'
-                    task_info['speed_str'] = 'Cancelled'
-                    if os.path.exists(filepath):
-                        try:
-                            os.remove(filepath)
-                        except OSError:
-                            pass
-                else:
-                    task_info['status'] = 'error'
-                    task_info['error_message'] = str(e)
-                    task_info['speed_str'] = 'Error'
-                    current_app.logger.error(f"Download thread error for {task_key}: {e}")
+            app.logger.error(f"Download lease pass failed: {e}")
+        time.sleep(interval)
+
+
+@downloader.before_app_request
+def resume_on_first_request():
+    """
+    Starts the lease thread once per worker process when it serves its first request
+    (worker boot itself never touches the journal). Its first pass resumes jobs of
+    crashed local workers; jobs of other dead owners follow once their lease is stale.
+    """
+    global _resume_started
+    if _resume_started:
+        return
+    with _resume_lock:
+        if _resume_started:
+            return
+        _resume_started = True
+
+    app = current_app._get_current_object()
+    threading.Thread(target=_lease_loop, args=(app,), name='download-lease', daemon=True).start()
+
+
+def build_download_options(data, url, profile_key, user_id, build_url):
+    """
+    (title, options) for a probed video: one option per stream usable by the profile.
+    build_url has url_for's signature; shared by the WSGI view and the async probe (app/asgi.py).
+    """
+    profile = DOWNLOAD_PROFILES[profile_key]
+    video_title = data.get('title', 'Unknown Title')
+    video_id = data.get('id', 'unknown_id')
+
+    # Streams usable by the chosen profile (video-only + merged audio, or audio-only)
+    options = []
+    for stream in select_streams(data.get('formats', []), profile):
+        format_id = stream.get('format_id')
+        task_key = f"{video_id}_{format_id}_{profile_key}_{user_id}"
+
+        # Pass URL, Title and Profile to the initiate step
+        initiate_url = build_url('downloader.initiate_download',
+                                 format_id=format_id,
+                                 task_key=task_key,
+                                 url=url,
+                                 title=video_title,
+                                 profile=profile_key)
+
+        file_size = stream.get('filesize') or stream.get('filesize_approx') or 0
+        if profile['kind'] == 'audio':
+            resolution = f"{stream.get('ext', 'audio')} {round(stream.get('abr') or 0)}kbps"
+        else:
+            resolution = stream.get('resolution', stream.get('format_note', 'Unknown'))
+
+        options.append({
+            'resolution': resolution,
+            'url': initiate_url,
+            'task_key': task_key,
+            'size_mb': round(file_size / (1024 * 1024), 2)
+        })
+    return video_title, options
+
+
+def task_status_payload(task_key, task, build_url):
+    """JSON body of a status poll; shared by download_status and its async twin (app/asgi.py)."""
+    response_data = {
+        'status': task['status'],
+        'progress': task['progress'],
+        'speed_str': task.get('speed_str', '')
+    }
+
+    if task['status'] == 'complete':
+        response_data['download_url'] = build_url('downloader.get_final_file', task_key=task_key)
+    elif task['status'] == 'error':
+        response_data['message'] = task.get('error_message', 'An unknown error occurred.')
+    return response_data
 
 
 @downloader.route('/download', methods=['GET', 'POST'])
 @login_required
 def download():
-    """Handles the initial form display and processes URL to show download options."""
+    """
+    Handles the initial form display and processes URL to show download options.
+    Only posted to without JavaScript: downloader.js probes through probe_options, which
+    the ASGI entry point serves without holding a worker.
+    """
     form = YouTubeDownloaderForm()
+    form.profile.choices = profile_choices()
     video_title = None
     download_options = []
 
     if form.validate_on_submit():
         url = form.youtube_url.data
+        profile_key = form.profile.data
         cookies_path = os.path.join(current_app.instance_path, 'cookies.txt')
 
         try:
-            # Use yt-dlp to get video info as JSON
-            command = [
-                'yt-dlp',
-                '--cookies', cookies_path,  # Use cookies to get all data
-                '--no-update',  # <-- FIX: Stops checking for updates
-                '--no-call-home',  # <-- FIX: Stops reporting errors
-                '--dump-json',
-                '--no-playlist',
-                url
-            ]
+            # Video info as a dict (in-process yt_dlp API, or 'yt-dlp --dump-json' as a fallback)
+            data = probe(current_app, url, cookies_path, timeout=120)  # 2-minute timeout
+            video_title, download_options = build_download_options(data, url, profile_key, current_user.id, url_for)
 
-            # Use subprocess.run for a blocking call with a timeout
-            result = subprocess.run(
-                command,
-                capture_output=True, text=True, encoding='utf-8',
-                check=True, timeout=120  # 2-minute timeout
-            )
-
-            data = json.loads(result.stdout)
-            video_title = data.get('title', 'Unknown Title')
-            video_id = data.get('id', 'unknown_id')
-
-            # Get video-only streams (yt-dlp will merge audio)
-            streams = [
-                f for f in data.get('formats', [])
-                if f.get('vcodec') != 'none' and f.get('acodec') == 'none'
-            ]
-            streams.sort(key=lambda x: x.get('height', 0), reverse=True)  # Best quality first
-
-            if streams:
-                for stream in streams:
-                    format_id = stream.get('format_id')
-                    task_key = f"{video_id}_{format_id}_{current_user.id}"
-
-                    # Pass URL and Title to the initiate step
-                    initiate_url = url_for('downloader.initiate_download',
-                                           format_id=format_id,
-                                           task_key=task_key,
-                                           url=url,
-                                           title=video_title)
-
-                    file_size = stream.get('filesize') or stream.get('filesize_approx') or 0
-                    resolution = stream.get('resolution', stream.get('format_note', 'Unknown'))
-
-                    download_options.append({
-                        'resolution': resolution,
-                        'url': initiate_url,
-                        'task_key': task_key,
-                        'size_mb': round(file_size / (1024 * 1024), 2)
-                    })
+            if download_options:
                 flash(f'Processing "{video_title}". Choose a download option below.', 'info')
             else:
-                flash('No suitable MP4 streams found for this video.', 'error')
+                flash('No suitable streams found for this video and profile.', 'error')
 
-        except subprocess.TimeoutExpired:
+        except ProbeTimeout:
             flash('Error: Timed out trying to get video data. The site might be slow or blocking (check cookies).',
                   'error')
-        except subprocess.CalledProcessError as e:
+        except ProbeError as e:
             flash(f'Error fetching video data. Check URL. (yt-dlp error)', 'error')
-            current_app.logger.error(f"yt-dlp JSON error: {e.stderr}")
+            current_app.logger.error(f"yt-dlp probe error: {e}")
         except Exception as e:
             flash(f'An unexpected error occurred: {e}', 'error')
             current_app.logger.error(f"Downloader processing error: {e}")
@@ -220,45 +451,73 @@ def download():
                            active_page='downloader')
 
 
+def probe_arguments(args):
+    """(url, profile_key) of a JSON probe request; raises ValueError with a client-facing message."""
+    url = (args.get('url') or '').strip()
+    profile_key = args.get('profile', DEFAULT_PROFILE)
+    if not url.startswith(('http://', 'https://')):
+        raise ValueError('Missing or invalid URL parameter.')
+    if profile_key not in DOWNLOAD_PROFILES:
+        raise ValueError('Unknown download profile.')
+    return url, profile_key
+
+
+@downloader.route('/probe')
+@login_required
+def probe_options():
+    """
+    JSON variant of the form's probe: {'title', 'options'}. Under the ASGI entry point
+    (app/asgi.py) an async twin serves this URL without holding a worker for up to 120s.
+    """
+    try:
+        url, profile_key = probe_arguments(request.args)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    cookies_path = os.path.join(current_app.instance_path, 'cookies.txt')
+    try:
+        data = probe(current_app, url, cookies_path, timeout=120)
+    except ProbeTimeout:
+        return jsonify({'status': 'error', 'message': 'Timed out fetching video data.'}), 504
+    except ProbeError as e:
+        current_app.logger.error(f"yt-dlp probe error: {e}")
+        return jsonify({'status': 'error', 'message': 'Error fetching video data. Check URL.'}), 502
+
+    title, options = build_download_options(data, url, profile_key, current_user.id, url_for)
+    return jsonify({'status': 'ok', 'title': title, 'options': options})
+
+
 @downloader.route('/initiate/<string:format_id>/<string:task_key>')
 @login_required
 def initiate_download(format_id, task_key):
-    """Starts the download process in a background thread."""
+    """Queues the download job on the download supervisor."""
     global download_tasks
 
-    if task_key in download_tasks and download_tasks[task_key]['status'] == 'downloading':
+    if not valid_task_key(task_key, current_user.id):
+        return jsonify({'status': 'error', 'message': 'Invalid task key.'}), 400
+    if task_key in download_tasks and download_tasks[task_key]['status'] in ('starting', 'downloading', 'processing'):
         return jsonify({'status': 'already_running', 'progress': download_tasks[task_key]['progress']})
+    if supervisor.is_active(task_key):
+        # A cancelled job still cleaning up its work directory and journal row
+        return jsonify({'status': 'error', 'message': 'The previous download is still stopping. Try again shortly.'}), 409
 
     url = request.args.get('url')
     video_title = request.args.get('title')
+    profile_key = request.args.get('profile', DEFAULT_PROFILE)
 
     if not url:
         return jsonify({'status': 'error', 'message': 'Missing URL parameter.'}), 400
-
-    # Create a safe filename. We'll add .mp4, but yt-dlp might change it.
-    if video_title:
-        safe_title = "".join(c for c in video_title if c.isalnum() or c in (' ', '.', '_', '-')).rstrip().strip()
-        safe_title = safe_title[:60]  # Truncate long titles
-        safe_filename = f"{safe_title}.mp4"
-    else:
-        safe_filename = f"{task_key.split('_')[0]}.mp4"
+    if profile_key not in DOWNLOAD_PROFILES:
+        return jsonify({'status': 'error', 'message': 'Unknown download profile.'}), 400
+    file_ext = DOWNLOAD_PROFILES[profile_key]['ext']
 
     download_dir = os.path.join(current_app.instance_path, 'downloads', str(current_user.id))
     os.makedirs(download_dir, exist_ok=True)
-    filepath = os.path.join(download_dir, safe_filename)  # This is the *target* filepath
-
-    app = current_app._get_current_object()  # <-- ADD THIS to get the real app
-
-    thread = threading.Thread(
-        target=download_process_thread,
-        args=(app, url, format_id, task_key, filepath)  # <-- ADD 'app' as the first arg
-    )
+    # This is the *target* filepath, named after the title with the profile's extension
+    filepath = os.path.join(download_dir, safe_filename(video_title, task_key.split('_')[0], file_ext))
 
-    download_tasks[task_key] = {
-        'progress': 0, 'status': 'starting', 'thread': thread, 'process': None,
-        # ... rest of the dict
-    }
-    thread.start()
+    queue_download(current_app._get_current_object(), url, format_id, profile_key, task_key, filepath,
+                   current_app.config['DOWNLOAD_CONCURRENT_FRAGMENTS'], current_user.id)
 
     return jsonify({'status': 'started', 'task_key': task_key})
 
@@ -273,18 +532,97 @@ def download_status(task_key):
     if not task or not task_key.endswith(f"_{current_user.id}"):
         return jsonify({'status': 'not_found', 'message': 'Task not found or unauthorized.'}), 404
 
-    response_data = {
-        'status': task['status'],
-        'progress': task['progress'],
-        'speed_str': task.get('speed_str', '')
-    }
+    return jsonify(task_status_payload(task_key, task, url_for))
+
+
+@downloader.route('/batch', methods=['GET', 'POST'])
+@login_required
+def batch_download():
+    """Accepts playlists and/or a list of URLs and queues one job per video."""
+    form = BatchDownloadForm()
+    form.profile.choices = profile_choices()
+
+    if form.validate_on_submit():
+        urls = [line.strip() for line in form.urls.data.splitlines() if line.strip()]
+        invalid = [u for u in urls if not u.startswith(('http://', 'https://'))]
+        if invalid:
+            flash(f'Invalid URL: {invalid[0]}', 'error')
+            return render_template('downloader_batch.html', title='Batch Downloader', form=form,
+                                   active_page='downloader')
+
+        download_dir = os.path.join(current_app.instance_path, 'downloads', str(current_user.id))
+        os.makedirs(download_dir, exist_ok=True)
+
+        batch_id = secrets.token_hex(4)
+        download_batches[batch_id] = {
+            'user_id': current_user.id, 'status': 'expanding', 'task_keys': [], 'errors': []
+        }
+
+        app = current_app._get_current_object()
+        tools.get(app)
+        supervisor.start(app.config['DOWNLOAD_MAX_CONCURRENT'])
+        # Expansion is itself a supervised job, so a long playlist never blocks this request
+        supervisor.submit(f"batch_{batch_id}", expand_batch_job(
+            app, batch_id, urls, form.profile.data, form.concurrent_fragments.data,
+            current_user.id, download_dir
+        ))
+
+        flash(f'Batch queued: {len(urls)} URL(s). Playlists are being expanded...', 'info')
+        return render_template('downloader_batch.html', title='Batch Downloader', form=form,
+                               batch_id=batch_id, active_page='downloader')
+
+    return render_template('downloader_batch.html', title='Batch Downloader', form=form,
+                           active_page='downloader')
 
-    if task['status'] == 'complete':
-        response_data['download_url'] = url_for('downloader.get_final_file', task_key=task_key)
-    elif task['status'] == 'error':
-        response_data['message'] = task.get('error_message', 'An unknown error occurred.')
 
-    return jsonify(response_data)
+@downloader.route('/batch-status/<string:batch_id>')
+@login_required
+def batch_status(batch_id):
+    """Aggregated progress for every job in a batch, plus per-item status."""
+    batch = download_batches.get(batch_id)
+
+    if not batch or batch['user_id'] != current_user.id:
+        return jsonify({'status': 'not_found', 'message': 'Batch not found or unauthorized.'}), 404
+
+    items = []
+    counts = {}
+    for task_key in batch['task_keys']:
+        task = download_tasks.get(task_key)
+        # Files already served (or cleaned up) drop out of download_tasks
+        status = task['status'] if task else 'served'
+        counts[status] = counts.get(status, 0) + 1
+
+        item = {
+            'task_key': task_key,
+            'title': task.get('title') if task else task_key.split('_')[0],
+            'status': status,
+            'progress': 100 if status in ('complete', 'served') else (task['progress'] if task else 0),
+            'speed_str': task.get('speed_str', '') if task else ''
+        }
+        if status == 'complete':
+            item['download_url'] = url_for('downloader.get_final_file', task_key=task_key)
+        elif status == 'error':
+            item['message'] = task.get('error_message', 'An unknown error occurred.')
+        items.append(item)
+
+    total = len(items)
+    finished = sum(counts.get(s, 0) for s in ('complete', 'served', 'error', 'cancelled'))
+    overall = round(sum(item['progress'] for item in items) / total) if total else 0
+
+    if batch['status'] == 'expanding':
+        status = 'expanding'
+    else:
+        status = 'complete' if finished == total else 'downloading'
+
+    return jsonify({
+        'status': status,
+        'total': total,
+        'finished': finished,
+        'progress': overall,
+        'counts': counts,
+        'errors': batch['errors'],
+        'items': items
+    })
 
 
 @downloader.route('/get_final/<string:task_key>')
@@ -294,19 +632,19 @@ def get_final_file(task_key):
     global download_tasks
     task = download_tasks.get(task_key)
 
-    if not task or not task_key.endswith(f"_{current_user.id}") or task['status'] != 'complete' or not task['filepath']:
+    if not task or not task_key.endswith(f"_{current_user.id}") or task['status'] != 'complete' or not task.get('storage_key'):
         flash('Download not found, not complete, or unauthorized.', 'error')
         return redirect(url_for('downloader.download'))
 
-    # Read the final, correct filepath and name from the task
-    file_path = task['filepath']
+    # Read the final storage key and name from the task
+    storage_key = task['storage_key']
     download_name = task.get('download_name', 'download.mp4')
 
-    if os.path.exists(file_path):
+    if storage.downloads.exists(storage_key):
         # Clean up the task from memory after serving it
         if task_key in download_tasks:
             del download_tasks[task_key]
-        return send_file(file_path, as_attachment=True, download_name=download_name)
+        return send_stored_download(storage_key, download_name)
     else:
         flash('Error: Downloaded file is missing on the server.', 'error')
         if task_key in download_tasks: del download_tasks[task_key]
@@ -324,16 +662,13 @@ def cancel_download(task_key):
         return jsonify({'status': 'not_found'}), 404
 
     if task['status'] == 'downloading' or task['status'] == 'starting':
-        print(f"DEBUG: Requesting cancellation for {task_key}")
-        task['cancel_requested'] = True  # Set the flag for the thread
-
-        process = task.get('process')
-        if process:
-            try:
-                process.terminate()  # Terminate the subprocess
-                print(f"DEBUG: Terminated process for {task_key}")
-            except Exception as e:
-                print(f"DEBUG: Error terminating process for {task_key}: {e}")
+        # The supervisor cancels the job on its loop and kills the subprocess at once
+        supervisor.cancel(task_key)
+        if task['status'] == 'starting':
+            # Still queued: the job never ran, so nothing else will mark it
+            task['status'] = 'cancelled'
+            task['speed_str'] = 'Cancelled'
+            finish_job(current_app._get_current_object(), task_key)
 
         return jsonify({'status': 'cancel_requested'})
     else:
@@ -347,22 +682,16 @@ def cancel_download(task_key):
 def my_files():
     """Displays a list of all files downloaded by the user."""
     files_list = []
-    user_download_dir = os.path.join(current_app.instance_path, 'downloads', str(current_user.id))
-    if os.path.exists(user_download_dir):
-        try:
-            filenames = os.listdir(user_download_dir)
-            for f in filenames:
-                # Check for all formats yt-dlp might save
-                if f.endswith(('.mp4', '.mkv', '.webm', '.mp3', '.m4a')):
-                    filepath = os.path.join(user_download_dir, f)
-                    try:
-                        file_size_mb = round(os.path.getsize(filepath) / (1024 * 1024), 2)
-                        files_list.append({'name': f, 'size_mb': file_size_mb})
-                    except OSError:
-                        continue
-        except Exception as e:
-            flash(f"Error reading downloads directory: {e}", "error")
-            current_app.logger.error(f"Error listing files for user {current_user.id}: {e}")
+    prefix = f"{current_user.id}/"
+    try:
+        for obj in storage.downloads.list(prefix):
+            # Check for all formats yt-dlp might save
+            if obj.key.endswith(('.mp4', '.mkv', '.webm', '.mp3', '.m4a')):
+                file_size_mb = round(obj.size / (1024 * 1024), 2)
+                files_list.append({'name': obj.key[len(prefix):], 'size_mb': file_size_mb})
+    except Exception as e:
+        flash(f"Error reading downloads directory: {e}", "error")
+        current_app.logger.error(f"Error listing files for user {current_user.id}: {e}")
     files_list.sort(key=lambda x: x['name'])
     return render_template('downloader_files.html',
                            files=files_list,
@@ -373,16 +702,20 @@ def my_files():
 @downloader.route('/get-file/<path:filename>')
 @login_required
 def get_file(filename):
-    """Securely serves a file from the user's specific download directory."""
-    user_download_dir = os.path.join(current_app.instance_path, 'downloads', str(current_user.id))
-
+    """Securely serves a file from the user's own downloads (local file or presigned URL)."""
     if '/' in filename or '\\' in filename:
         abort(400, "Invalid filename (path traversal detected).")
 
+    storage_key = f"{current_user.id}/{filename}"
     try:
-        return send_from_directory(user_download_dir, filename, as_attachment=True)
-    except FileNotFoundError:
+        found = storage.downloads.exists(storage_key)
+    except StorageError:
+        abort(400, "Invalid filename.")
+    if not found:
         abort(404)
+
+    try:
+        return send_stored_download(storage_key, filename)
     except Exception as e:
         current_app.logger.error(f"Error serving file {filename} for user {current_user.id}: {e}")
         abort(500)
@@ -391,17 +724,15 @@ def get_file(filename):
 @downloader.route('/delete-file/<path:filename>', methods=['POST'])
 @login_required
 def delete_file(filename):
-    """Deletes a file from the user's specific download directory."""
-    user_download_dir = os.path.join(current_app.instance_path, 'downloads', str(current_user.id))
-
+    """Deletes a file from the user's own downloads."""
     if '/' in filename or '\\' in filename:
         abort(400, "Invalid filename (path traversal detected).")
 
-    file_path = os.path.join(user_download_dir, filename)
+    storage_key = f"{current_user.id}/{filename}"
 
     try:
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        if storage.downloads.exists(storage_key):
+            storage.downloads.delete(storage_key)
             flash(f'"{filename}" has been deleted successfully.', 'success')
         else:
             flash('File not found.', 'error')
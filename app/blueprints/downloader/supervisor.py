@@ -0,0 +1,158 @@
+#downloader/supervisor.py
+
+import asyncio
+import os
+import threading
+
+
+class DownloadSupervisor:
+    """
+    Owns a single asyncio event loop (running in one daemon thread) that
+    manages every yt-dlp subprocess. Jobs are coroutines scheduled onto the loop,
+    so any number of monitored downloads costs one thread instead of one each.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self._thread = None
+        self._semaphore = None
+        self._jobs = {}  # { task_key: asyncio.Task }
+        self._pending = set()  # task_keys submitted but not yet scheduled on the loop
+        self._pending_lock = threading.Lock()
+        self._running = 0  # jobs holding a semaphore slot
+        self._processes = 0  # live subprocesses
+        self._start_lock = threading.Lock()
+
+    # ------------------------------------------------------
+    # 1. LIFECYCLE
+    # ------------------------------------------------------
+
+    def start(self, max_concurrent=4):
+        """Starts the event loop thread once. Safe to call on every submit."""
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+
+            self.loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run_loop():
+                asyncio.set_event_loop(self.loop)
+                # The semaphore must be created on the loop that uses it
+                self._semaphore = asyncio.Semaphore(max_concurrent)
+                ready.set()
+                self.loop.run_forever()
+
+            self._thread = threading.Thread(target=run_loop, name='download-supervisor', daemon=True)
+            self._thread.start()
+            ready.wait()
+
+    # ------------------------------------------------------
+    # 2. JOB MANAGEMENT (called from request threads)
+    # ------------------------------------------------------
+
+    def submit(self, task_key, coro):
+        """Schedules a job coroutine on the supervisor loop under task_key."""
+
+        def forget(job):
+            # Only if the key still maps to this job, never to a newer one for the same key
+            if self._jobs.get(task_key) is job:
+                del self._jobs[task_key]
+
+        def schedule():
+            job = self.loop.create_task(self._guarded(coro))
+            self._jobs[task_key] = job
+            with self._pending_lock:
+                self._pending.discard(task_key)
+            job.add_done_callback(forget)
+
+        with self._pending_lock:
+            self._pending.add(task_key)
+        self.loop.call_soon_threadsafe(schedule)
+
+    def is_active(self, task_key):
+        """True while a job for task_key is queued, running or still winding down after a cancel."""
+        with self._pending_lock:
+            return task_key in self._pending or task_key in self._jobs
+
+    def cancel(self, task_key):
+        """Cancels a job immediately; its subprocess is killed by run_process."""
+        if not self.loop:
+            return False
+
+        def cancel_job():
+            job = self._jobs.get(task_key)
+            if job:
+                job.cancel()
+
+        self.loop.call_soon_threadsafe(cancel_job)
+        return True
+
+    def active_count(self):
+        """Number of jobs currently scheduled (queued or running)."""
+        return len(self._jobs)
+
+    def running_count(self):
+        """Number of jobs that hold a slot, i.e. are actually running."""
+        return self._running
+
+    def queued_count(self):
+        """Number of jobs waiting for a free slot."""
+        return max(len(self._jobs) - self._running, 0)
+
+    def process_count(self):
+        """Number of live subprocesses (yt-dlp, playlist expansion)."""
+        return self._processes
+
+    async def _guarded(self, coro):
+        """Bounds the number of jobs that hold a subprocess at the same time."""
+        try:
+            async with self._semaphore:
+                self._running += 1
+                try:
+                    return await coro
+                finally:
+                    self._running -= 1
+        finally:
+            # A job cancelled while still queued never started; close it quietly
+            coro.close()
+
+    # ------------------------------------------------------
+    # 3. SUBPROCESS HELPER (runs on the loop)
+    # ------------------------------------------------------
+
+    async def run_process(self, command, on_line, timeout=None):
+        """
+        Runs a command, feeding each line of its merged stdout/stderr to on_line.
+        Returns the exit code. On timeout or cancellation the process is killed
+        before the exception propagates.
+        """
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            creationflags=0x08000000 if os.name == 'nt' else 0  # CREATE_NO_WINDOW
+        )
+        self._processes += 1
+
+        async def pump():
+            while True:
+                raw = await process.stdout.readline()
+                if not raw:
+                    break
+                on_line(raw.decode('utf-8', errors='replace').strip())
+            return await process.wait()
+
+        try:
+            return await asyncio.wait_for(pump(), timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
+        finally:
+            self._processes -= 1
+
+
+# Shared instance used by the downloader blueprint
+supervisor = DownloadSupervisor()
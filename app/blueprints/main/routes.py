@@ -4,12 +4,14 @@ from flask import Blueprint, render_template, redirect, url_for, request  # Remo
 from flask_login import current_user
 # We rely on app/__init__.py and flask to make the DB available
 from app.models import Post
+from app.database import replica_reads
 
 main = Blueprint('main', __name__, template_folder='templates')
 
 
 @main.route('/')
 @main.route('/home')
+@replica_reads
 def home():
     """
     Renders the homepage/dashboard, safely fetching recent posts.
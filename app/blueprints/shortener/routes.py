@@ -1,7 +1,9 @@
 from flask import Blueprint, render_template, redirect, url_for, flash
 from flask_login import login_required, current_user
+from sqlalchemy import update
 from sqlalchemy.exc import IntegrityError
 from app import db
+from app.database import replica_reads, READ_YOUR_WRITES
 from app.models import ShortLink
 from app.forms import ShortenerForm
 from app.utils import generate_short_code
@@ -49,7 +51,7 @@ def create():
         new_link = ShortLink(
             url=original_url,
             short_url=short_code,
-            link_creator=current_user  # Using the cleaner SQLAlchemy relationship assignment
+            user_id=current_user.id  # current_user may be a CachedUser, not a mapped User
         )
 
         try:
@@ -89,6 +91,7 @@ def index():
 
 
 @short.route('/<string:code>')
+@replica_reads
 def redirect_to_url(code):
     """
     Handles the redirection from the short code to the original URL.
@@ -97,10 +100,15 @@ def redirect_to_url(code):
     link = ShortLink.query.filter_by(short_url=code).first()
 
     if link:
-        # Increment click count and redirect
-        link.clicks += 1
+        # Increment click count in one atomic UPDATE on the primary: concurrent clicks are
+        # never lost, and the row read here may come from a (lagging) replica. The visitor
+        # never reads the counter back, so the write does not pin them to the primary.
+        url = link.url
+        db.session.execute(update(ShortLink).where(ShortLink.id == link.id)
+                           .values(clicks=ShortLink.clicks + 1)
+                           .execution_options(**{READ_YOUR_WRITES: False, 'synchronize_session': False}))
         db.session.commit()
-        return redirect(link.url)
+        return redirect(url)
     else:
         # Custom flash error instead of dedicated 404 template (for consistency)
         flash(f'Error: The short link "{code}" does not exist.', 'error')
@@ -0,0 +1,185 @@
+# database.py
+
+import time
+import random
+from flask import g, request, session, current_app
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.dml import UpdateBase
+
+SQLITE_JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+SQLITE_SYNCHRONOUS_LEVELS = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+
+
+def _is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+# ------------------------------------------------------
+# 1. ENGINE OPTIONS (server databases)
+# ------------------------------------------------------
+
+def engine_options(config):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for the configured database. PostgreSQL/MySQL get an
+    explicitly sized QueuePool per worker process; SQLite keeps Flask-SQLAlchemy's
+    defaults (its tuning happens per connection, see below).
+    """
+    if _is_sqlite(config['SQLALCHEMY_DATABASE_URI']):
+        return {}
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        # Reconnect before server/proxy idle timeouts close the socket under us
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        # One cheap round trip on checkout instead of a failed request after a failover
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+
+
+# ------------------------------------------------------
+# 2. SQLITE PRAGMAS (applied to every new connection)
+# ------------------------------------------------------
+
+def sqlite_pragmas(config):
+    """The PRAGMA statements run on each new SQLite connection, in order."""
+    journal_mode = config['SQLITE_JOURNAL_MODE'].upper()
+    synchronous = config['SQLITE_SYNCHRONOUS'].upper()
+    if journal_mode not in SQLITE_JOURNAL_MODES:
+        raise ValueError(f"SQLITE_JOURNAL_MODE must be one of {sorted(SQLITE_JOURNAL_MODES)}")
+    if synchronous not in SQLITE_SYNCHRONOUS_LEVELS:
+        raise ValueError(f"SQLITE_SYNCHRONOUS must be one of {sorted(SQLITE_SYNCHRONOUS_LEVELS)}")
+
+    return [
+        # WAL: readers never block on a writer and vice versa (one writer at a time)
+        f"PRAGMA journal_mode={journal_mode}",
+        # NORMAL is durable across app crashes in WAL mode; only an OS crash can lose the last commits
+        f"PRAGMA synchronous={synchronous}",
+        # Wait for the write lock instead of failing with 'database is locked'
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        # Reads served from the OS page cache instead of copied through SQLite's own cache
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+    ]
+
+
+def configure_engine(engine, config):
+    """Attaches the connect-time tuning for this engine's backend."""
+    if engine.dialect.name != 'sqlite':
+        return
+
+    pragmas = sqlite_pragmas(config)
+
+    @event.listens_for(engine, 'connect')
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+# ------------------------------------------------------
+# 3. READ REPLICAS
+# ------------------------------------------------------
+
+REPLICA_BIND_PREFIX = 'replica-'
+STICKY_SESSION_KEY = '_db_primary_until'
+# Execution option for writes the client never reads back (e.g. click counters): they go to
+# the primary but do not pin the client to it, so no read-your-writes session cookie is set
+READ_YOUR_WRITES = 'read_your_writes'
+
+
+def replica_binds(config):
+    """SQLALCHEMY_BINDS entries for the configured replicas: {'replica-0': url, ...}."""
+    return {f"{REPLICA_BIND_PREFIX}{index}": url for index, url in enumerate(config['DATABASE_REPLICA_URLS'])}
+
+
+def replica_reads(view):
+    """
+    Marks a view whose reads may be served by a read replica. Its writes still go to
+    the primary, but read-modify-write must be a single atomic UPDATE: the value read
+    may lag behind the primary.
+    """
+    view.replica_reads = True
+    return view
+
+
+class RoutingSession(Session):
+    """
+    Sends the reads of @replica_reads views to the replica picked for the request
+    (g.db_replica); flushes and INSERT/UPDATE/DELETE statements always go to the
+    primary and are recorded in g.db_wrote, unless executed with
+    execution_options(read_your_writes=False). After a recorded write the rest of the
+    request reads from the primary too. Outside requests, or without replicas, it
+    behaves exactly like the default session.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and g and 'db_replica' in g:
+            if isinstance(clause, UpdateBase):
+                if clause.get_execution_options().get(READ_YOUR_WRITES, True):
+                    g.db_wrote, g.db_replica = True, None
+            elif self._flushing:
+                g.db_wrote, g.db_replica = True, None
+            elif g.db_replica is not None:
+                return self._db.engines[g.db_replica]
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _route_request():
+    """Picks a replica for @replica_reads views, unless this client must read its own writes."""
+    g.db_replica = None
+    view = current_app.view_functions.get(request.endpoint)
+    if not getattr(view, 'replica_reads', False):
+        return
+    if session.get(STICKY_SESSION_KEY, 0) > time.time():
+        return  # Wrote recently: the replicas may not have replayed it yet
+    g.db_replica = random.choice(current_app.extensions['db_replicas'])
+
+
+def _stick_to_primary(response):
+    """After a client's own write, its reads stay on the primary for DATABASE_REPLICA_STICKY_SECONDS."""
+    if g.get('db_wrote'):
+        session[STICKY_SESSION_KEY] = time.time() + current_app.config['DATABASE_REPLICA_STICKY_SECONDS']
+    return response
+
+
+def init_app(app, db):
+    """Applies configure_engine to every engine (default and binds) and enables replica routing."""
+    with app.app_context():
+        for engine in db.engines.values():
+            configure_engine(engine, app.config)
+
+    replicas = sorted(replica_binds(app.config))
+    app.extensions['db_replicas'] = replicas
+    if replicas:
+        app.before_request(_route_request)
+        app.after_request(_stick_to_primary)
+
+
+# ------------------------------------------------------
+# 4. DATABASES CREATED BEFORE MIGRATIONS (db.create_all at boot)
+# ------------------------------------------------------
+
+def unversioned_schema_revision(engine):
+    """
+    For a database built by the old db.create_all() (tables but no alembic_version):
+    the newest migration its schema already matches, to be stamped before
+    'flask db upgrade'. None for an empty or already versioned database.
+    """
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    if 'user' not in tables:
+        return None
+    if 'alembic_version' in tables:
+        with engine.connect() as connection:
+            if connection.execute(text('SELECT version_num FROM alembic_version')).first() is not None:
+                return None  # An empty table is left behind by an interrupted stamp
+    if 'download_job' in tables:
+        return '5b1f0c7e9a12'  # add_download_job_journal
+    if 'date_created' in {column['name'] for column in inspector.get_columns('short_link')}:
+        return '244ab6d677e7'  # add_date_created_to_shortlink_model
+    return '1a0c3d9e2b47'  # initial_schema
@@ -3,10 +3,10 @@
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileAllowed
 from wtforms import (
-    StringField, EmailField, PasswordField, SubmitField, TextAreaField, URLField
+    StringField, EmailField, PasswordField, SubmitField, TextAreaField, URLField, SelectField, IntegerField
 )
 from wtforms.validators import (
-    DataRequired, Email, Length, EqualTo, URL
+    DataRequired, Email, Length, EqualTo, URL, NumberRange
 )
 
 # --- Authentication Forms ---
@@ -59,4 +59,14 @@ class ShortenerForm(FlaskForm):
 
 class YouTubeDownloaderForm(FlaskForm):
     youtube_url = StringField('YouTube Video URL', validators=[DataRequired(), URL(message='Please enter a valid YouTube URL.')])
-    submit = SubmitField('Download Video')
\ No newline at end of file
+    # Choices are filled from DOWNLOAD_PROFILES in the downloader route
+    profile = SelectField('Format Profile', choices=[])
+    submit = SubmitField('Download Video')
+
+class BatchDownloadForm(FlaskForm):
+    urls = TextAreaField('Video or Playlist URLs (one per line)', validators=[DataRequired()])
+    # Choices are filled from DOWNLOAD_PROFILES in the downloader route
+    profile = SelectField('Format Profile', choices=[])
+    concurrent_fragments = IntegerField('Parallel Fragments per Video', default=4,
+                                        validators=[NumberRange(min=1, max=16, message='Choose between 1 and 16.')])
+    submit = SubmitField('Queue Batch')
\ No newline at end of file
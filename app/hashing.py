@@ -0,0 +1,90 @@
+# hashing.py
+
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue is full; the route should answer 503 instead of waiting."""
+
+
+def normalize_method(method):
+    """Expands a werkzeug method string to the exact prefix it writes into stored hashes."""
+    parts = method.split(':')
+    if parts[0] == 'pbkdf2':
+        if len(parts) == 1:
+            parts.append('sha256')
+        if len(parts) == 2:
+            parts.append(str(DEFAULT_PBKDF2_ITERATIONS))
+    elif parts[0] == 'scrypt' and len(parts) == 1:
+        parts += ['32768', '8', '1']
+    return ':'.join(parts)
+
+
+class PasswordHasher:
+    """
+    Runs PBKDF2/scrypt in a dedicated, size-limited process pool so a login
+    storm cannot occupy every request worker. At most `workers + queue_size`
+    hashes may be in flight per app process; beyond that HashingBusy is raised.
+    A slot is held until its hash has finished, not until the caller stops
+    waiting, so timed-out hashes still count against the bound.
+    """
+
+    def __init__(self):
+        self.method = normalize_method('pbkdf2:sha256')
+        self.workers = 1
+        self.timeout = 10
+        self._pool = None
+        self._slots = None
+        self._pool_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.method = normalize_method(app.config['PASSWORD_HASH_METHOD'])
+        # Every web worker process has its own pool: by default the cores are split between
+        # them (WEB_CONCURRENCY, as read by gunicorn), so all pools together fit the host
+        self.workers = app.config['PASSWORD_HASH_WORKERS'] or max(
+            1, (os.cpu_count() or 1) // max(app.config['WEB_CONCURRENCY'], 1))
+        self.timeout = app.config['PASSWORD_HASH_TIMEOUT']
+        self._slots = threading.BoundedSemaphore(self.workers + app.config['PASSWORD_HASH_QUEUE'])
+        app.extensions['password_hasher'] = self
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def _run(self, fn, *args):
+        # Backpressure: reject immediately rather than queueing without bound
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy("Too many password operations in progress.")
+        try:
+            future = self._get_pool().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # Released when the hash is done (or cancelled before it started), even if nobody waits
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            future.cancel()  # Only succeeds while still queued; a running hash keeps its slot
+            raise HashingBusy("Password operation timed out.")
+
+    # ------------------------------------------------------
+    # PUBLIC API
+    # ------------------------------------------------------
+
+    def hash(self, password):
+        """Hashes a password with the configured work factor."""
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        """Checks a password against a stored hash (any supported method/work factor)."""
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True if the stored hash was made with different parameters than the current ones."""
+        return password_hash.split('$', 1)[0] != self.method
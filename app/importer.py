@@ -0,0 +1,297 @@
+# importer.py
+
+import io
+import os
+import re
+import csv
+import json
+import time
+import datetime
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from app import db, metrics
+from app.models import Post, Task, ShortLink
+from app.utils import CHARACTERS, SHORT_CODE_LENGTH
+
+try:
+    import orjson  # Optional dependency: faster NDJSON parsing
+except ImportError:
+    orjson = None
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+FORMAT_EXTENSIONS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+FORMAT_MIMETYPES = {'text/csv': 'csv', 'application/x-ndjson': 'ndjson', 'application/jsonl': 'ndjson'}
+
+# Hoisted out of the per-row path: column attribute lookups cost more than the checks themselves
+URL_MAX_LENGTH = ShortLink.__table__.c.url.type.length
+SHORT_URL_MAX_LENGTH = ShortLink.__table__.c.short_url.type.length
+URL_RE = re.compile(r'^https?://[^/?#\s]+\.[^/?#\s]+([/?#]\S*)?$', re.IGNORECASE)
+SHORT_CODE_RE = re.compile(r'^[A-Za-z0-9]+$')
+
+imported_rows = metrics.counter(
+    'import_rows_total', 'Rows read by bulk imports, by resource and result (inserted/rejected).',
+    ('resource', 'result'))
+
+
+class ImportFormatError(ValueError):
+    """The file as a whole cannot be read (missing columns, not UTF-8); no further rows are imported."""
+
+
+class RowError(ValueError):
+    """One row is invalid; it is skipped and reported with its line number."""
+
+
+# ------------------------------------------------------
+# 1. ROW VALIDATION (the same rules as PostForm / TaskForm / ShortenerForm)
+# ------------------------------------------------------
+
+def _text(record, field, max_length=None, required=True):
+    value = record.get(field)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(f"'{field}' is required.")
+    if max_length and len(value) > max_length:
+        raise RowError(f"'{field}' is longer than {max_length} characters.")
+    return value
+
+
+def _timestamp(record, field):
+    """ISO 8601, stored as naive UTC like the rest of the schema; missing = now."""
+    value = record.get(field)
+    if value in (None, ''):
+        return datetime.datetime.utcnow()
+    try:
+        parsed = datetime.datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        raise RowError(f"'{field}' is not an ISO 8601 date.")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _boolean(record, field):
+    value = record.get(field)
+    if isinstance(value, bool):
+        return value
+    value = '' if value is None else str(value).strip().lower()
+    if value in ('', '0', 'false', 'no', 'n'):
+        return False
+    if value in ('1', 'true', 'yes', 'y'):
+        return True
+    raise RowError(f"'{field}' must be true or false.")
+
+
+def _clean_post(record):
+    return {'title': _text(record, 'title', 100), 'content': _text(record, 'content'),
+            'date_posted': _timestamp(record, 'date_posted')}
+
+
+def _clean_task(record):
+    return {'title': _text(record, 'title', 100), 'content': _text(record, 'content'),
+            'completed': _boolean(record, 'completed'), 'date_posted': _timestamp(record, 'date_posted')}
+
+
+def _clean_link(record):
+    url = _text(record, 'url', URL_MAX_LENGTH)
+    if not URL_RE.match(url):
+        raise RowError("'url' is not a valid http(s) URL.")
+    short_url = _text(record, 'short_url', SHORT_URL_MAX_LENGTH, required=False)
+    if short_url and not SHORT_CODE_RE.match(short_url):
+        raise RowError("'short_url' may only contain letters and digits.")
+    try:
+        clicks = int(record.get('clicks') or 0)
+    except (TypeError, ValueError):
+        raise RowError("'clicks' must be an integer.")
+    if clicks < 0:
+        raise RowError("'clicks' must not be negative.")
+    return {'url': url, 'short_url': short_url or None, 'clicks': clicks,
+            'date_created': _timestamp(record, 'date_created')}
+
+
+def _random_codes(count):
+    """
+    `count` codes like generate_short_code(), from one os.urandom() read instead of six
+    secrets.choice() calls per code. Bytes >= 248 are dropped, so every character stays
+    equally likely (248 = 4 * 62).
+    """
+    chars, alphabet = [], len(CHARACTERS)
+    while len(chars) < count * SHORT_CODE_LENGTH:
+        chars += [CHARACTERS[byte % alphabet] for byte in os.urandom(count * SHORT_CODE_LENGTH + 64) if byte < 248]
+    return [''.join(chars[i:i + SHORT_CODE_LENGTH]) for i in range(0, count * SHORT_CODE_LENGTH, SHORT_CODE_LENGTH)]
+
+
+def _claim_short_codes(rows, rejected):
+    """
+    Batch-level check for links: one query for the whole batch finds codes already taken;
+    rows bringing a taken (or repeated) code are rejected, rows without one get a fresh code.
+    """
+    wanted = {row['short_url'] for _, row in rows if row['short_url']}
+    missing = [line for line, row in rows if not row['short_url']]
+    generated = dict(zip(missing, _random_codes(len(missing))))
+    candidates = wanted | set(generated.values())
+    taken = set(db.session.scalars(select(ShortLink.short_url).where(ShortLink.short_url.in_(candidates))))
+
+    claimed, kept = set(), []
+    for line, row in rows:
+        code = row['short_url']
+        if code is None:
+            code = generated[line]
+            while code in taken or code in claimed or code in wanted:
+                code = _random_codes(1)[0]  # Collisions are rare; single lookups are fine here
+                if db.session.scalar(select(ShortLink.id).where(ShortLink.short_url == code)) is not None:
+                    taken.add(code)
+            row['short_url'] = code
+        elif code in taken or code in claimed:
+            rejected(line, f"short code '{code}' is already taken.")
+            continue
+        claimed.add(code)
+        kept.append((line, row))
+    return kept
+
+
+# Importable resources: model, row cleaner, columns a CSV header must have, optional batch check
+IMPORTERS = {
+    'posts': {'model': Post, 'clean': _clean_post, 'required': ('title', 'content')},
+    'tasks': {'model': Task, 'clean': _clean_task, 'required': ('title', 'content')},
+    'links': {'model': ShortLink, 'clean': _clean_link, 'required': ('url',), 'check_batch': _claim_short_codes},
+}
+
+
+# ------------------------------------------------------
+# 2. READERS (streamed: one line in memory at a time)
+# ------------------------------------------------------
+
+def detect_format(filename=None, mimetype=None):
+    """'csv' / 'ndjson' from a MIME type or file extension, else None."""
+    if mimetype in FORMAT_MIMETYPES:
+        return FORMAT_MIMETYPES[mimetype]
+    if filename:
+        for extension, fmt in FORMAT_EXTENSIONS.items():
+            if filename.lower().endswith(extension):
+                return fmt
+    return None
+
+
+def _csv_records(stream, required):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+    missing = [column for column in required if column not in (reader.fieldnames or ())]
+    if missing:
+        raise ImportFormatError(f"CSV header is missing: {', '.join(missing)}.")
+    for record in reader:
+        yield reader.line_num, record
+
+
+def _ndjson_records(stream):
+    loads = orjson.loads if orjson is not None else json.loads
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = loads(line)
+        except ValueError:  # orjson.JSONDecodeError, json.JSONDecodeError and UnicodeDecodeError
+            record = None
+        yield line_number, record if isinstance(record, dict) else None
+
+
+def read_records(stream, fmt, resource):
+    """(line number, dict or None) for every row of a binary stream; None = not a JSON object."""
+    if fmt == 'csv':
+        return _csv_records(stream, IMPORTERS[resource]['required'])
+    return _ndjson_records(stream)
+
+
+# ------------------------------------------------------
+# 3. BULK INSERT (Core insert() per batch, a commit every few batches)
+# ------------------------------------------------------
+
+def import_rows(resource, stream, fmt, user_id, batch_size, transaction_batches, max_errors, progress=None):
+    """
+    Streams rows from `stream` into `resource`, all owned by `user_id`. Rows are cleaned
+    and checked batch_size at a time, each batch is one executemany INSERT (no ORM
+    objects), and every transaction_batches batches are committed, so a large import
+    neither holds one huge transaction open nor pays a commit per row.
+    Invalid rows are skipped; the first max_errors of them (by line) are listed in the report.
+    Each batch runs in a SAVEPOINT: if it hits a constraint (a short code claimed
+    concurrently since the batch check), only that batch is rolled back and retried row
+    by row, the conflicting rows are rejected and the rest of the file is imported.
+    Returns {'resource', 'inserted', 'rejected', 'errors', 'seconds', 'rows_per_sec'},
+    rows_per_sec counting inserted rows only.
+    """
+    spec = IMPORTERS[resource]
+    table = spec['model'].__table__
+    report = {'resource': resource, 'inserted': 0, 'rejected': 0, 'errors': []}
+    started = time.perf_counter()
+
+    def first_errors():
+        # Batch-level rejects are reported after later lines' row errors: keep the lowest lines
+        report['errors'].sort(key=lambda error: error['line'])
+        del report['errors'][max_errors:]
+
+    def rejected(line, message):
+        report['rejected'] += 1
+        report['errors'].append({'line': line, 'message': message})
+        if len(report['errors']) >= 2 * max_errors:
+            first_errors()
+
+    def flush(batch):
+        if spec.get('check_batch'):
+            batch = spec['check_batch'](batch, rejected)
+        if not batch:
+            return
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(table), [dict(row, user_id=user_id) for _, row in batch])
+            report['inserted'] += len(batch)
+            return
+        except IntegrityError:
+            pass
+        for line, row in batch:  # Rare: find the offending rows one savepoint at a time
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(insert(table), [dict(row, user_id=user_id)])
+                report['inserted'] += 1
+            except IntegrityError as e:
+                rejected(line, f"conflicts with an existing row ({str(e.orig).splitlines()[0]}).")
+
+    batch, batches, committed = [], 0, 0
+    try:
+        for line, record in read_records(stream, fmt, resource):
+            if record is None:
+                rejected(line, 'Not a JSON object.')
+                continue
+            try:
+                batch.append((line, spec['clean'](record)))
+            except RowError as e:
+                rejected(line, str(e))
+                continue
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch, batches = [], batches + 1
+                if batches % transaction_batches == 0:
+                    db.session.commit()
+                    committed = report['inserted']
+                    if progress:
+                        progress(report, time.perf_counter() - started)
+        flush(batch)
+        db.session.commit()
+    except (UnicodeDecodeError, csv.Error) as e:
+        db.session.rollback()
+        report['inserted'] = committed
+        problem = 'is not valid UTF-8' if isinstance(e, UnicodeDecodeError) else f"is not valid CSV ({e})"
+        raise ImportFormatError(f"The file {problem}; {committed} rows were imported before the error.")
+    except Exception:
+        db.session.rollback()
+        report['inserted'] = committed
+        raise
+    finally:
+        if metrics.enabled:
+            imported_rows.inc(resource, 'inserted', amount=report['inserted'])
+            imported_rows.inc(resource, 'rejected', amount=report['rejected'])
+
+    first_errors()
+    elapsed = time.perf_counter() - started
+    report['seconds'] = round(elapsed, 3)
+    report['rows_per_sec'] = round(report['inserted'] / elapsed) if elapsed else 0
+    return report
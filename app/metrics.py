@@ -0,0 +1,231 @@
+# metrics.py
+
+import time
+import hmac
+import threading
+from bisect import bisect_left
+from flask import request, g, has_request_context, Response, abort
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SQL_DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+SQL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = (f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+             for name, value in zip(names, values))
+    return '{' + ','.join(pairs) + '}'
+
+
+# ------------------------------------------------------
+# 1. METRIC TYPES (Prometheus text exposition format)
+# ------------------------------------------------------
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name, self.help, self.labels = name, help_text, tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = list(self._values.items())
+        for label_values, value in items:
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+
+
+class Gauge:
+    """A settable gauge, or (with `callback`) one read at scrape time."""
+
+    def __init__(self, name, help_text, labels=(), callback=None):
+        self.name, self.help, self.labels = name, help_text, tuple(labels)
+        self.callback = callback
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} gauge"
+        if self.callback:
+            # Callbacks return a number, or {label_values_tuple: number} for labelled gauges
+            value = self.callback()
+            items = value.items() if isinstance(value, dict) else [((), value)]
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        for label_values, value in items:
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {value}"
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help_text, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # { label_values: [bucket counts..., +Inf count, sum] }
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        names = self.labels + ('le',)
+        for label_values, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(names, label_values + (bound,))} {cumulative}"
+            labels = _format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {series[-1]}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+# ------------------------------------------------------
+# 2. METRICS (extension)
+# ------------------------------------------------------
+
+class Metrics:
+    """
+    Per-process request/SQL instrumentation exposed at /metrics. With several
+    gunicorn workers each process reports its own series; scrape through a
+    per-worker port or aggregate with the Prometheus 'instance' label.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self.enabled = False
+        self.token = None
+
+        self.requests = self.histogram(
+            'http_request_duration_seconds', 'Request latency by endpoint.', ('endpoint', 'method', 'status'))
+        self.response_size = self.histogram(
+            'http_response_size_bytes', 'Response body size by endpoint (known lengths only).',
+            ('endpoint',), buckets=SIZE_BUCKETS)
+        self.in_flight = self.gauge('http_requests_in_flight', 'Requests currently being handled.')
+        self.sql_duration = self.histogram(
+            'sql_query_duration_seconds', 'SQL statement execution time.', ('endpoint',),
+            buckets=SQL_DURATION_BUCKETS)
+        self.sql_per_request = self.histogram(
+            'sql_queries_per_request', 'Number of SQL statements issued per request.', ('endpoint',),
+            buckets=SQL_COUNT_BUCKETS)
+
+    # --- Registration ---
+
+    def counter(self, name, help_text, labels=()):
+        metric = Counter(name, help_text, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name, help_text, labels=(), callback=None):
+        metric = Gauge(name, help_text, labels, callback)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help_text, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    # --- Flask wiring ---
+
+    def init_app(self, app):
+        self.enabled = app.config['METRICS_ENABLED']
+        self.token = app.config['METRICS_TOKEN']
+        app.extensions['metrics'] = self
+        if not self.enabled:
+            return
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.add_url_rule('/metrics', 'metrics', self._metrics_view)
+
+        if not getattr(Metrics, '_sql_listening', False):
+            # Engine-class listeners cover every engine (and bind) the app creates
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            Metrics._sql_listening = True
+
+    @staticmethod
+    def _endpoint():
+        return request.endpoint or 'unmatched'
+
+    def _before_request(self):
+        g.metrics_start = time.perf_counter()
+        g.metrics_sql_count = 0
+        self.in_flight.inc()
+
+    def _after_request(self, response):
+        start = g.get('metrics_start')
+        if start is None:
+            return response
+        endpoint = self._endpoint()
+        self.requests.observe(time.perf_counter() - start, endpoint, request.method, response.status_code)
+        # Streamed responses have no length up front; they are not buffered just to measure them
+        if response.content_length is not None:
+            self.response_size.observe(response.content_length, endpoint)
+        self.sql_per_request.observe(g.get('metrics_sql_count', 0), endpoint)
+        return response
+
+    def _teardown_request(self, exc):
+        # Runs even when the view raised, so the in-flight gauge never leaks
+        if g.pop('metrics_start', None) is not None:
+            self.in_flight.dec()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        start = conn.info.pop('metrics_query_start', None)
+        if start is None:
+            return
+        if has_request_context():
+            endpoint = self._endpoint()
+            g.metrics_sql_count = g.get('metrics_sql_count', 0) + 1
+        else:
+            endpoint = 'background'
+        self.sql_duration.observe(time.perf_counter() - start, endpoint)
+
+    def _metrics_view(self):
+        """Scrapers send 'Authorization: Bearer <METRICS_TOKEN>'; logged-in admins may also look."""
+        from flask_login import current_user
+
+        header = request.headers.get('Authorization', '')
+        token_ok = bool(self.token) and hmac.compare_digest(header.encode(), f'Bearer {self.token}'.encode())
+        if not token_ok and not (current_user.is_authenticated and current_user.is_admin):
+            abort(403)
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['metrics_query_start'] = time.perf_counter()
@@ -1,9 +1,9 @@
 #models.py
 
+import hashlib
 import datetime
-from app import db  # Make sure db is imported from your app package (__init__.py)
+from app import db, hasher  # Make sure db is imported from your app package (__init__.py)
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 # Correct import for Timed Serializer
 from itsdangerous import URLSafeTimedSerializer as Serializer
 from flask import current_app
@@ -28,12 +28,17 @@ class User(db.Model, UserMixin):
     short_links = db.relationship('ShortLink', backref='link_creator', lazy=True, cascade="all, delete-orphan")
 
     def set_password(self, password):
-        """Hashes the password and stores it."""
-        self.password_hash = generate_password_hash(password)
+        """Hashes the password (in the hashing pool) and stores it."""
+        self.password_hash = hasher.hash(password)
 
     def check_password(self, password):
-        """Checks if the provided password matches the stored hash."""
-        return check_password_hash(self.password_hash, password)
+        """Checks if the provided password matches the stored hash (in the hashing pool)."""
+        return hasher.verify(self.password_hash, password)
+
+    @property
+    def is_admin(self):
+        """Operators are listed by email in ADMIN_EMAILS (no role column yet)."""
+        return self.email.lower() in current_app.config['ADMIN_EMAILS']
 
         # In app/models.py within the User class
 
@@ -54,6 +59,28 @@ class User(db.Model, UserMixin):
             return None
         return User.query.get(user_id)
 
+    def _password_fingerprint(self):
+        """Short digest of the password hash: tokens carrying it die when the password changes."""
+        return hashlib.sha256(self.password_hash.encode()).hexdigest()[:16]
+
+    def get_api_token(self):
+        """Generates a signed API token (sent as 'Authorization: Bearer <token>')."""
+        s = Serializer(current_app.config['SECRET_KEY'], salt='api-token')
+        return s.dumps({'user_id': self.id, 'pw': self._password_fingerprint()})
+
+    @staticmethod
+    def verify_api_token(token, max_age):
+        """Returns the User for a valid, unexpired API token issued since the last password change."""
+        s = Serializer(current_app.config['SECRET_KEY'], salt='api-token')
+        try:
+            data = s.loads(token, max_age=max_age)
+        except Exception:  # Catches SignatureExpired, BadSignature, etc.
+            return None
+        user = db.session.get(User, data['user_id'])
+        if user is None or data.get('pw') != user._password_fingerprint():
+            return None
+        return user
+
     def __repr__(self):
         return f"<User {self.username}>"
 
@@ -103,4 +130,27 @@ class ShortLink(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
     def __repr__(self):
-        return f"<ShortLink {self.short_url} -> {self.url[:30]}>"
\ No newline at end of file
+        return f"<ShortLink {self.short_url} -> {self.url[:30]}>"
+
+# --- DownloadJob Model ---
+# Journal of incomplete downloader jobs, so they can be resumed after a crash or restart.
+class DownloadJob(db.Model):
+    __tablename__ = 'download_job'
+
+    id = db.Column(db.Integer, primary_key=True)
+    task_key = db.Column(db.String(200), nullable=False, unique=True, index=True)
+    url = db.Column(db.String(2048), nullable=False)
+    # yt-dlp arguments needed to rebuild the command
+    format_id = db.Column(db.String(100), nullable=False)
+    profile = db.Column(db.String(20), nullable=False)
+    concurrent_fragments = db.Column(db.Integer, nullable=False, default=1)
+    filepath = db.Column(db.String(1024), nullable=False)  # Target file; partial streams live next to it
+    batch_id = db.Column(db.String(16), nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)
+    owner = db.Column(db.String(120), nullable=True)  # "host:pid:nonce" of the worker running the job
+    heartbeat_at = db.Column(db.DateTime, nullable=True)  # Lease: renewed by the owner while it is alive
+    date_created = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+
+    def __repr__(self):
+        return f"<DownloadJob {self.task_key} ({self.status})>"
@@ -0,0 +1,174 @@
+# profiler.py
+
+import os
+import re
+import sys
+import time
+import random
+import cProfile
+import threading
+from collections import Counter
+from flask import request, g, jsonify, send_from_directory, abort
+from flask_login import current_user
+
+
+def _collapse(frame):
+    """One stack in flamegraph 'collapsed' form: outermost;...;innermost."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """
+    Low-overhead sampling profiler: one daemon thread reads the stacks of the
+    profiled request threads every `interval` seconds via sys._current_frames().
+    The thread only runs while at least one request is being profiled.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._targets = {}  # { thread_id: Counter(collapsed_stack -> samples) }
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self, thread_id):
+        with self._lock:
+            self._targets[thread_id] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='profiler-sampler', daemon=True)
+                self._thread.start()
+
+    def stop(self, thread_id):
+        with self._lock:
+            return self._targets.pop(thread_id, Counter())
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._targets:
+                    self._thread = None
+                    return
+                targets = list(self._targets.items())
+            frames = sys._current_frames()
+            for thread_id, samples in targets:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    samples[_collapse(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+
+class RequestProfiler:
+    """
+    Opt-in per-request profiling (PROFILER_ENABLED). A request is profiled when an
+    admin sends the PROFILER_HEADER header, or at random with PROFILER_SAMPLE_RATE.
+
+    - 'sampling' mode appends collapsed stacks to <PROFILER_DIR>/<endpoint>.folded
+      (feed to flamegraph.pl / speedscope; repeated runs aggregate per endpoint).
+    - 'cprofile' mode writes <endpoint>.<timestamp>.prof (pstats; snakeviz, flameprof).
+      Only one request per process is profiled at a time (a profiler is process-wide on
+      Python 3.12+); requests arriving meanwhile are simply not profiled.
+
+    When disabled no hooks are registered at all, so there is no per-request cost.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._write_lock = threading.Lock()
+        self._cprofile_lock = threading.Lock()  # Held by the one request cProfile is tracing
+        self.sampler = None
+
+    def init_app(self, app):
+        self.enabled = app.config['PROFILER_ENABLED']
+        app.extensions['profiler'] = self
+        if not self.enabled:
+            return
+
+        self.mode = app.config['PROFILER_MODE']
+        self.sample_rate = app.config['PROFILER_SAMPLE_RATE']
+        self.header = app.config['PROFILER_HEADER']
+        self.output_dir = app.config['PROFILER_DIR'] or os.path.join(app.instance_path, 'profiles')
+        self.sampler = StackSampler(app.config['PROFILER_INTERVAL'])
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.add_url_rule('/_profiler/', 'profiler_index', self._index_view)
+        app.add_url_rule('/_profiler/<path:filename>', 'profiler_file', self._file_view)
+
+    @staticmethod
+    def _is_admin():
+        return current_user.is_authenticated and current_user.is_admin
+
+    def _wants_profile(self):
+        if request.endpoint in (None, 'static', 'profiler_index', 'profiler_file'):
+            return False
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        return bool(request.headers.get(self.header)) and self._is_admin()
+
+    # --- Request hooks ---
+
+    def _before_request(self):
+        if not self._wants_profile():
+            return
+        endpoint = re.sub(r'[^\w.-]', '_', request.endpoint)
+        if self.mode == 'cprofile':
+            if not self._cprofile_lock.acquire(blocking=False):
+                return  # Another request is being traced; concurrent stats would mix or fail
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:  # Another profiling tool (debugger, coverage) is active
+                self._cprofile_lock.release()
+                return
+            g.profiler_output = f"{endpoint}.{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.prof"
+            g.profiler = profiler
+        else:
+            g.profiler_output = f"{endpoint}.folded"
+            g.profiler = threading.get_ident()
+            self.sampler.start(g.profiler)
+
+    def _after_request(self, response):
+        if g.get('profiler') is not None:
+            response.headers['X-Profile-Output'] = g.profiler_output
+        return response
+
+    def _teardown_request(self, exc):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return
+        path = os.path.join(self.output_dir, g.pop('profiler_output'))
+        if isinstance(profiler, cProfile.Profile):
+            try:
+                profiler.disable()
+                profiler.dump_stats(path)
+            finally:
+                self._cprofile_lock.release()
+            return
+
+        samples = self.sampler.stop(profiler)
+        if samples:
+            with self._write_lock, open(path, 'a', encoding='utf-8') as f:
+                f.writelines(f"{stack} {count}\n" for stack, count in samples.items())
+
+    # --- Admin views ---
+
+    def _index_view(self):
+        if not self._is_admin():
+            abort(403)
+        files = sorted(os.scandir(self.output_dir), key=lambda e: e.stat().st_mtime, reverse=True)
+        return jsonify([
+            {'name': entry.name, 'size': entry.stat().st_size, 'modified': int(entry.stat().st_mtime)}
+            for entry in files if entry.is_file()
+        ])
+
+    def _file_view(self, filename):
+        if not self._is_admin():
+            abort(403)
+        return send_from_directory(self.output_dir, filename, as_attachment=True)
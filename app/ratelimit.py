@@ -0,0 +1,132 @@
+# ratelimit.py
+
+import math
+import time
+import threading
+from collections import OrderedDict
+from flask import request, current_app
+
+
+def parse_rule(rule):
+    """'5/60' -> (capacity 5, refill 5 tokens per 60 seconds)."""
+    count, period = rule.split('/')
+    return int(count), float(period)
+
+
+def normalize_email(email):
+    """Lowercases and drops '+tag' so one mailbox maps to one bucket."""
+    email = (email or '').strip().lower()
+    local, at, domain = email.partition('@')
+    return local.split('+', 1)[0] + at + domain
+
+
+# ------------------------------------------------------
+# 1. BACKENDS (token buckets)
+# ------------------------------------------------------
+
+class MemoryBackend:
+    """
+    Per-process token buckets in a bounded LRU: memory is fixed at `max_keys`
+    buckets no matter how many distinct IPs/emails an attacker cycles through.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # { key: (tokens, last_refill) }
+        self._lock = threading.Lock()
+
+    def hit(self, key, capacity, period):
+        """Takes one token. Returns 0 if allowed, else seconds until a token is available."""
+        rate = capacity / period
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - last) * rate)
+            retry_after = 0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                retry_after = math.ceil((1 - tokens) / rate)
+            self._buckets[key] = (tokens, now)  # re-insert as most recently used
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+
+class RedisBackend:
+    """Token buckets shared by every worker/node through Redis (requires the 'redis' package)."""
+
+    # Refill + take atomically on the server, using the server clock
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or capacity
+    local ts = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + (now - ts) * rate)
+    local retry_after = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        retry_after = math.ceil((1 - tokens) / rate)
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return retry_after
+    """
+
+    def __init__(self, url):
+        import redis  # Optional dependency, only needed for shared limits
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+
+    def hit(self, key, capacity, period):
+        return int(self._script(keys=[f"rl:{key}"], args=[capacity, capacity / period]))
+
+
+# ------------------------------------------------------
+# 2. LIMITER (extension)
+# ------------------------------------------------------
+
+class RateLimiter:
+    """Applies the RATELIMIT_<SCOPE>_PER_IP / _PER_EMAIL rules to auth form posts."""
+
+    def __init__(self):
+        self.backend = None
+        self.rules = {}
+
+    def init_app(self, app):
+        storage_url = app.config['RATELIMIT_STORAGE_URL']
+        if storage_url and storage_url.startswith('redis'):
+            self.backend = RedisBackend(storage_url)
+        else:
+            self.backend = MemoryBackend(app.config['RATELIMIT_MAX_KEYS'])
+
+        for scope in ('LOGIN', 'RESET'):
+            self.rules[scope.lower()] = {
+                'ip': parse_rule(app.config[f'RATELIMIT_{scope}_PER_IP']),
+                'email': parse_rule(app.config[f'RATELIMIT_{scope}_PER_EMAIL']),
+            }
+        app.extensions['rate_limiter'] = self
+
+    def _hit(self, key, rule):
+        try:
+            return self.backend.hit(key, *rule)
+        except Exception as e:
+            # Fail open: a broken shared store must not lock every user out
+            current_app.logger.error(f"Rate limiter backend error: {e}")
+            return 0
+
+    def check_request(self, scope, email=None):
+        """
+        Charges the client IP and (if given) the normalized email for one attempt.
+        Returns 0 if the request may proceed, else the Retry-After seconds.
+        Runs before form validation, so rejected requests never reach the DB or hasher.
+        """
+        rules = self.rules[scope]
+        retry_after = self._hit(f"{scope}:ip:{request.remote_addr}", rules['ip'])
+        if not retry_after and email:
+            retry_after = self._hit(f"{scope}:email:{normalize_email(email)}", rules['email'])
+        return retry_after
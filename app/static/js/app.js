@@ -175,91 +175,44 @@ function initSmoothScroll() {
 }
 
 /**
- * Initializes the image cropping modal logic using the Cropper library.
+ * Applies the saved (or system) colour theme before the fireworks module is loaded.
  */
-function initCropper() {
-    const Cropper = window.Cropper;
-
-    const imageUploadInput = document.getElementById('image-upload-input');
-    const imageToCrop = document.getElementById('image-to-crop');
-    const croppedDataInput = document.getElementById('cropped-image-data-uri');
-    const cropModal = document.getElementById('crop-modal');
-    const saveCropButton = document.querySelector('#crop-modal button[data-action="save"]');
-    const cancelCropButton = document.querySelector('#crop-modal button[data-action="cancel"]');
-    const cropperControls = document.querySelector('.cropper-controls');
-
-    if (!imageUploadInput || typeof Cropper === 'undefined') {
-        return;
-    }
-
-    let cropperInstance = null;
-
-    const destroyCropper = () => {
-        if (cropperInstance) {
-            cropperInstance.destroy();
-            cropperInstance = null;
-        }
-    };
+function initTheme() {
+    const savedTheme = localStorage.getItem('themePreference');
+    const isDarkMode = savedTheme ? savedTheme === 'dark' : window.matchMedia('(prefers-color-scheme: dark)').matches;
+    document.body.classList.toggle('light-mode', !isDarkMode);
+}
 
-    const hideModal = () => {
-        if (cropModal) cropModal.classList.remove('active');
-        destroyCropper();
+/**
+ * Loads the fireworks module (the canvas' data-module URL) on the first user
+ * interaction instead of with the page, so it costs nothing until then.
+ */
+function initFireworksLoader() {
+    const canvas = document.getElementById('fireworksCanvas');
+    const moduleUrl = canvas?.dataset.module;
+    if (!moduleUrl) return;
+
+    let ready = false;
+    let loading = null;
+    const load = () => {
+        loading ??= import(moduleUrl)
+            .then((module) => {
+                module.initFireworks();
+                ready = true;
+            })
+            .catch((error) => console.error('Error loading fireworks:', error));
+        return loading;
     };
 
-    imageUploadInput.addEventListener('change', (e) => {
-        const file = e.target.files?.[0];
-        if (!file) return;
-
-        const reader = new FileReader();
-        reader.onload = ev => {
-            if (imageToCrop && cropModal && cropperControls) {
-                imageToCrop.src = ev.target?.result;
-                cropModal.classList.add('active');
-                cropperControls.style.display = 'flex';
-
-                destroyCropper();
-                try {
-                    cropperInstance = new Cropper(imageToCrop, {
-                        aspectRatio: 1,
-                        viewMode: 1,
-                        responsive: true,
-                        minCropBoxWidth: 100,
-                        ready() {}
-                    });
-                } catch (error) {
-                    console.error('Error initializing Cropper:', error);
-                    hideModal();
-                }
-            } else {
-                console.error('Cropper modal elements not found.');
-            }
-        };
-        reader.onerror = (err) => {
-             console.error('FileReader error:', err);
-        };
-        reader.readAsDataURL(file);
+    ['pointerdown', 'keydown', 'touchstart'].forEach((type) => {
+        document.addEventListener(type, load, { once: true, passive: true });
     });
 
-    if (saveCropButton) {
-        saveCropButton.addEventListener('click', () => {
-            if (!cropperInstance || !croppedDataInput) return;
-            try {
-                const canvas = cropperInstance.getCroppedCanvas({});
-                croppedDataInput.value = canvas.toDataURL('image/jpeg', 0.8);
-                hideModal();
-            } catch (error) {
-                console.error('Error getting cropped canvas:', error);
-                hideModal();
-            }
-        });
-    }
-
-    if (cancelCropButton) {
-        cancelCropButton.addEventListener('click', () => {
-            hideModal();
-            if (imageUploadInput) imageUploadInput.value = ''; // Clear input for re-upload
-        });
-    }
+    // A control clicked before the module arrived is replayed once it is ready
+    document.getElementById('fireworks-controls')?.addEventListener('click', (e) => {
+        const button = e.target.closest('button');
+        if (button && !ready) load().then(() => button.click());
+    });
 }
 
 // ===================================================================
@@ -272,11 +225,9 @@ function initCropper() {
 function initLoadingOverlay() {
     const loadingOverlay = document.querySelector('#loading-overlay');
     if (loadingOverlay) {
-        loadingOverlay.classList.remove('hidden');
-        setTimeout(() => {
-            loadingOverlay.classList.add('fade-out');
-            setTimeout(() => loadingOverlay.classList.add('hidden'), 200);
-        }, 1000); // Show for 1 second
+        // Hidden as soon as the page is parsed rather than after a fixed delay
+        loadingOverlay.classList.add('fade-out');
+        setTimeout(() => loadingOverlay.classList.add('hidden'), 200);
     }
 }
 
@@ -284,12 +235,12 @@ function initLoadingOverlay() {
 document.addEventListener('DOMContentLoaded', () => {
 
     // 3.1. General UI Initializations
+    initTheme();
     initLoadingOverlay();
     initMenu();
     initSmoothScroll();
 
     // 3.2. Feature-Specific Initializations
     initForms();
-    initCropper();
-    initChatbotWidget(); // <-- Chatbot JS is now called here
+    initFireworksLoader();
 });
\ No newline at end of file
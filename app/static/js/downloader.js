@@ -0,0 +1,218 @@
+//downloader.js
+
+// Status requests are long-polls: under the ASGI entry point the server holds each one
+// until the task changes (up to STATUS_WAIT_SECONDS); the WSGI view answers at once, so
+// polls are never sent more often than every POLL_INTERVAL_MS.
+const STATUS_WAIT_SECONDS = 25;
+const POLL_INTERVAL_MS = 2000;
+const FINAL_STATUSES = ['complete', 'error', 'cancelled', 'not_found'];
+
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+// --- REFACTORED SCRIPT FOR SINGLE DOWNLOAD UI ---
+document.addEventListener('DOMContentLoaded', () => {
+    const mainDownloadButton = document.getElementById('main-download-button');
+    const qualitySelect = document.getElementById('quality-select');
+
+    // Check if the new download UI elements exist
+    if (mainDownloadButton && qualitySelect) {
+
+        // Parse the stream data from the JSON script tag (filled when the form was posted without JS)
+        const streamDataElement = document.getElementById('stream-data');
+        let allStreamOptions = JSON.parse(streamDataElement.textContent);
+
+        let currentTaskKey = null; // Track the active task for cancellation
+        let pollGeneration = 0;    // Bumped to stop the running status loop (cancel, new download)
+
+        // --- Probe through the JSON endpoint instead of posting the form ---
+        const probeForm = document.getElementById('probe-form');
+        const probeButton = document.getElementById('probe-button');
+        const probeStatus = document.getElementById('probe-status');
+        const optionsContainer = document.getElementById('download-options');
+
+        probeForm?.addEventListener('submit', async (event) => {
+            event.preventDefault();
+            const formData = new FormData(probeForm);
+            const params = new URLSearchParams({
+                url: (formData.get('youtube_url') || '').trim(),
+                profile: formData.get('profile') || '',
+            });
+
+            probeButton.disabled = true;
+            probeStatus.textContent = 'Fetching video data...';
+            try {
+                const response = await fetch(`${probeForm.dataset.probeUrl}?${params}`);
+                const data = await response.json();
+                if (data.status !== 'ok') throw new Error(data.message || 'Error fetching video data.');
+
+                allStreamOptions = data.options;
+                document.getElementById('video-title').textContent = data.title;
+                qualitySelect.replaceChildren(...data.options.map((option, index) => {
+                    const element = document.createElement('option');
+                    element.value = index;
+                    element.textContent = `${option.resolution} (~${option.size_mb} MB)`;
+                    return element;
+                }));
+                document.getElementById('status-main').textContent = '';
+                if (data.options.length) {
+                    probeStatus.textContent = `Processing "${data.title}". Choose a download option below.`;
+                    optionsContainer.style.display = 'block';
+                } else {
+                    probeStatus.textContent = 'No suitable streams found for this video and profile.';
+                    optionsContainer.style.display = 'none';
+                }
+            } catch (error) {
+                probeStatus.textContent = `Error: ${error.message}`;
+                console.error("Probe error:", error);
+            } finally {
+                probeButton.disabled = false;
+            }
+        });
+
+        // --- Main Download Button Click ---
+        mainDownloadButton.addEventListener('click', async (event) => {
+
+            // 1. Get the selected option's index from the dropdown
+            const selectedIndex = qualitySelect.value;
+
+            // 2. Get the full option data from our JSON array
+            const selectedOption = allStreamOptions[selectedIndex];
+            if (!selectedOption) return;
+
+            const taskKey = selectedOption.task_key;
+            const initiateUrl = selectedOption.url; // The correct URL is in our JSON data
+
+            currentTaskKey = taskKey; // Set this for the cancel button to use
+
+            // Get all the single UI elements
+            const progressBarContainer = document.getElementById(`progress-container-main`);
+            const progressBar = document.getElementById(`progress-bar-main`);
+            const statusMessage = document.getElementById(`status-main`);
+            const controlsContainer = document.getElementById(`controls-main`);
+            const cancelButton = document.getElementById(`cancel-main`);
+
+            // Reset UI
+            mainDownloadButton.disabled = true;
+            qualitySelect.disabled = true; // Disable select menu during download
+            progressBarContainer.style.display = 'block';
+            progressBar.style.width = '0%';
+            progressBar.textContent = '0%';
+            statusMessage.textContent = 'Initiating download...';
+            controlsContainer.style.display = 'block';
+            cancelButton.disabled = false;
+
+            const generation = ++pollGeneration;
+
+            try {
+                // The initiateUrl from our JSON data already has all params
+                const initiateResponse = await fetch(initiateUrl);
+                const initiateData = await initiateResponse.json();
+
+                if (initiateData.status !== 'started' && initiateData.status !== 'already_running') {
+                    throw new Error(initiateData.message || 'Failed to start download.');
+                }
+            } catch (error) {
+                statusMessage.textContent = `Error: ${error.message}`;
+                progressBarContainer.style.display = 'none';
+                controlsContainer.style.display = 'none';
+                mainDownloadButton.disabled = false;
+                qualitySelect.disabled = false;
+                currentTaskKey = null;
+                console.error("Initiation error:", error);
+                return;
+            }
+
+            // Long-poll for status until the task is finished (or the loop is superseded)
+            while (generation === pollGeneration) {
+                const started = Date.now();
+                let statusData;
+                try {
+                    const statusResponse = await fetch(`/downloader/status/${taskKey}?wait=${STATUS_WAIT_SECONDS}`);
+                    if (!statusResponse.ok && statusResponse.status !== 404) {
+                        throw new Error(`Status check failed: ${statusResponse.status}`);
+                    }
+                    statusData = await statusResponse.json();
+                } catch (pollError) {
+                    if (generation !== pollGeneration) return;
+                    statusMessage.textContent = 'Error checking status.';
+                    progressBarContainer.style.display = 'none';
+                    controlsContainer.style.display = 'none';
+                    mainDownloadButton.disabled = false;
+                    qualitySelect.disabled = false;
+                    currentTaskKey = null;
+                    console.error("Polling error:", pollError);
+                    return;
+                }
+                if (generation !== pollGeneration) return; // Cancelled while the request was held
+
+                const realProgress = statusData.progress || 0;
+                progressBar.style.width = `${realProgress}%`;
+                progressBar.textContent = `${realProgress}%`;
+
+                const speedStr = statusData.speed_str || '';
+                statusMessage.textContent = `Status: ${statusData.status}... (${speedStr})`;
+
+                // Handle completion or error
+                if (FINAL_STATUSES.includes(statusData.status)) {
+                    controlsContainer.style.display = 'none';
+                    currentTaskKey = null;
+
+                    if (statusData.status === 'complete') {
+                        progressBar.style.width = `100%`;
+                        progressBar.textContent = `100%`;
+                        statusMessage.innerHTML = `Complete! <a href="${statusData.download_url}" class="btn-success" style="width: auto; margin-left: 10px;">Download File</a>`;
+                    } else {
+                        statusMessage.textContent = `Failed: ${statusData.message || statusData.status}`;
+                        progressBarContainer.style.display = 'none';
+                    }
+                    mainDownloadButton.disabled = false;
+                    qualitySelect.disabled = false;
+                    return;
+                }
+
+                await sleep(Math.max(0, POLL_INTERVAL_MS - (Date.now() - started)));
+            }
+        });
+
+        // --- Event Listener for the single Cancel Button ---
+        document.getElementById('cancel-main')?.addEventListener('click', async (event) => {
+            if (!currentTaskKey) return; // No active task
+
+            const button = event.target;
+            const statusMessage = document.getElementById('status-main');
+
+            const url = `/downloader/cancel/${currentTaskKey}`;
+            const action = 'Cancelling...';
+
+            button.disabled = true;
+            statusMessage.textContent = action;
+
+            try {
+                const response = await fetch(url, { method: 'POST' });
+                const data = await response.json();
+
+                if (data.status === 'cancel_requested' || data.status === 'cancelled') {
+                    statusMessage.textContent = 'Status: cancelling...';
+                    pollGeneration++; // Stops the status loop
+
+                    // Manually trigger final cleanup
+                    document.getElementById(`controls-main`).style.display = 'none';
+                    document.getElementById(`progress-container-main`).style.display = 'none';
+                    statusMessage.textContent = 'Download Cancelled.';
+                    mainDownloadButton.disabled = false;
+                    qualitySelect.disabled = false;
+                    currentTaskKey = null;
+
+                } else {
+                     button.disabled = false; // Re-enable if action failed
+                }
+
+            } catch (error) {
+                statusMessage.textContent = 'Error sending command.';
+                console.error("Control error:", error);
+                button.disabled = false; // Re-enable on error
+            }
+        });
+
+    } // End of if(mainDownloadButton)
+});
@@ -0,0 +1,58 @@
+//downloader_batch.js
+
+document.addEventListener('DOMContentLoaded', () => {
+    const panel = document.getElementById('batch-panel');
+    if (!panel) return;
+
+    const progressBar = document.getElementById('batch-progress-bar');
+    const statusMessage = document.getElementById('batch-status');
+    const itemsBody = document.getElementById('batch-items');
+
+    const renderItem = (item) => {
+        const row = document.createElement('tr');
+        const title = document.createElement('td');
+        title.textContent = item.title;
+        title.style.wordBreak = 'break-all';
+        const progress = document.createElement('td');
+        progress.textContent = `${item.progress}%`;
+        progress.style.textAlign = 'center';
+        const status = document.createElement('td');
+        status.style.textAlign = 'center';
+        if (item.download_url) {
+            const link = document.createElement('a');
+            link.href = item.download_url;
+            link.className = 'btn-success';
+            link.textContent = 'Download File';
+            status.appendChild(link);
+        } else {
+            status.textContent = item.message ? `${item.status}: ${item.message}` : `${item.status} ${item.speed_str || ''}`;
+        }
+        row.append(title, progress, status);
+        return row;
+    };
+
+    const poll = setInterval(async () => {
+        try {
+            const response = await fetch(panel.dataset.statusUrl);
+            if (!response.ok) throw new Error(`Status check failed: ${response.status}`);
+            const data = await response.json();
+
+            progressBar.style.width = `${data.progress}%`;
+            progressBar.textContent = `${data.progress}%`;
+            itemsBody.replaceChildren(...data.items.map(renderItem));
+
+            if (data.status === 'expanding') {
+                statusMessage.textContent = `Expanding playlists... ${data.total} video(s) queued so far.`;
+            } else {
+                statusMessage.textContent = `${data.finished} of ${data.total} finished.` +
+                    (data.errors.length ? ` Could not expand: ${data.errors.join(', ')}` : '');
+            }
+
+            if (data.status === 'complete') clearInterval(poll);
+        } catch (error) {
+            clearInterval(poll);
+            statusMessage.textContent = 'Error checking batch status.';
+            console.error("Batch polling error:", error);
+        }
+    }, 2000); // Poll every 2 seconds
+});
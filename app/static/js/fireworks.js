@@ -2,9 +2,10 @@
 
 // ===================================================================
 // FIREWORKS CANVAS ANIMATION LOGIC (Refactored)
+// ES module, imported by app.js on the first user interaction.
 // ===================================================================
 
-(function() {
+export function initFireworks() {
     // -------------------------------------------------------------------
     // 1. CONFIGURATION & STATE
     // -------------------------------------------------------------------
@@ -631,24 +632,22 @@
     // 8. INITIALIZATION
     // -------------------------------------------------------------------
 
-    document.addEventListener('DOMContentLoaded', () => {
-        if (!canvas || !ctx) {
-            console.error('Fireworks Canvas or context not found');
-            return;
-        }
+    if (!canvas || !ctx) {
+        console.error('Fireworks Canvas or context not found');
+        return;
+    }
 
-        if (!isDarkMode) body.classList.add('light-mode');
+    if (!isDarkMode) body.classList.add('light-mode');
 
-        resizeCanvas();
-        updateToggleText();
-        updateGravityButton();
-        updateFireworksButton();
-        setupEventListeners();
+    resizeCanvas();
+    updateToggleText();
+    updateGravityButton();
+    updateFireworksButton();
+    setupEventListeners();
 
-        // Start the main animation loop and auto-launch conditionally
-        animate();
-        if (isAnimating) {
-            startAutoLaunch();
-        }
-    });
-})();
\ No newline at end of file
+    // Start the main animation loop and auto-launch conditionally
+    animate();
+    if (isAnimating) {
+        startAutoLaunch();
+    }
+}
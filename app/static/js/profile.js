@@ -0,0 +1,104 @@
+//profile.js
+
+// ===================================================================
+// AVATAR CROPPER (Account Settings page only; needs the Cropper library)
+// ===================================================================
+
+/**
+ * Initializes the image cropping modal logic using the Cropper library.
+ */
+function initCropper() {
+    const Cropper = window.Cropper;
+
+    const imageUploadInput = document.getElementById('image-upload-input');
+    const imageToCrop = document.getElementById('image-to-crop');
+    const croppedFileInput = document.getElementById('cropped-image-file');
+    const croppedDataInput = document.getElementById('cropped-image-data-uri');
+    const cropModal = document.getElementById('crop-modal');
+    const saveCropButton = document.querySelector('#crop-modal button[data-action="save"]');
+    const cancelCropButton = document.querySelector('#crop-modal button[data-action="cancel"]');
+    const cropperControls = document.querySelector('.cropper-controls');
+
+    if (!imageUploadInput || typeof Cropper === 'undefined') {
+        return;
+    }
+
+    let cropperInstance = null;
+
+    const destroyCropper = () => {
+        if (cropperInstance) {
+            cropperInstance.destroy();
+            cropperInstance = null;
+        }
+    };
+
+    const hideModal = () => {
+        if (cropModal) cropModal.classList.remove('active');
+        destroyCropper();
+    };
+
+    imageUploadInput.addEventListener('change', (e) => {
+        const file = e.target.files?.[0];
+        if (!file) return;
+
+        // Object URLs avoid reading the whole file into a Base64 string
+        if (imageToCrop?.src.startsWith('blob:')) URL.revokeObjectURL(imageToCrop.src);
+        const objectUrl = URL.createObjectURL(file);
+
+        if (imageToCrop && cropModal && cropperControls) {
+            imageToCrop.src = objectUrl;
+            cropModal.classList.add('active');
+            cropperControls.style.display = 'flex';
+
+            destroyCropper();
+            try {
+                cropperInstance = new Cropper(imageToCrop, {
+                    aspectRatio: 1,
+                    viewMode: 1,
+                    responsive: true,
+                    minCropBoxWidth: 100,
+                    ready() {}
+                });
+            } catch (error) {
+                console.error('Error initializing Cropper:', error);
+                hideModal();
+            }
+        } else {
+            console.error('Cropper modal elements not found.');
+        }
+    });
+
+    if (saveCropButton) {
+        saveCropButton.addEventListener('click', () => {
+            if (!cropperInstance || !croppedDataInput) return;
+            try {
+                // The server only keeps up to 300px, so there is no point uploading more
+                const canvas = cropperInstance.getCroppedCanvas({ maxWidth: 1200, maxHeight: 1200 });
+                if (croppedFileInput && typeof DataTransfer !== 'undefined') {
+                    // Binary multipart upload (no 33% Base64 overhead)
+                    canvas.toBlob((blob) => {
+                        const transfer = new DataTransfer();
+                        transfer.items.add(new File([blob], 'avatar.jpg', { type: 'image/jpeg' }));
+                        croppedFileInput.files = transfer.files;
+                        croppedDataInput.value = '';
+                    }, 'image/jpeg', 0.8);
+                } else {
+                    croppedDataInput.value = canvas.toDataURL('image/jpeg', 0.8);
+                }
+                hideModal();
+            } catch (error) {
+                console.error('Error getting cropped canvas:', error);
+                hideModal();
+            }
+        });
+    }
+
+    if (cancelCropButton) {
+        cancelCropButton.addEventListener('click', () => {
+            hideModal();
+            if (imageUploadInput) imageUploadInput.value = ''; // Clear input for re-upload
+        });
+    }
+}
+
+document.addEventListener('DOMContentLoaded', initCropper);
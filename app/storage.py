@@ -0,0 +1,221 @@
+# storage.py
+
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+from urllib.parse import quote, urlparse
+
+# One stored file, as returned by list()
+StoredObject = namedtuple('StoredObject', 'key size modified')  # modified: POSIX timestamp
+
+
+class StorageError(Exception):
+    """Raised for invalid keys or storage URLs."""
+
+
+# ------------------------------------------------------
+# 1. BACKENDS
+# ------------------------------------------------------
+
+class LocalStorage:
+    """
+    Files under one local directory; keys are '/'-separated relative paths.
+    Only suitable for a single node (or a shared mount).
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def local_path(self, key):
+        """Absolute path for a key, refusing anything that resolves outside the root."""
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise StorageError(f"Invalid storage key: {key!r}")
+        return path
+
+    def save_file(self, key, source_path, content_type=None, cache_control=None, move=False):
+        """Stores a local file under `key` (atomically: readers never see a partial file)."""
+        dest = self.local_path(key)
+        if os.path.abspath(source_path) == dest:
+            return  # Already written in place
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        if move:
+            shutil.move(source_path, dest)
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest), prefix='.upload-')
+        with os.fdopen(fd, 'wb') as out, open(source_path, 'rb') as src:
+            shutil.copyfileobj(src, out, 1024 * 1024)
+        os.replace(tmp_path, dest)
+
+    def save_stream(self, key, stream, content_type=None, cache_control=None):
+        """Stores a readable binary stream under `key`, copying it in chunks."""
+        dest = self.local_path(key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest), prefix='.upload-')
+        with os.fdopen(fd, 'wb') as out:
+            shutil.copyfileobj(stream, out, 1024 * 1024)
+        os.replace(tmp_path, dest)
+
+    def exists(self, key):
+        return os.path.isfile(self.local_path(key))
+
+    def touch(self, key):
+        """Marks a file as recently written (protects it from age-based cleanup)."""
+        os.utime(self.local_path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self.local_path(key))
+        except FileNotFoundError:
+            pass
+
+    def list(self, prefix=''):
+        """Files directly inside the 'directory' `prefix` (e.g. '' or '42/'); dotfiles are skipped."""
+        directory = self.local_path(prefix) if prefix else self.root
+        if not os.path.isdir(directory):
+            return
+        for entry in os.scandir(directory):
+            if entry.is_file() and not entry.name.startswith('.'):
+                stat = entry.stat()
+                yield StoredObject(prefix + entry.name, stat.st_size, stat.st_mtime)
+
+    def url(self, key, expires=3600, download_name=None):
+        """Local files have no direct URL; the app serves them itself (see local_path)."""
+        return None
+
+
+class S3Storage:
+    """
+    Objects in an S3-compatible bucket (AWS S3, MinIO, ...), so any app node can
+    read what another node wrote. Requires the optional 'boto3' package.
+    Large files are uploaded as streamed multipart uploads; reads go straight
+    from the bucket to the browser through presigned (or public) URLs.
+    """
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, public_url=None, multipart_chunk_mb=8):
+        import boto3  # Optional dependency, only needed for object storage
+        from boto3.s3.transfer import TransferConfig
+        from botocore.exceptions import ClientError
+
+        self.bucket = bucket
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self.public_url = public_url.rstrip('/') if public_url else None
+        self._client = boto3.client('s3', endpoint_url=endpoint_url)
+        chunk = multipart_chunk_mb * 1024 * 1024
+        # Files above one chunk go up as multipart uploads, one chunk in memory per thread
+        self._transfer = TransferConfig(multipart_threshold=chunk, multipart_chunksize=chunk)
+        self._client_error = ClientError
+
+    def _key(self, key):
+        if '..' in key.split('/') or key.startswith('/'):
+            raise StorageError(f"Invalid storage key: {key!r}")
+        return self.prefix + key
+
+    @staticmethod
+    def _extra_args(content_type, cache_control):
+        extra = {}
+        if content_type:
+            extra['ContentType'] = content_type
+        if cache_control:
+            extra['CacheControl'] = cache_control
+        return extra
+
+    def local_path(self, key):
+        return None
+
+    def save_file(self, key, source_path, content_type=None, cache_control=None, move=False):
+        self._client.upload_file(source_path, self.bucket, self._key(key),
+                                 ExtraArgs=self._extra_args(content_type, cache_control), Config=self._transfer)
+        if move:
+            os.remove(source_path)
+
+    def save_stream(self, key, stream, content_type=None, cache_control=None):
+        self._client.upload_fileobj(stream, self.bucket, self._key(key),
+                                    ExtraArgs=self._extra_args(content_type, cache_control), Config=self._transfer)
+
+    def exists(self, key):
+        try:
+            self._client.head_object(Bucket=self.bucket, Key=self._key(key))
+            return True
+        except self._client_error as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def touch(self, key):
+        # An in-place copy refreshes LastModified; REPLACE requires restating the headers
+        full_key = self._key(key)
+        head = self._client.head_object(Bucket=self.bucket, Key=full_key)
+        self._client.copy_object(
+            Bucket=self.bucket, Key=full_key, CopySource={'Bucket': self.bucket, 'Key': full_key},
+            MetadataDirective='REPLACE', Metadata=head.get('Metadata', {}),
+            **self._extra_args(head.get('ContentType'), head.get('CacheControl'))
+        )
+
+    def delete(self, key):
+        self._client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def list(self, prefix=''):
+        paginator = self._client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix), Delimiter='/'):
+            for obj in page.get('Contents', []):
+                key = obj['Key'][len(self.prefix):]
+                yield StoredObject(key, obj['Size'], obj['LastModified'].timestamp())
+
+    def url(self, key, expires=3600, download_name=None):
+        """Public URL when configured (stable, cacheable), else a presigned GET that expires."""
+        if self.public_url and not download_name:
+            return f"{self.public_url}/{quote(self._key(key))}"
+        params = {'Bucket': self.bucket, 'Key': self._key(key)}
+        if download_name:
+            params['ResponseContentDisposition'] = f"attachment; filename*=UTF-8''{quote(download_name)}"
+        return self._client.generate_presigned_url('get_object', Params=params, ExpiresIn=expires)
+
+
+def open_storage(url, default_root, endpoint_url=None, public_url=None, multipart_chunk_mb=8):
+    """
+    Backend for a storage URL: '' (local, `default_root`), 'file:///abs/path'
+    or 's3://bucket/optional/prefix'.
+    """
+    if not url:
+        return LocalStorage(default_root)
+    parsed = urlparse(url)
+    if parsed.scheme == 'file':
+        return LocalStorage(parsed.path)
+    if parsed.scheme == 's3':
+        return S3Storage(parsed.netloc, parsed.path, endpoint_url, public_url, multipart_chunk_mb)
+    raise StorageError(f"Unsupported storage URL: {url!r}")
+
+
+# ------------------------------------------------------
+# 2. STORAGE (extension)
+# ------------------------------------------------------
+
+class Storage:
+    """
+    The app's two file stores: `avatars` (profile pictures) and `downloads`
+    (finished downloader files, keyed '<user_id>/<filename>').
+    """
+
+    def __init__(self):
+        self.avatars = None
+        self.downloads = None
+        self.presign_expires = 3600
+
+    def init_app(self, app):
+        options = {
+            'endpoint_url': app.config['S3_ENDPOINT_URL'],
+            'multipart_chunk_mb': app.config['S3_MULTIPART_CHUNK_MB'],
+        }
+        self.avatars = open_storage(app.config['AVATAR_STORAGE_URL'],
+                                    os.path.join(app.root_path, 'static/profile_pics'),
+                                    public_url=app.config['AVATAR_PUBLIC_URL'], **options)
+        if isinstance(self.avatars, S3Storage) and not self.avatars.public_url:
+            # Avatar names are content-hashed and cached forever; a presigned URL changes on
+            # every render and expires, so browsers would re-download every avatar on every page
+            raise StorageError("AVATAR_STORAGE_URL on S3 requires AVATAR_PUBLIC_URL (public bucket or CDN prefix).")
+        self.downloads = open_storage(app.config['DOWNLOAD_STORAGE_URL'],
+                                      os.path.join(app.instance_path, 'downloads'), **options)
+        self.presign_expires = app.config['STORAGE_PRESIGN_EXPIRES']
+        app.extensions['storage'] = self
@@ -0,0 +1,65 @@
+# templating.py
+
+import os
+import time
+from flask import g, before_render_template, template_rendered
+from jinja2 import FileSystemBytecodeCache
+
+from app import metrics
+
+render_seconds = metrics.histogram(
+    'template_render_seconds', 'render_template() time by template (includes extended/included templates).',
+    ('template',))
+bytecode_loads = metrics.counter(
+    'template_bytecode_cache_total', 'Template loads by bytecode cache result (miss = compiled from source).',
+    ('result',))
+
+
+class InstrumentedBytecodeCache(FileSystemBytecodeCache):
+    """
+    Compiled templates on disk, shared by every worker (and kept across restarts):
+    only the first process to load a changed template compiles it. Entries are keyed
+    by template name and validated against the source checksum, so an edited
+    template is never served stale.
+    """
+
+    def load_bytecode(self, bucket):
+        super().load_bytecode(bucket)
+        if metrics.enabled:
+            bytecode_loads.inc('hit' if bucket.code is not None else 'miss')
+
+
+def warm_up(app):
+    """Loads every template into the environment's cache; returns (count, seconds)."""
+    start = time.perf_counter()
+    names = app.jinja_env.list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names), time.perf_counter() - start
+
+
+# --- Render timing (Flask template signals) ---
+
+def _before_render(app, template, context, **extra):
+    g.setdefault('template_render_starts', []).append(time.perf_counter())
+
+
+def _rendered(app, template, context, **extra):
+    starts = g.get('template_render_starts')
+    if starts:
+        render_seconds.observe(time.perf_counter() - starts.pop(), template.name or 'unknown')
+
+
+def init_app(app, warm=True):
+    if app.config['TEMPLATE_BYTECODE_CACHE']:
+        cache_dir = app.config['TEMPLATE_CACHE_DIR'] or os.path.join(app.instance_path, 'jinja-cache')
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = InstrumentedBytecodeCache(cache_dir)
+
+    if metrics.enabled:
+        before_render_template.connect(_before_render, app)
+        template_rendered.connect(_rendered, app)
+
+    if warm and app.config['TEMPLATE_WARMUP']:
+        count, seconds = warm_up(app)
+        app.logger.debug(f"Warmed up {count} templates in {seconds * 1000:.0f} ms")
@@ -0,0 +1,211 @@
+# toolchain.py
+
+import os
+import re
+import sys
+import asyncio
+import json
+import shutil
+import subprocess
+import click
+import functools
+import importlib.util
+
+# Oldest yt-dlp release known to support every option the downloader passes
+MIN_YTDLP_VERSION = '2023.03.04'
+# Oldest ffmpeg release the merge/transcode arguments are known to work with
+MIN_FFMPEG_VERSION = (4, 0)
+FFMPEG_RELEASE_RE = re.compile(r'^ffmpeg version n?(\d+)\.(\d+)')
+
+
+class ProbeError(Exception):
+    """Raised when yt-dlp cannot extract metadata for a URL."""
+
+
+class ProbeTimeout(ProbeError):
+    """Raised when a metadata probe exceeds its time limit."""
+
+
+# ------------------------------------------------------
+# 1. DISCOVERY (once per process, on first use)
+# ------------------------------------------------------
+
+def _first_line_of(command):
+    """Runs a version command and returns its first output line, or None."""
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, encoding='utf-8',
+                                errors='replace', timeout=15)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    lines = (result.stdout or result.stderr).strip().splitlines()
+    return lines[0].strip() if result.returncode == 0 and lines else None
+
+
+def _find_executable(name, location=None):
+    """Looks in an explicit location (directory or full path) first, then on PATH."""
+    if location:
+        if os.path.isfile(location):
+            return location
+        found = shutil.which(name, path=location)
+        if found:
+            return found
+    return shutil.which(name)
+
+
+def ffmpeg_release(version_line):
+    """(major, minor) from 'ffmpeg -version', or None for git snapshots ('N-12345-g...')."""
+    match = FFMPEG_RELEASE_RE.match(version_line or '')
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+@functools.lru_cache(maxsize=None)
+def discover(ffmpeg_location=None, ytdlp_path=None):
+    """
+    Locates and version-checks ffmpeg and yt-dlp. Cached, so the version
+    subprocesses run once per worker process no matter how often it is called.
+    """
+    ffmpeg = _find_executable('ffmpeg', ffmpeg_location)
+    ytdlp = _find_executable('yt-dlp', ytdlp_path)
+    ytdlp_api = importlib.util.find_spec('yt_dlp') is not None
+
+    ffmpeg_version = _first_line_of([ffmpeg, '-version']) if ffmpeg else None
+    if ytdlp:
+        ytdlp_command = [ytdlp]
+        ytdlp_version = _first_line_of([ytdlp, '--version'])
+    elif ytdlp_api:
+        # No console script on PATH, but the package is importable by this interpreter
+        ytdlp_command = [sys.executable, '-m', 'yt_dlp']
+        ytdlp_version = _first_line_of(ytdlp_command + ['--version'])
+    else:
+        ytdlp_command, ytdlp_version = None, None
+
+    return {
+        'ffmpeg': ffmpeg,
+        'ffmpeg_dir': os.path.dirname(ffmpeg) if ffmpeg else None,
+        'ffmpeg_version': ffmpeg_version,
+        'ytdlp_command': ytdlp_command,
+        'ytdlp_version': ytdlp_version,
+        'ytdlp_api': ytdlp_api,
+    }
+
+
+def get(app):
+    """
+    Runs discovery on first use and caches the result as app.config['TOOLCHAIN'].
+    Workers that never touch the downloader never spawn the version subprocesses.
+    """
+    toolchain = app.config.get('TOOLCHAIN')
+    if toolchain is not None:
+        return toolchain
+
+    toolchain = discover(app.config.get('FFMPEG_LOCATION'), app.config.get('YTDLP_PATH'))
+    app.config['TOOLCHAIN'] = toolchain
+
+    if not toolchain['ffmpeg']:
+        app.logger.warning("Toolchain: ffmpeg not found (set FFMPEG_LOCATION). Merging/transcoding will fail.")
+    elif (ffmpeg_release(toolchain['ffmpeg_version']) or MIN_FFMPEG_VERSION) < MIN_FFMPEG_VERSION:
+        app.logger.warning(f"Toolchain: {toolchain['ffmpeg_version']} is older than ffmpeg "
+                           f"{'.'.join(map(str, MIN_FFMPEG_VERSION))}; merging/transcoding may fail.")
+    if not toolchain['ytdlp_command']:
+        app.logger.warning("Toolchain: yt-dlp not found (set YTDLP_PATH). The downloader is unavailable.")
+    elif toolchain['ytdlp_version'] and toolchain['ytdlp_version'] < MIN_YTDLP_VERSION:
+        app.logger.warning(f"Toolchain: yt-dlp {toolchain['ytdlp_version']} is older than {MIN_YTDLP_VERSION}.")
+
+    return toolchain
+
+
+def init_app(app):
+    """Registers 'flask toolchain'; discovery itself is deferred to get()."""
+
+    @app.cli.command('toolchain')
+    def toolchain_command():
+        """Show the ffmpeg / yt-dlp the downloader will use."""
+        for key, value in get(app).items():
+            click.echo(f"{key:16} {value}")
+
+
+def ytdlp_command(app):
+    """argv prefix for running yt-dlp as a subprocess."""
+    command = get(app)['ytdlp_command']
+    if not command:
+        raise ProbeError("yt-dlp is not installed on the server.")
+    return list(command)
+
+
+# ------------------------------------------------------
+# 2. METADATA PROBES
+# ------------------------------------------------------
+
+def probe(app, url, cookies_path, timeout=120):
+    """
+    Returns yt-dlp's info dict for a single video: a '--dump-json' subprocess that is
+    killed after `timeout` seconds (ProbeTimeout). With YTDLP_API_MODE the extraction
+    runs in-process through yt_dlp.YoutubeDL instead, avoiding a fresh Python
+    interpreter per call, but then there is NO overall time limit: socket_timeout only
+    bounds each network read, so a slow extractor can hold the worker indefinitely.
+    """
+    if app.config['YTDLP_API_MODE'] and get(app)['ytdlp_api']:
+        import yt_dlp
+
+        options = {
+            'cookiefile': cookies_path if os.path.exists(cookies_path) else None,
+            'noplaylist': True,
+            'quiet': True,
+            'no_warnings': True,
+            'skip_download': True,
+            # In-process there is no process to kill; bound each network read instead
+            'socket_timeout': min(timeout, 30),
+        }
+        try:
+            with yt_dlp.YoutubeDL(options) as ydl:
+                return ydl.sanitize_info(ydl.extract_info(url, download=False))
+        except yt_dlp.utils.DownloadError as e:
+            raise ProbeError(str(e)) from e
+
+    command = _dump_json_command(app, url, cookies_path)
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, encoding='utf-8',
+                                check=True, timeout=timeout)
+    except subprocess.TimeoutExpired as e:
+        raise ProbeTimeout(f"yt-dlp timed out after {timeout}s") from e
+    except subprocess.CalledProcessError as e:
+        raise ProbeError(e.stderr) from e
+    return json.loads(result.stdout)
+
+
+async def probe_async(app, url, cookies_path, timeout=120):
+    """
+    probe() for the ASGI entry point (app/asgi.py). Always a subprocess, whatever
+    YTDLP_API_MODE says: it is awaited on the event loop, so a slow probe holds neither
+    a worker nor a thread, and a timeout or client disconnect kills it outright (an
+    in-process extraction could be neither bounded nor cancelled).
+    """
+    await asyncio.to_thread(get, app)  # First use may run the version checks
+    process = await asyncio.create_subprocess_exec(
+        *_dump_json_command(app, url, cookies_path),
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+        # Client went away or the probe hung: never leave the subprocess behind
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        if isinstance(e, asyncio.TimeoutError):
+            raise ProbeTimeout(f"yt-dlp timed out after {timeout}s") from e
+        raise
+    if process.returncode != 0:
+        raise ProbeError(stderr.decode('utf-8', errors='replace'))
+    return json.loads(stdout)
+
+
+def _dump_json_command(app, url, cookies_path):
+    return ytdlp_command(app) + [
+        '--cookies', cookies_path,
+        '--no-update',
+        '--dump-json',
+        '--no-playlist',
+        url
+    ]
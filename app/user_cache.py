@@ -0,0 +1,103 @@
+# user_cache.py
+
+import time
+import threading
+from collections import OrderedDict
+from flask_login import UserMixin
+
+from app import db
+from app.models import User
+
+# The only columns most authenticated requests need (nav bar, avatar, ownership checks)
+CACHED_FIELDS = ('id', 'username', 'image_file')
+
+
+class UserCache:
+    """
+    Size-bounded, short-TTL LRU of per-user fields, so the user_loader can
+    skip the user SELECT on hot authenticated paths (e.g. downloader status polls).
+    The cache is per process: explicit invalidation covers this worker, the TTL
+    bounds how long other workers may serve stale values.
+    """
+
+    def __init__(self, maxsize=10000, ttl=30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # { user_id: (expires_at, fields) }
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.maxsize = app.config['USER_CACHE_SIZE']
+        self.ttl = app.config['USER_CACHE_TTL']
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return entry[1]
+
+    def set(self, user_id, fields):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[user_id] = (time.monotonic() + self.ttl, fields)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+user_cache = UserCache()
+
+
+class CachedUser(UserMixin):
+    """
+    Stand-in for User built from cached fields. Any other attribute (email,
+    relationships, ...) loads the real row through the session identity map,
+    and assignments are forwarded to that row, so routes can treat it as a User.
+    """
+
+    def __init__(self, fields):
+        self.__dict__.update(fields)
+        self.__dict__['_user'] = None
+
+    def _instance(self):
+        if self.__dict__['_user'] is None:
+            # session.get() returns the already-loaded object if this request has one
+            self.__dict__['_user'] = db.session.get(User, self.__dict__['id'])
+        return self.__dict__['_user']
+
+    def __getattr__(self, name):
+        # Only called for attributes that are not cached
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self._instance(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._instance(), name, value)
+        # Later reads must see the new value, not the cached one
+        self.__dict__.pop(name, None)
+        user_cache.invalidate(self.__dict__['id'])
+
+    def __repr__(self):
+        return f"<CachedUser {self.__dict__.get('username')}>"
+
+
+def load_cached_user(user_id):
+    """user_loader body: cached fields when fresh, otherwise one SELECT that refills the cache."""
+    fields = user_cache.get(user_id)
+    if fields is not None:
+        return CachedUser(fields)
+
+    user = db.session.get(User, user_id)
+    if user is not None:
+        user_cache.set(user_id, {field: getattr(user, field) for field in CACHED_FIELDS})
+    return user
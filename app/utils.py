@@ -5,8 +5,17 @@ import secrets
 import string
 import base64
 import io
-from flask import current_app, flash
-from PIL import Image
+import re
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, url_for, request, has_request_context
+from PIL import Image, ImageOps, features
+from sqlalchemy import select, func
 
 # Define constants for secure code generation
 CHARACTERS = string.ascii_letters + string.digits
@@ -19,68 +28,343 @@ def generate_short_code():
 
 
 # ------------------------------------------------------
-# 1. SAVE PROFILE PICTURE (HANDLING BASE64 DATA)
+# 1. PROFILE PICTURE PIPELINE (staged in the request, processed in the background)
 # ------------------------------------------------------
 
-def save_base64_picture(base64_data):
+# Widths generated for every avatar; the largest JPEG doubles as the legacy/fallback file
+AVATAR_SIZES = (32, 64, 128, 300)
+AVATAR_FORMATS = ('webp', 'avif') if features.check('avif') else ('webp',)
+
+# Stored names are a content hash (<hash>.jpg, <hash>-<size>.<ext>), so a file never changes.
+# 24 hex chars keeps '<hash>.jpg' within user.image_file (String(30)); 32-char names written
+# before that (only SQLite accepted them) are still recognized.
+AVATAR_HASH_LENGTH = 24
+AVATAR_FILE_RE = re.compile(rf'^[0-9a-f]{{{AVATAR_HASH_LENGTH}}}([0-9a-f]{{8}})?(-\d+)?\.(jpg|webp|avif)$')
+AVATAR_URL_PREFIX = '/static/profile_pics/'
+AVATAR_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+AVATAR_MIME_TYPES = {'jpg': 'image/jpeg', 'webp': 'image/webp', 'avif': 'image/avif'}
+
+# Background workers for resizing/encoding (Pillow releases the GIL while doing so)
+_avatar_executor = None
+
+
+def _profile_pics_dir(app):
+    return os.path.join(app.root_path, 'static/profile_pics')
+
+
+def _staging_path():
+    staging_dir = os.path.join(_profile_pics_dir(current_app), '.incoming')
+    os.makedirs(staging_dir, exist_ok=True)
+    return os.path.join(staging_dir, secrets.token_hex(8))
+
+
+def _validate_staged(staged_path):
+    """Header-only check (no pixel decode): a readable image within AVATAR_MAX_PIXELS."""
+    with Image.open(staged_path) as img:
+        width, height = img.size
+        img.verify()
+    if width * height > current_app.config['AVATAR_MAX_PIXELS']:
+        raise ValueError("Image dimensions too large.")
+
+
+def stage_uploaded_picture(file_storage):
+    """
+    Streams a multipart upload (binary, from the cropper) to a staging file in
+    fixed-size chunks, enforcing AVATAR_MAX_BYTES as it goes, so the full
+    upload is never held in memory. Only this cheap part runs inside the request.
+
+    Raises an Exception if the upload is too large or not a valid image.
+    """
+    if not file_storage or not file_storage.filename:
+        return None
+
+    max_bytes = current_app.config['AVATAR_MAX_BYTES']
+    staged_path = _staging_path()
+    try:
+        written = 0
+        with open(staged_path, 'wb') as f:
+            while True:
+                chunk = file_storage.stream.read(64 * 1024)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    raise ValueError("Upload too large.")
+                f.write(chunk)
+
+        _validate_staged(staged_path)
+        return staged_path
+
+    except Exception as e:
+        if os.path.exists(staged_path):
+            os.remove(staged_path)
+        # CRITICAL: We raise a custom error so the route can catch it and flash the user.
+        raise Exception(f"Image processing failed. Use a valid image under {max_bytes // (1024 * 1024)} MB.")
+
+
+def stage_base64_picture(base64_data):
     """
-    Decodes a Base64 image string (from client-side cropper),
-    resizes the image, and saves it with a unique filename.
+    Legacy path for clients that still post a Base64 data URI (no Blob support):
+    decodes it and writes the raw bytes to a staging file.
 
-    Raises an Exception if file processing fails.
+    Raises an Exception if the data is not a valid image.
     """
     if not base64_data:
         return None
 
+    staged_path = _staging_path()
     try:
         # 1. Split off the metadata/header from the Base64 string
         header, encoded = base64_data.split(',', 1)
         data = base64.b64decode(encoded)
+        if len(data) > current_app.config['AVATAR_MAX_BYTES']:
+            raise ValueError("Upload too large.")
 
-        # 2. Determine file extension
-        if 'jpeg' in header or 'jpg' in header:
-            file_ext = '.jpg'
-        elif 'webp' in header:
-            file_ext = '.webp'
-        else:
-            file_ext = '.png'
-
-        # 3. Generate secure filename and path
-        random_hex = secrets.token_hex(8)
-        picture_fn = random_hex + file_ext
-        picture_path = os.path.join(current_app.root_path, 'static/profile_pics', picture_fn)
-
-        # 4. Resize and Save using Pillow
-        output_size = (300, 300)
-        img = Image.open(io.BytesIO(data))
-        img.thumbnail(output_size)
-        img.save(picture_path)
+        # 2. Stage the original for the background worker, then validate the header
+        with open(staged_path, 'wb') as f:
+            f.write(data)
+        _validate_staged(staged_path)
 
-        return picture_fn
+        return staged_path
 
     except Exception as e:
+        if os.path.exists(staged_path):
+            os.remove(staged_path)
         # CRITICAL: We raise a custom error so the route can catch it and flash the user.
         raise Exception("Image processing failed. Ensure file is a valid image format.")
 
 
+def process_avatar(staged_path, picture_dir, token):
+    """
+    Produces every avatar variant from a staged original:
+    <token>-<size>.webp (and .avif when supported) plus <token>-<size>.jpg fallbacks.
+    The 300px JPEG is also written as <token>.jpg, the name stored on the user.
+    """
+    with Image.open(staged_path) as source:
+        # JPEGs are decoded at a reduced scale (1/2 .. 1/8) when still >= 2x the largest
+        # variant, which bounds the decode memory for large camera photos
+        source.draft('RGB', (max(AVATAR_SIZES) * 2, max(AVATAR_SIZES) * 2))
+        source = ImageOps.exif_transpose(source).convert('RGB')
+
+        for size in sorted(AVATAR_SIZES, reverse=True):
+            img = source.copy()
+            img.thumbnail((size, size), Image.LANCZOS)
+            img.save(os.path.join(picture_dir, f"{token}-{size}.jpg"), 'JPEG', quality=85, optimize=True, progressive=True)
+            for fmt in AVATAR_FORMATS:
+                img.save(os.path.join(picture_dir, f"{token}-{size}.{fmt}"), fmt.upper(), quality=80)
+
+    shutil.copyfile(os.path.join(picture_dir, f"{token}-{max(AVATAR_SIZES)}.jpg"),
+                    os.path.join(picture_dir, f"{token}.jpg"))
+    return f"{token}.jpg"
+
+
+def content_token(path):
+    """Content address of a staged upload: identical uploads map to the same file names."""
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()[:AVATAR_HASH_LENGTH]
+
+
+def _avatar_files(image_file):
+    """Every file belonging to one stored picture: the main JPEG plus its size variants."""
+    token = os.path.splitext(image_file)[0]
+    return [image_file] + [f"{token}-{size}.{ext}" for size in AVATAR_SIZES for ext in ('jpg',) + AVATAR_FORMATS]
+
+
+def _avatar_job(app, user_id, staged_path):
+    """Background job: build (or reuse) the variants, then point the user at the picture."""
+    from app import db, storage
+    from app.models import User
+    from app.user_cache import user_cache
+
+    with app.app_context():
+        work_dir = None
+        try:
+            token = content_token(staged_path)
+            picture_fn = f"{token}.jpg"
+            if storage.avatars.exists(picture_fn):
+                # Deduplicated: already stored. Refresh mtimes so a GC pass treats them as new
+                for fn in _avatar_files(picture_fn):
+                    try:
+                        storage.avatars.touch(fn)
+                    except Exception:
+                        pass
+            else:
+                # Encode locally, then hand every file to the storage backend.
+                # The main <token>.jpg goes last: its presence marks the set as complete.
+                work_dir = tempfile.mkdtemp(prefix='avatar-')
+                process_avatar(staged_path, work_dir, token)
+                for fn in reversed(_avatar_files(picture_fn)):
+                    ext = fn.rsplit('.', 1)[-1]
+                    storage.avatars.save_file(fn, os.path.join(work_dir, fn), content_type=AVATAR_MIME_TYPES[ext],
+                                              cache_control=AVATAR_CACHE_CONTROL, move=True)
+        except Exception as e:
+            app.logger.error(f"Avatar processing failed for user {user_id}: {e}")
+            return
+        finally:
+            try:
+                os.remove(staged_path)
+            except OSError:
+                pass
+            if work_dir:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+        # Swap only after the files exist, so pages never show a missing image.
+        # The old picture is not deleted here: other users may share it, and cached
+        # pages may still reference it; collect_unreferenced_avatars() removes it later.
+        try:
+            user = db.session.get(User, user_id)
+            if user is None:
+                return  # Unreferenced files are left to the garbage collector
+            user.image_file = picture_fn
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Avatar update failed for user {user_id}: {e}")
+            return
+        user_cache.invalidate(user_id)
+
+        maybe_collect_avatars(app)
+
+
+def queue_avatar_processing(user_id, staged_path):
+    """Hands a staged upload to the avatar worker pool and returns immediately."""
+    global _avatar_executor
+    if _avatar_executor is None:
+        _avatar_executor = ThreadPoolExecutor(max_workers=current_app.config['AVATAR_WORKERS'],
+                                              thread_name_prefix='avatar')
+    _avatar_executor.submit(_avatar_job, current_app._get_current_object(), user_id, staged_path)
+
+
+@lru_cache(maxsize=4096)
+def _has_variants(image_file):
+    """Legacy single-file avatars (and default.jpg) have no size variants."""
+    from app import storage
+
+    if image_file == 'default.jpg':
+        return False
+    token = os.path.splitext(image_file)[0]
+    return storage.avatars.exists(f"{token}-{min(AVATAR_SIZES)}.jpg")
+
+
+def avatar_url(filename):
+    """URL of one stored avatar file: the bucket's public URL (S3), or the static route for local files."""
+    from app import storage
+
+    if filename != 'default.jpg':
+        url = storage.avatars.url(filename)
+        if url:
+            return url
+    return url_for('static', filename='profile_pics/' + filename)
+
+
+def avatar_sources(image_file):
+    """
+    Template helper: URLs for a responsive <picture>. Returns
+    {'src': ..., 'srcsets': {mime: srcset}, 'jpeg_srcset': ...}; the srcsets are
+    empty for pictures uploaded before variants existed.
+    """
+    sources = {'src': avatar_url(image_file), 'srcsets': {}, 'jpeg_srcset': ''}
+    if not _has_variants(image_file):
+        return sources
+
+    token = os.path.splitext(image_file)[0]
+
+    def srcset(ext):
+        return ', '.join(f"{avatar_url(f'{token}-{size}.{ext}')} {size}w" for size in AVATAR_SIZES)
+
+    # Best compression first: browsers take the first <source> they support
+    for fmt in reversed(AVATAR_FORMATS):
+        sources['srcsets'][f'image/{fmt}'] = srcset(fmt)
+    sources['jpeg_srcset'] = srcset('jpg')
+    return sources
+
+
+def avatar_cache_headers(response):
+    """
+    after_request hook: content-addressed avatar files never change, so browsers
+    and proxies may cache them for a year without revalidating.
+    """
+    if response.status_code in (200, 304) and has_request_context():
+        filename = request.path.rsplit('/', 1)[-1]
+        if request.path.startswith(AVATAR_URL_PREFIX) and AVATAR_FILE_RE.match(filename):
+            response.headers['Cache-Control'] = AVATAR_CACHE_CONTROL
+    return response
+
+
 # ------------------------------------------------------
-# 2. DELETE PROFILE PICTURE (Synchronous and Safe)
+# 2. GARBAGE COLLECTION (deferred, reference-counted)
 # ------------------------------------------------------
 
-def delete_picture(old_picture_fn):
-    """Safely deletes ONE profile picture file from static/profile_pics."""
+_gc_lock = threading.Lock()
+_last_gc = 0.0
 
-    if not old_picture_fn or old_picture_fn == 'default.jpg':
-        return
 
-    safe_dir = os.path.join(current_app.root_path, 'static/profile_pics')
-    old_picture_path = os.path.join(safe_dir, old_picture_fn)
+def avatar_refcounts():
+    """{image_file: number of users pointing at it}, counted by the database."""
+    from app import db
+    from app.models import User
+
+    rows = db.session.execute(select(User.image_file, func.count()).group_by(User.image_file))
+    return {image_file: count for image_file, count in rows}
+
+
+def collect_unreferenced_avatars(app, grace=None):
+    """
+    Deletes stored picture files that no user references (refcount 0) and that are
+    older than the grace period (AVATAR_GC_GRACE), plus abandoned staged uploads.
+    The grace period keeps files alive for pages and jobs that are still in flight.
+    Returns the number of files removed. Needs an app context.
+    """
+    from app import storage
+
+    grace = app.config['AVATAR_GC_GRACE'] if grace is None else grace
+    cutoff = time.time() - grace
 
-    # Check if file exists and is within the safe directory
-    if os.path.abspath(old_picture_path).startswith(os.path.abspath(safe_dir)) and os.path.exists(old_picture_path):
+    referenced = {'default.jpg'}
+    for image_file, count in avatar_refcounts().items():
+        if image_file and count:
+            referenced.update(_avatar_files(image_file))
+
+    removed = 0
+    for obj in list(storage.avatars.list()):
+        # A dedup hit touches its files before re-referencing them, so they look new here
+        if obj.key in referenced or obj.modified > cutoff:
+            continue
         try:
-            os.remove(old_picture_path)
-        except OSError:
-            # CRITICAL: Flash a user-facing warning if deletion fails (e.g., file lock)
-            flash("Warning: Could not delete old profile image due to file lock.", 'warning')
-            pass
+            storage.avatars.delete(obj.key)
+            removed += 1
+        except Exception as e:
+            app.logger.warning(f"Avatar GC could not remove {obj.key}: {e}")
+
+    # Staged uploads are per node, on local disk
+    staging_dir = os.path.join(_profile_pics_dir(app), '.incoming')
+    if os.path.isdir(staging_dir):
+        for entry in os.scandir(staging_dir):
+            try:
+                if entry.is_file() and entry.stat().st_mtime <= cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except OSError as e:
+                app.logger.warning(f"Avatar GC could not remove staged {entry.name}: {e}")
+
+    _has_variants.cache_clear()
+    return removed
+
+
+def maybe_collect_avatars(app):
+    """Runs a GC pass at most once per AVATAR_GC_INTERVAL, and never two at once."""
+    global _last_gc
+    interval = app.config['AVATAR_GC_INTERVAL']
+    if interval <= 0 or time.monotonic() - _last_gc < interval:
+        return
+    if not _gc_lock.acquire(blocking=False):
+        return
+    try:
+        _last_gc = time.monotonic()
+        removed = collect_unreferenced_avatars(app)
+        if removed:
+            app.logger.info(f"Avatar GC removed {removed} unreferenced files.")
+    except Exception as e:
+        app.logger.error(f"Avatar GC failed: {e}")
+    finally:
+        _gc_lock.release()
@@ -0,0 +1,11 @@
+# asgi.py
+# ASGI entry point, alongside the WSGI one in run.py:
+#   uvicorn asgi:app --workers 4
+#   gunicorn asgi:app -k uvicorn.workers.UvicornWorker
+# Slow, I/O-bound endpoints run on the event loop; everything else is the same Flask app
+# (see app/asgi.py). uvicorn, asgiref and aiosqlite are in requirements.txt; PostgreSQL also needs asyncpg.
+
+from app import create_app
+from app.asgi import AsyncApp
+
+app = AsyncApp(create_app())
@@ -0,0 +1,3 @@
+# benchmarks/__init__.py
+# Standalone performance scripts for the hub. Run each one as a module from the
+# repository root, e.g. `python -m benchmarks.bench_hashing`.
@@ -0,0 +1,108 @@
+# benchmarks/bench_avatar_upload.py
+"""
+Avatar upload cost per request: peak Python heap (tracemalloc) and wall time to
+parse the POST body and stage the image, for the legacy Base64 data-URI form
+field versus the binary multipart 'avatar' file, plus the background
+process_avatar step (which decodes large JPEGs at reduced scale via draft()).
+
+    python -m benchmarks.bench_avatar_upload --size 4000 --runs 5
+"""
+
+import io
+import os
+import time
+import base64
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+from PIL import Image
+from werkzeug.test import EnvironBuilder
+
+from app import create_app
+from app.utils import stage_base64_picture, stage_uploaded_picture, process_avatar
+
+
+def _sample_jpeg(size):
+    """A noisy (hard to compress) square JPEG, roughly what a phone camera produces."""
+    image = Image.effect_noise((size, size), 64).convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def _environ(data):
+    # Built before tracing starts: the client-side body is not part of the measurement
+    return EnvironBuilder(path='/auth/profile', method='POST', data=data).get_environ()
+
+
+def _measure(app, environ, stage):
+    """Parses the request body and stages the image; returns (peak bytes, seconds)."""
+    with app.request_context(environ):
+        tracemalloc.start()
+        start = time.perf_counter()
+        staged_path = stage()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    os.remove(staged_path)
+    return peak, elapsed
+
+
+def run(size, runs):
+    app = create_app()
+    app.config['AVATAR_MAX_BYTES'] = 64 * 1024 * 1024  # measure, don't reject
+    jpeg = _sample_jpeg(size)
+    data_uri = 'data:image/jpeg;base64,' + base64.b64encode(jpeg).decode('ascii')
+
+    from flask import request
+
+    paths = {
+        'base64_form_field': (
+            lambda: {'image_data_uri': data_uri},
+            lambda: stage_base64_picture(request.form.get('image_data_uri')),
+        ),
+        'multipart_file': (
+            lambda: {'avatar': (io.BytesIO(jpeg), 'avatar.jpg', 'image/jpeg')},
+            lambda: stage_uploaded_picture(request.files.get('avatar')),
+        ),
+    }
+
+    result = {'image_px': f"{size}x{size}", 'jpeg_bytes': len(jpeg)}
+    for name, (body, stage) in paths.items():
+        samples = [_measure(app, _environ(body()), stage) for _ in range(runs)]
+        result[f'{name}_peak_kib'] = round(max(peak for peak, _ in samples) / 1024)
+        result[f'{name}_ms'] = round(min(elapsed for _, elapsed in samples) * 1000, 2)
+
+    # Background step: decode + resize + encode every variant
+    work_dir = tempfile.mkdtemp()
+    try:
+        staged_path = os.path.join(work_dir, 'staged')
+        with open(staged_path, 'wb') as f:
+            f.write(jpeg)
+        tracemalloc.start()
+        start = time.perf_counter()
+        process_avatar(staged_path, work_dir, 'bench')
+        result['process_avatar_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        # Pillow's pixel buffers are allocated in C; tracemalloc sees only Python objects
+        result['process_avatar_python_peak_kib'] = round(tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.stop()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=3000, help='source image width/height in pixels')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    result = run(args.size, args.runs)
+    for key, value in result.items():
+        print(f"{key:32} {value}")
+
+
+if __name__ == '__main__':
+    main()
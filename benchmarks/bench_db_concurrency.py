@@ -0,0 +1,152 @@
+# benchmarks/bench_db_concurrency.py
+"""
+Throughput of concurrent short-link redirects (one SELECT plus one click UPDATE
+each) under different database engine profiles (see app/database.py). A
+threaded WSGI server is driven by --clients concurrent keep-alive clients, so
+readers and writers contend the way gunicorn threads do.
+
+    python -m benchmarks.seed --scale 0.1
+    python -m benchmarks.bench_db_concurrency --scale 0.1 --clients 16
+
+Profiles are applied through the same environment variables as production:
+'baseline' is the untuned engine (rollback journal, synchronous=FULL, default
+pool), 'tuned' is the app's defaults.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import datetime
+import platform
+import threading
+
+from benchmarks.seed import make_app, seed, database_url, short_code
+from benchmarks.bench_routes import RESULTS_DIR, _git_commit, _percentile
+
+PROFILES = {
+    'baseline': {
+        'SQLITE_JOURNAL_MODE': 'DELETE', 'SQLITE_SYNCHRONOUS': 'FULL', 'SQLITE_MMAP_SIZE': '0',
+        'DB_POOL_SIZE': '5', 'DB_MAX_OVERFLOW': '10', 'DB_POOL_RECYCLE': '-1', 'DB_POOL_PRE_PING': 'false',
+    },
+    'tuned': {},
+}
+ENGINE_VARIABLES = sorted({name for overrides in PROFILES.values() for name in overrides})
+
+
+def _make_profile_app(profile):
+    for name in ENGINE_VARIABLES:
+        os.environ.pop(name, None)
+    os.environ.update(PROFILES[profile])
+    return make_app()
+
+
+def run_profile(profile, clients, duration, links, seed_value):
+    import requests
+    from werkzeug.serving import make_server, WSGIRequestHandler
+    from app import db
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    app = _make_profile_app(profile)
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}/links/"
+
+    timings, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(index):
+        rng = random.Random(seed_value * 1000 + index)
+        session = requests.Session()
+        local, failed = [], 0
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            try:
+                status = session.get(base + short_code(rng.randrange(links)), allow_redirects=False).status_code
+            except requests.RequestException:
+                status = 599
+            local.append(time.perf_counter() - t0)
+            if status != 302:
+                failed += 1
+        with lock:
+            timings.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    with app.app_context():
+        journal_mode = (db.session.execute(db.text('PRAGMA journal_mode')).scalar()
+                        if db.engine.dialect.name == 'sqlite' else None)
+        db.engine.dispose()
+
+    timings.sort()
+    return {
+        'requests': len(timings),
+        'errors': errors[0],
+        'req_per_sec': round(len(timings) / elapsed, 2),
+        'p50_ms': round(_percentile(timings, 50) * 1000, 3),
+        'p95_ms': round(_percentile(timings, 95) * 1000, 3),
+        'p99_ms': round(_percentile(timings, 99) * 1000, 3),
+        'journal_mode': journal_mode,
+    }
+
+
+def run(scale=1.0, clients=16, duration=10.0, profiles=None, seed_value=1):
+    counts = seed(make_app(), scale, seed_value)
+    results = {}
+    for profile in profiles or list(PROFILES):
+        results[profile] = run_profile(profile, clients, duration, counts['links'], seed_value)
+        r = results[profile]
+        print(f"{profile:10} {r['req_per_sec']:>9} req/s  p50 {r['p50_ms']:>8} ms  p99 {r['p99_ms']:>9} ms  "
+              f"{r['errors']} errors", file=sys.stderr)
+
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'database': database_url().split('://', 1)[0],
+            'scale': scale,
+            'clients': clients,
+            'duration_s': duration,
+        },
+        'profiles': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, default=1.0, help='dataset size (see benchmarks.seed)')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent clients')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per profile')
+    parser.add_argument('--profile', action='append', choices=sorted(PROFILES), help='run only this profile')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/db-<commit>-<time>.json)')
+    args = parser.parse_args()
+
+    result = run(args.scale, args.clients, args.duration, args.profile)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"db-{result['meta']['commit']}-{stamp}.json")
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
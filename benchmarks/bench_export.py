@@ -0,0 +1,181 @@
+# benchmarks/bench_export.py
+"""
+Throughput and memory of the streamed exports (/api/v1/<resource>/export) for one
+user owning --rows short links (1M by default, inserted once into the benchmark
+database). The response is consumed chunk by chunk, as a client downloading it
+would; anonymous resident memory is sampled along the way, so a flat 'rss_growth_mb' at
+every checkpoint shows memory does not depend on the row count. --naive adds the
+load-everything variant (.all() + one string) for comparison.
+
+    python -m benchmarks.bench_export --rows 1000000
+    python -m benchmarks.bench_export --rows 1000000 --format ndjson --naive
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import platform
+
+from sqlalchemy import select, func
+
+from benchmarks.seed import make_app, database_url, BENCH_PASSWORD, _insert_batches
+from benchmarks.bench_routes import RESULTS_DIR, _git_commit
+
+EXPORT_EMAIL = 'export-bench@example.com'
+CHECKPOINTS = (10_000, 100_000, 1_000_000, 10_000_000)
+
+
+def _rss_mb():
+    """
+    Anonymous resident memory of this process (Linux), in MB: resident minus file-backed
+    pages, so SQLite's mmap'd database file (SQLITE_MMAP_SIZE) is not counted as heap.
+    """
+    with open('/proc/self/statm') as f:
+        resident, shared = (int(value) for value in f.read().split()[1:3])
+    return (resident - shared) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+def seed_export_user(app, rows):
+    """Creates the export user with `rows` short links (skipped if already there); returns its id."""
+    from app import db, hasher
+    from app.models import User, ShortLink
+
+    with app.app_context():
+        db.create_all()
+        user = User.query.filter_by(email=EXPORT_EMAIL).first()
+        if user is None:
+            user = User(username='exportbench', email=EXPORT_EMAIL, password_hash=hasher.hash(BENCH_PASSWORD))
+            db.session.add(user)
+            db.session.commit()
+        existing = db.session.scalar(select(func.count()).select_from(ShortLink).where(ShortLink.user_id == user.id))
+        start = datetime.datetime(2024, 1, 1)
+        _insert_batches(db, ShortLink.__table__, (
+            {'url': f"https://example.com/export/{i}", 'short_url': f"e{i:07x}", 'clicks': i % 1000,
+             'date_created': start + datetime.timedelta(seconds=i), 'user_id': user.id}
+            for i in range(existing, rows)
+        ))
+        return user.id
+
+
+def run_stream(app, user_id, fmt):
+    from app import db
+    from app.models import User
+
+    with app.test_request_context():
+        token = db.session.get(User, user_id).get_api_token()
+    client = app.test_client()
+
+    rss_start = _rss_mb()
+    rss_peak, rows, size, checkpoints = rss_start, -1 if fmt == 'csv' else 0, 0, {}
+    started = time.perf_counter()
+    response = client.get(f"/api/v1/links/export?format={fmt}", buffered=False,
+                          headers={'Authorization': f"Bearer {token}"})
+    first_byte = None
+    for chunk in response.response:
+        if first_byte is None:
+            first_byte = time.perf_counter() - started
+        size += len(chunk)
+        rows += chunk.count(b'\n')
+        rss_peak = max(rss_peak, _rss_mb())
+        for checkpoint in CHECKPOINTS:
+            if rows >= checkpoint and checkpoint not in checkpoints:
+                checkpoints[checkpoint] = round(rss_peak - rss_start, 1)
+    response.close()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'status': response.status_code,
+        'rows': rows,
+        'bytes': size,
+        'seconds': round(elapsed, 3),
+        'first_byte_ms': round((first_byte or 0) * 1000, 1),
+        'rows_per_sec': round(rows / elapsed),
+        'mb_per_sec': round(size / elapsed / (1024 * 1024), 1),
+        'rss_growth_mb': round(rss_peak - rss_start, 1),
+        'rss_growth_at_rows_mb': {str(k): v for k, v in checkpoints.items()},
+    }
+
+
+def run_naive(app, user_id, fmt):
+    """The non-streamed equivalent: every ORM row loaded, then one response body."""
+    import io
+    import csv
+    from app.models import ShortLink
+
+    rss_start = _rss_mb()
+    started = time.perf_counter()
+    with app.app_context():
+        links = ShortLink.query.filter_by(user_id=user_id).order_by(ShortLink.id).all()
+        if fmt == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(['id', 'url', 'short_url', 'clicks', 'date_created'])
+            writer.writerows([l.id, l.url, l.short_url, l.clicks, l.date_created.isoformat()] for l in links)
+            body = buffer.getvalue().encode()
+        else:
+            body = ''.join(json.dumps({'id': l.id, 'url': l.url, 'short_url': l.short_url, 'clicks': l.clicks,
+                                       'date_created': l.date_created.isoformat()}) + '\n' for l in links).encode()
+        rss_peak = _rss_mb()
+        rows = len(links)
+        del links
+    elapsed = time.perf_counter() - started
+    return {
+        'rows': rows,
+        'bytes': len(body),
+        'seconds': round(elapsed, 3),
+        'rows_per_sec': round(rows / elapsed),
+        'rss_growth_mb': round(rss_peak - rss_start, 1),
+    }
+
+
+def run(rows=1_000_000, fmt='csv', naive=False):
+    app = make_app()
+    user_id = seed_export_user(app, rows)
+    results = {'stream': run_stream(app, user_id, fmt)}
+    if naive:
+        results['naive'] = run_naive(app, user_id, fmt)
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'database': database_url().split('://', 1)[0],
+            'rows': rows,
+            'format': fmt,
+            'batch_size': app.config['EXPORT_BATCH_SIZE'],
+        },
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000, help='short links owned by the export user')
+    parser.add_argument('--format', choices=('csv', 'ndjson'), default='csv')
+    parser.add_argument('--naive', action='store_true', help='also time the load-everything variant')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/export-<commit>-<time>.json)')
+    args = parser.parse_args()
+
+    result = run(args.rows, args.format, args.naive)
+    for name, r in result['results'].items():
+        print(f"{name:7} {r['rows']} rows in {r['seconds']} s ({r['rows_per_sec']} rows/s, {r['bytes']} bytes), "
+              f"RSS +{r['rss_growth_mb']} MB", file=sys.stderr)
+    stream = result['results']['stream']
+    print(f"stream  first byte after {stream['first_byte_ms']} ms; RSS growth by rows streamed: "
+          f"{stream['rss_growth_at_rows_mb']}", file=sys.stderr)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"export-{result['meta']['commit']}-{stamp}.json")
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+# benchmarks/bench_hashing.py
+"""
+Password hashing throughput: hashes/sec for one core and for the hashing
+process pool, plus the per-core figure used to size PASSWORD_HASH_WORKERS.
+
+    python -m benchmarks.bench_hashing --method pbkdf2:sha256:600000 --seconds 5
+"""
+
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import generate_password_hash
+
+from app.hashing import normalize_method
+
+
+def _hash_for(method, seconds):
+    """Hashes in a loop for `seconds` and returns how many hashes were made."""
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        generate_password_hash('correct horse battery staple', method)
+        count += 1
+    return count
+
+
+def run(method, seconds, workers):
+    single = _hash_for(method, seconds) / seconds
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pool.submit(_hash_for, method, 0).result()  # warm the workers up
+        start = time.perf_counter()
+        total = sum(pool.map(_hash_for, [method] * workers, [seconds] * workers))
+        pooled = total / (time.perf_counter() - start)
+
+    return {
+        'method': normalize_method(method),
+        'workers': workers,
+        'single_core_hashes_per_sec': round(single, 2),
+        'pool_hashes_per_sec': round(pooled, 2),
+        'pool_hashes_per_sec_per_core': round(pooled / workers, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--method', default='pbkdf2:sha256', help='werkzeug method string (work factor)')
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    result = run(args.method, args.seconds, args.workers)
+    for key, value in result.items():
+        print(f"{key:32} {value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+# benchmarks/bench_import.py
+"""
+Throughput of the bulk import pipeline (app/importer.py, behind 'flask import' and
+POST /api/v1/<resource>/import). A --rows file is generated once per format, then
+imported for a dedicated user at each --batch-sizes value. --naive adds the
+form-style path (one ORM object and one commit per row) on the first --naive-rows
+rows for comparison.
+
+    python -m benchmarks.bench_import --rows 1000000
+    python -m benchmarks.bench_import --resource tasks --format ndjson --batch-sizes 100,1000,5000 --naive
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import datetime
+import platform
+import tempfile
+
+from benchmarks.seed import make_app, database_url, BENCH_PASSWORD
+from benchmarks.bench_routes import RESULTS_DIR, _git_commit
+
+IMPORT_EMAIL = 'import-bench@example.com'
+
+
+def _record(resource, i):
+    stamp = (datetime.datetime(2024, 1, 1) + datetime.timedelta(seconds=i)).isoformat()
+    if resource == 'links':
+        return {'url': f"https://example.com/import/{i}", 'clicks': i % 1000, 'date_created': stamp}
+    if resource == 'tasks':
+        return {'title': f"Imported task {i}", 'content': 'Migrated from another tool.',
+                'completed': i % 3 == 0, 'date_posted': stamp}
+    return {'title': f"Imported post {i}", 'content': 'Migrated from another tool. ' * 8, 'date_posted': stamp}
+
+
+def write_file(resource, fmt, rows):
+    """Generates the import file (reused across runs); returns its path."""
+    import csv
+
+    path = os.path.join(tempfile.gettempdir(), f"hub-import-{resource}-{rows}.{fmt}")
+    if os.path.exists(path):
+        return path
+    with open(path, 'w', newline='') as f:
+        if fmt == 'csv':
+            writer = csv.DictWriter(f, fieldnames=list(_record(resource, 0)))
+            writer.writeheader()
+            writer.writerows(_record(resource, i) for i in range(rows))
+        else:
+            f.writelines(json.dumps(_record(resource, i)) + '\n' for i in range(rows))
+    return path
+
+
+def import_user(app):
+    from app import db, hasher
+    from app.models import User
+
+    with app.app_context():
+        db.create_all()
+        user = User.query.filter_by(email=IMPORT_EMAIL).first()
+        if user is None:
+            user = User(username='importbench', email=IMPORT_EMAIL, password_hash=hasher.hash(BENCH_PASSWORD))
+            db.session.add(user)
+            db.session.commit()
+        return user.id
+
+
+def run_bulk(app, resource, fmt, path, user_id, batch_size):
+    from app.importer import import_rows
+
+    with app.app_context(), open(path, 'rb') as f:
+        report = import_rows(resource, f, fmt, user_id, batch_size,
+                             app.config['IMPORT_TRANSACTION_BATCHES'], app.config['IMPORT_MAX_ERRORS'])
+    return {key: report[key] for key in ('inserted', 'rejected', 'seconds', 'rows_per_sec')}
+
+
+def run_naive(app, resource, user_id, rows):
+    """What the forms do today: one ORM object and one commit per row."""
+    from app import db
+    from app.models import Post, Task, ShortLink
+    from app.utils import generate_short_code
+
+    started = time.perf_counter()
+    with app.app_context():
+        for i in range(rows):
+            record = _record(resource, i)
+            if resource == 'links':
+                row = ShortLink(url=record['url'], short_url=generate_short_code(), user_id=user_id)
+            elif resource == 'tasks':
+                row = Task(title=record['title'], content=record['content'], user_id=user_id)
+            else:
+                row = Post(title=record['title'], content=record['content'], user_id=user_id)
+            db.session.add(row)
+            db.session.commit()
+    elapsed = time.perf_counter() - started
+    return {'inserted': rows, 'seconds': round(elapsed, 3), 'rows_per_sec': round(rows / elapsed)}
+
+
+def run(resource='links', fmt='csv', rows=1_000_000, batch_sizes=(1000,), naive=False, naive_rows=10_000):
+    app = make_app()
+    user_id = import_user(app)
+    path = write_file(resource, fmt, rows)
+    results = {f"batch_{size}": run_bulk(app, resource, fmt, path, user_id, size) for size in batch_sizes}
+    if naive:
+        results['naive'] = run_naive(app, resource, user_id, min(rows, naive_rows))
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'database': database_url().split('://', 1)[0],
+            'resource': resource,
+            'format': fmt,
+            'rows': rows,
+            'file_bytes': os.path.getsize(path),
+            'transaction_batches': app.config['IMPORT_TRANSACTION_BATCHES'],
+        },
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--resource', choices=('posts', 'tasks', 'links'), default='links')
+    parser.add_argument('--format', choices=('csv', 'ndjson'), default='csv')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='rows in the generated import file')
+    parser.add_argument('--batch-sizes', default='1000', help='comma-separated rows per INSERT to compare')
+    parser.add_argument('--naive', action='store_true', help='also time one ORM commit per row')
+    parser.add_argument('--naive-rows', type=int, default=10_000, help='rows for the naive variant')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/import-<commit>-<time>.json)')
+    args = parser.parse_args()
+
+    batch_sizes = [int(size) for size in args.batch_sizes.split(',') if size.strip()]
+    result = run(args.resource, args.format, args.rows, batch_sizes, args.naive, args.naive_rows)
+    for name, r in result['results'].items():
+        print(f"{name:11} {r['inserted']} rows in {r['seconds']} s ({r['rows_per_sec']} rows/s)", file=sys.stderr)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"import-{result['meta']['commit']}-{stamp}.json")
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+# benchmarks/bench_page_weight.py
+"""
+Page weight of the main pages: every stylesheet and script a page references is
+fetched through the app (as a browser would, with Accept-Encoding: br, gzip) and
+reported as bytes transferred, plus the decoded JavaScript the browser has to
+parse before the page is interactive. Modules a page only loads on demand
+(data-module="...") are listed separately and not counted. Third-party URLs are
+counted as requests but not fetched.
+
+    python -m benchmarks.seed --scale 0.01
+    python -m benchmarks.bench_page_weight --scale 0.01
+    python -m benchmarks.bench_page_weight --scale 0.01 --compare benchmarks/results/<base>.json
+"""
+
+import os
+import sys
+import json
+import argparse
+import datetime
+import platform
+from html.parser import HTMLParser
+
+from benchmarks.seed import make_app, seed, database_url, bench_email, BENCH_PASSWORD
+from benchmarks.bench_routes import RESULTS_DIR, _git_commit
+
+ACCEPT_ENCODING = 'br, gzip'
+
+# (name, path, logged in)
+PAGES = [
+    ('home', '/', True),
+    ('about', '/about', False),
+    ('login', '/auth/login', False),
+    ('blog_index', '/blog/', True),
+    ('tasks_index', '/tasks/', True),
+    ('downloader', '/downloader/download', True),
+    ('profile', '/auth/profile', True),
+]
+
+
+class ResourceParser(HTMLParser):
+    """Collects the stylesheets, scripts (external and inline) and on-demand modules of a page."""
+
+    def __init__(self):
+        super().__init__()
+        self.resources = []  # (kind, url)
+        self.inline_js = 0
+        self._in_script = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if attrs.get('data-module'):
+            self.resources.append(('lazy', attrs['data-module']))
+        if tag == 'link' and attrs.get('rel') == 'stylesheet':
+            self.resources.append(('css', attrs['href']))
+        elif tag == 'script' and attrs.get('src'):
+            self.resources.append(('js', attrs['src']))
+        elif tag == 'script' and attrs.get('type', 'text/javascript') in ('text/javascript', 'module'):
+            self._in_script = True
+
+    def handle_endtag(self, tag):
+        if tag == 'script':
+            self._in_script = False
+
+    def handle_data(self, data):
+        if self._in_script:
+            self.inline_js += len(data.encode())
+
+
+def _decode(body, encoding):
+    if encoding == 'gzip':
+        import gzip
+        return gzip.decompress(body)
+    if encoding == 'br':
+        import brotli  # The app only sends brotli when it is installed
+        return brotli.decompress(body)
+    return body
+
+
+def _fetch(client, url):
+    """(status, decoded body, sizes) of one GET, sent the way a browser would."""
+    response = client.get(url, headers={'Accept-Encoding': ACCEPT_ENCODING})
+    body = response.get_data()
+    decoded = _decode(body, response.headers.get('Content-Encoding'))
+    cached = 'immutable' in response.headers.get('Cache-Control', '')
+    return response.status_code, decoded, {'transferred': len(body), 'decoded': len(decoded), 'cached': cached}
+
+
+def measure_page(client, path):
+    status, body, html = _fetch(client, path)
+    if status != 200:
+        raise RuntimeError(f"GET {path} returned HTTP {status}")
+    parser = ResourceParser()
+    parser.feed(body.decode())
+
+    resources, lazy, external = [], [], []
+    for kind, url in parser.resources:
+        if url.startswith(('http://', 'https://', '//')):
+            external.append(url)
+        elif kind == 'lazy':
+            lazy.append({'url': url, **_fetch(client, url)[2]})
+        else:
+            resources.append({'kind': kind, 'url': url, **_fetch(client, url)[2]})
+
+    transferred = html['transferred'] + sum(r['transferred'] for r in resources)
+    return {
+        'requests': 1 + len(resources) + len(external),
+        'transferred_bytes': transferred,
+        # A repeat view only fetches what is not cached as immutable
+        'repeat_transferred_bytes': html['transferred'] + sum(r['transferred'] for r in resources if not r['cached']),
+        'html_bytes': html['transferred'],
+        'css_decoded_bytes': sum(r['decoded'] for r in resources if r['kind'] == 'css'),
+        # JavaScript parsed before the page is interactive (proxy for parse/compile cost)
+        'js_decoded_bytes': sum(r['decoded'] for r in resources if r['kind'] == 'js') + parser.inline_js,
+        'inline_js_bytes': parser.inline_js,
+        'external': external,
+        'resources': resources,
+        'lazy': lazy,
+    }
+
+
+def run(scale=0.01, seed_value=1):
+    app = make_app()
+    seed(app, scale, seed_value)
+    anonymous, logged_in = app.test_client(), app.test_client()
+    status = logged_in.post('/auth/login', data={'email': bench_email(0), 'password': BENCH_PASSWORD}).status_code
+    if status != 302:
+        raise RuntimeError(f"Benchmark login failed with HTTP {status}")
+
+    pages = {}
+    for name, path, needs_login in PAGES:
+        pages[name] = measure_page(logged_in if needs_login else anonymous, path)
+
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'database': database_url().split('://', 1)[0],
+            'accept_encoding': ACCEPT_ENCODING,
+        },
+        'pages': pages,
+    }
+
+
+def _print_report(result, baseline=None):
+    columns = ('requests', 'transferred_bytes', 'repeat_transferred_bytes', 'js_decoded_bytes')
+    print(f"{'page':12} {'requests':>9} {'transferred':>12} {'repeat view':>12} {'JS parsed':>10}", file=sys.stderr)
+    for name, page in result['pages'].items():
+        cells = []
+        for column in columns:
+            cell = f"{page[column]}"
+            base = (baseline or {}).get('pages', {}).get(name)
+            if base is not None and base.get(column):
+                cell += f" ({(page[column] - base[column]) / base[column] * 100:+.0f}%)"
+            cells.append(cell)
+        lazy = sum(m['transferred'] for m in page['lazy'])
+        print(f"{name:12} {cells[0]:>9} {cells[1]:>12} {cells[2]:>12} {cells[3]:>10}"
+              + (f"  (+{lazy} on demand)" if lazy else ''), file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, default=0.01, help='dataset size (see benchmarks.seed)')
+    parser.add_argument('--compare', help='earlier result file to print relative changes against')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/pages-<commit>-<time>.json)')
+    args = parser.parse_args()
+
+    result = run(args.scale)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    _print_report(result, baseline)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"pages-{result['meta']['commit']}-{stamp}.json")
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
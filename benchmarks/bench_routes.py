@@ -0,0 +1,299 @@
+# benchmarks/bench_routes.py
+"""
+Hot-path latency of the hub against a seeded database (see benchmarks.seed).
+Each scenario is driven through the Flask test client (in-process) or a local
+threaded WSGI server (real sockets), and reports p50/p95/p99, req/s and SQL
+queries per request. Results are written as JSON, named after the git commit,
+so two runs can be compared:
+
+    python -m benchmarks.seed --scale 0.1
+    python -m benchmarks.bench_routes --scale 0.1
+    python -m benchmarks.bench_routes --scale 0.1 --compare benchmarks/results/<base>.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import datetime
+import threading
+import subprocess
+from statistics import mean
+
+from sqlalchemy import event
+
+from benchmarks.seed import make_app, seed, database_url, bench_email, short_code, BENCH_PASSWORD
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+# Requests per scenario; login is dominated by the password hash on purpose
+DEFAULT_REQUESTS = {
+    'redirect_to_url': 2000,
+    'blog_index': 20,
+    'blog_search': 50,
+    'tasks_index': 500,
+    'login': 20,
+    'download_status': 2000,
+    'links_index': 500,
+    # JSON API counterparts of the HTML pages above (bearer token auth)
+    'api_posts': 500,
+    'api_tasks': 500,
+    'api_links': 500,
+}
+
+
+# ------------------------------------------------------
+# 1. TRANSPORTS
+# ------------------------------------------------------
+
+class TestClientTransport:
+    """In-process: measures the app itself, no socket or server overhead."""
+
+    def __init__(self, app):
+        self._app = app
+        self._client = app.test_client()
+        self.headers = {}  # sent with every GET (e.g. Authorization)
+
+    def reset(self):
+        """Drops cookies (session), i.e. behaves like a new visitor."""
+        self._client = self._app.test_client()
+
+    def get(self, path):
+        return self._client.get(path, headers=self.headers).status_code
+
+    def post(self, path, data):
+        return self._client.post(path, data=data).status_code
+
+    def close(self):
+        pass
+
+
+class WSGIServerTransport:
+    """A threaded werkzeug server on a random local port, driven over HTTP keep-alive."""
+
+    def __init__(self, app):
+        import requests
+        from werkzeug.serving import make_server, WSGIRequestHandler
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_request(self, *args, **kwargs):
+                pass  # One access-log line per request would dominate the measurement
+
+        self._server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        self._base = f"http://127.0.0.1:{self._server.server_port}"
+        self._session = requests.Session()
+        self.headers = {}
+
+    def reset(self):
+        self._session.cookies.clear()
+
+    def get(self, path):
+        return self._session.get(self._base + path, headers=self.headers, allow_redirects=False).status_code
+
+    def post(self, path, data):
+        return self._session.post(self._base + path, data=data, allow_redirects=False).status_code
+
+    def close(self):
+        self._server.shutdown()
+
+
+TRANSPORTS = {'client': TestClientTransport, 'wsgi': WSGIServerTransport}
+
+
+# ------------------------------------------------------
+# 2. SCENARIOS
+# ------------------------------------------------------
+
+def _login(transport, user_index=0):
+    status = transport.post('/auth/login', {'email': bench_email(user_index), 'password': BENCH_PASSWORD})
+    if status != 302:
+        raise RuntimeError(f"Benchmark login failed with HTTP {status}")
+
+
+def build_scenarios(app, counts, rng):
+    """{name: (setup(transport), request(transport) -> status)}."""
+    from app.models import User
+    from app.blueprints.downloader.routes import download_tasks
+
+    def setup_logged_in(transport):
+        _login(transport)
+
+    def login_once(transport):
+        transport.reset()  # Logged-in clients are redirected before the password check
+        return transport.post('/auth/login', {'email': bench_email(rng.randrange(counts['users'])),
+                                              'password': BENCH_PASSWORD})
+
+    def setup_download_status(transport):
+        _login(transport)
+        with app.app_context():
+            user_id = User.query.filter_by(email=bench_email(0)).first().id
+        task_key = f"benchvideo_best_mp4_{user_id}"
+        download_tasks[task_key] = {'progress': 42, 'status': 'downloading', 'speed_str': '2.00MiB/s',
+                                    'filepath': None, 'title': 'bench', 'batch_id': None}
+        transport.task_key = task_key
+
+    def setup_api_token(transport):
+        with app.test_request_context():
+            token = User.query.filter_by(email=bench_email(0)).first().get_api_token()
+        transport.headers = {'Authorization': f"Bearer {token}"}
+
+    return {
+        'redirect_to_url': (None, lambda t: t.get(f"/links/{short_code(rng.randrange(counts['links']))}")),
+        'blog_index': (None, lambda t: t.get('/blog/')),
+        'blog_search': (None, lambda t: t.get(f"/blog/?search={rng.choice(['flask', 'video', 'nomatch'])}")),
+        'tasks_index': (setup_logged_in, lambda t: t.get('/tasks/')),
+        'login': (None, login_once),
+        'download_status': (setup_download_status, lambda t: t.get(f"/downloader/status/{t.task_key}")),
+        'links_index': (setup_logged_in, lambda t: t.get('/links/')),
+        'api_posts': (setup_api_token, lambda t: t.get('/api/v1/posts')),
+        'api_tasks': (setup_api_token, lambda t: t.get('/api/v1/tasks?limit=200')),
+        'api_links': (setup_api_token, lambda t: t.get('/api/v1/links?limit=200')),
+    }
+
+
+# ------------------------------------------------------
+# 3. RUNNER
+# ------------------------------------------------------
+
+class QueryCounter:
+    """Counts SQL statements executed by the app's engine."""
+
+    def __init__(self, engine):
+        self.count = 0
+        self._lock = threading.Lock()
+        event.listen(engine, 'after_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        with self._lock:
+            self.count += 1
+
+
+def _percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(app, transport_cls, setup, send, requests_count, queries, warmup=5):
+    transport = transport_cls(app)
+    try:
+        if setup:
+            setup(transport)
+        for _ in range(min(warmup, requests_count)):
+            send(transport)
+
+        timings, errors = [], 0
+        queries_before = queries.count
+        started = time.perf_counter()
+        for _ in range(requests_count):
+            t0 = time.perf_counter()
+            status = send(transport)
+            timings.append(time.perf_counter() - t0)
+            if status >= 400:
+                errors += 1
+        elapsed = time.perf_counter() - started
+        total_queries = queries.count - queries_before
+    finally:
+        transport.close()
+
+    timings.sort()
+    return {
+        'requests': requests_count,
+        'errors': errors,
+        'p50_ms': round(_percentile(timings, 50) * 1000, 3),
+        'p95_ms': round(_percentile(timings, 95) * 1000, 3),
+        'p99_ms': round(_percentile(timings, 99) * 1000, 3),
+        'mean_ms': round(mean(timings) * 1000, 3),
+        'req_per_sec': round(requests_count / elapsed, 2),
+        'queries_per_request': round(total_queries / requests_count, 2),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def run(scale=1.0, transport='client', scenarios=None, requests_override=None, seed_value=1):
+    app = make_app()
+    counts = seed(app, scale, seed_value)
+    rng = random.Random(seed_value)
+
+    from app import db
+    with app.app_context():
+        queries = QueryCounter(db.engine)
+
+    available = build_scenarios(app, counts, rng)
+    selected = scenarios or list(available)
+    results = {}
+    for name in selected:
+        setup, send = available[name]
+        requests_count = requests_override or DEFAULT_REQUESTS[name]
+        results[name] = run_scenario(app, TRANSPORTS[transport], setup, send, requests_count, queries)
+        print(f"{name:18} p50 {results[name]['p50_ms']:>9} ms  p99 {results[name]['p99_ms']:>9} ms  "
+              f"{results[name]['req_per_sec']:>9} req/s  {results[name]['queries_per_request']:>6} q/req",
+              file=sys.stderr)
+
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'database': database_url().split('://', 1)[0],
+            'scale': scale,
+            'rows': counts,
+            'transport': transport,
+        },
+        'scenarios': results,
+    }
+
+
+def compare(base, current):
+    """Prints the relative change of each metric between two result files (positive = slower)."""
+    for name, result in current['scenarios'].items():
+        before = base['scenarios'].get(name)
+        if not before:
+            continue
+        deltas = []
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request'):
+            if before[metric]:
+                deltas.append(f"{metric} {100 * (result[metric] - before[metric]) / before[metric]:+.1f}%")
+        print(f"{name:18} " + '  '.join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, default=1.0, help='dataset size (see benchmarks.seed)')
+    parser.add_argument('--transport', choices=sorted(TRANSPORTS), default='client')
+    parser.add_argument('--scenario', action='append', choices=sorted(DEFAULT_REQUESTS),
+                        help='run only this scenario (repeatable)')
+    parser.add_argument('--requests', type=int, help='requests per scenario (default: per-scenario)')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/<commit>-<time>.json)')
+    parser.add_argument('--compare', help='earlier result file to diff against')
+    args = parser.parse_args()
+
+    result = run(args.scale, args.transport, args.scenario, args.requests)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"{result['meta']['commit']}-{stamp}.json")
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+# benchmarks/bench_startup.py
+"""
+Worker boot time: how long a fresh interpreter takes to import the app package
+and run create_app(), i.e. what every gunicorn worker pays on a cold start or
+rolling restart. Each run is a new process (nothing is warm in sys.modules);
+one extra run under '-X importtime' attributes the import time per module.
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 20 --top 30 --budget 1.0
+"""
+
+import os
+import sys
+import json
+import argparse
+import datetime
+import platform
+import subprocess
+import tempfile
+from statistics import median
+
+from benchmarks.bench_routes import RESULTS_DIR, _git_commit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BOOT_SCRIPT = """
+import json, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+app.create_app()
+t2 = time.perf_counter()
+print(json.dumps({'import_s': t1 - t0, 'create_app_s': t2 - t1}))
+"""
+
+
+def _env():
+    env = dict(os.environ)
+    # Boot must not need a database; point at a file that is never created
+    env.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'hub-startup.db'))
+    return env
+
+
+def boot_once(importtime=False):
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', BOOT_SCRIPT]
+    result = subprocess.run(command, cwd=ROOT, env=_env(), capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Boot failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def parse_importtime(stderr):
+    """[(module, self_us, cumulative_us)] from '-X importtime' output."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def _top(modules, key, count):
+    return [{'module': name, 'self_ms': round(self_us / 1000, 2), 'cumulative_ms': round(cum_us / 1000, 2)}
+            for name, self_us, cum_us in sorted(modules, key=key, reverse=True)[:count]]
+
+
+def run(runs=10, top=20):
+    boot_once()  # Compiles .pyc files so every measured run starts from the same state
+    samples = [boot_once()[0] for _ in range(runs)]
+    totals = [s['import_s'] + s['create_app_s'] for s in samples]
+
+    modules = parse_importtime(boot_once(importtime=True)[1])
+    own = [m for m in modules if m[0] == 'app' or m[0].startswith('app.')]
+    top_level = [m for m in modules if '.' not in m[0]]
+
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'runs': runs,
+        },
+        'boot': {
+            'import_ms': round(median(s['import_s'] for s in samples) * 1000, 1),
+            'create_app_ms': round(median(s['create_app_s'] for s in samples) * 1000, 1),
+            'total_ms': round(median(totals) * 1000, 1),
+            'total_max_ms': round(max(totals) * 1000, 1),
+        },
+        'modules_imported': len(modules),
+        # Cumulative time of each top-level package (third-party cost at a glance)
+        'packages': _top(top_level, lambda m: m[2], top),
+        # The app's own modules, and the single most expensive modules overall
+        'app_modules': _top(own, lambda m: m[2], top),
+        'slowest_self': _top(modules, lambda m: m[1], top),
+    }
+
+
+def _print_table(title, rows):
+    print(f"\n{title}", file=sys.stderr)
+    for row in rows:
+        print(f"  {row['module']:45} self {row['self_ms']:>8} ms  cumulative {row['cumulative_ms']:>8} ms",
+              file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10, help='fresh interpreters to time (median is reported)')
+    parser.add_argument('--top', type=int, default=20, help='modules listed per table')
+    parser.add_argument('--budget', type=float, help='fail (exit 1) if the median boot exceeds this many seconds')
+    parser.add_argument('--output', help='result file (default: benchmarks/results/startup-<commit>-<time>.json)')
+    args = parser.parse_args()
+
+    result = run(args.runs, args.top)
+    boot = result['boot']
+    print(f"import {boot['import_ms']} ms + create_app {boot['create_app_ms']} ms = {boot['total_ms']} ms "
+          f"(median of {args.runs}, max {boot['total_max_ms']} ms, {result['modules_imported']} modules)",
+          file=sys.stderr)
+    _print_table('Top-level packages (cumulative):', result['packages'])
+    _print_table('App modules (cumulative):', result['app_modules'])
+    _print_table('Slowest modules (self):', result['slowest_self'])
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"startup-{result['meta']['commit']}-{stamp}.json")
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.budget is not None and boot['total_ms'] > args.budget * 1000:
+        print(f"Boot time {boot['total_ms']} ms exceeds the {args.budget}s budget", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
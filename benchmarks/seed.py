@@ -0,0 +1,132 @@
+# benchmarks/seed.py
+"""
+Seeds a dedicated benchmark database with realistic volumes. Scale 1.0 is
+10k users, 100k posts, 1M short links and 200k tasks; the data is
+deterministic for a given --seed, so runs on different commits compare.
+
+    python -m benchmarks.seed --scale 0.1
+    BENCH_DATABASE_URL=postgresql://... python -m benchmarks.seed
+"""
+
+import os
+import random
+import argparse
+import datetime
+import tempfile
+from sqlalchemy import insert, func, select
+
+# Row counts at --scale 1.0
+VOLUMES = {'users': 10_000, 'posts': 100_000, 'links': 1_000_000, 'tasks': 200_000}
+BATCH_SIZE = 10_000
+BENCH_PASSWORD = 'bench-password'
+
+WORDS = (
+    'flask python video download link blog task profile cache query index async '
+    'worker storage metrics latency stream upload avatar release deploy review'
+).split()
+
+
+def database_url():
+    return os.environ.get('BENCH_DATABASE_URL',
+                          'sqlite:///' + os.path.join(tempfile.gettempdir(), 'hub-bench.db'))
+
+
+def make_app(**config):
+    """The real app factory, pointed at the benchmark database with quiet defaults."""
+    os.environ['DATABASE_URL'] = database_url()
+    # Benchmarks hammer login from one IP; the limiter would turn them into 429s
+    for scope in ('LOGIN', 'RESET'):
+        os.environ.setdefault(f'RATELIMIT_{scope}_PER_IP', '1000000000/1')
+        os.environ.setdefault(f'RATELIMIT_{scope}_PER_EMAIL', '1000000000/1')
+    os.environ.setdefault('DOWNLOAD_RESUME_ON_STARTUP', 'false')
+
+    from app import create_app
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    app.config.update(config)
+    return app
+
+
+def bench_email(index):
+    return f"bench{index}@example.com"
+
+
+def _sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def _insert_batches(db, table, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            db.session.execute(insert(table), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(table), batch)
+    db.session.commit()
+
+
+def seed(app, scale=1.0, seed_value=1):
+    """Creates the schema and inserts the dataset (skipped if it is already there). Returns row counts."""
+    from app import db, hasher
+    from app.models import User, Post, Task, ShortLink
+
+    counts = {name: max(1, int(volume * scale)) for name, volume in VOLUMES.items()}
+    rng = random.Random(seed_value)
+    start = datetime.datetime(2024, 1, 1)
+
+    with app.app_context():
+        db.create_all()
+        if db.session.scalar(select(func.count()).select_from(User)) >= counts['users']:
+            return counts
+
+        # One real hash (configured work factor) shared by every bench user
+        password_hash = hasher.hash(BENCH_PASSWORD)
+        users = counts['users']
+
+        _insert_batches(db, User.__table__, (
+            {'username': f"bench{i}", 'email': bench_email(i), 'password_hash': password_hash,
+             'image_file': 'default.jpg', 'country': 'IN', 'state': 'KA'}
+            for i in range(users)
+        ))
+        first_user = db.session.scalar(select(func.min(User.id)))
+
+        _insert_batches(db, Post.__table__, (
+            {'title': _sentence(rng, 5)[:100], 'content': _sentence(rng, 60),
+             'date_posted': start + datetime.timedelta(minutes=i), 'user_id': first_user + rng.randrange(users)}
+            for i in range(counts['posts'])
+        ))
+        _insert_batches(db, Task.__table__, (
+            {'title': _sentence(rng, 4)[:100], 'content': _sentence(rng, 20), 'completed': rng.random() < 0.5,
+             'date_posted': start + datetime.timedelta(minutes=i), 'user_id': first_user + rng.randrange(users)}
+            for i in range(counts['tasks'])
+        ))
+        _insert_batches(db, ShortLink.__table__, (
+            {'url': f"https://example.com/{_sentence(rng, 3).replace(' ', '/')}?i={i}",
+             'short_url': short_code(i), 'clicks': 0,
+             'date_created': start + datetime.timedelta(seconds=i), 'user_id': first_user + rng.randrange(users)}
+            for i in range(counts['links'])
+        ))
+    return counts
+
+
+def short_code(index):
+    """Deterministic, unique 7-character codes (real ones are 6, so they never collide)."""
+    return f"b{index:06x}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=float, default=1.0, help='fraction of the full dataset')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    counts = seed(make_app(), args.scale, args.seed)
+    print(f"Seeded {database_url()}:")
+    for name, count in counts.items():
+        print(f"  {name:8} {count}")
+
+
+if __name__ == '__main__':
+    main()
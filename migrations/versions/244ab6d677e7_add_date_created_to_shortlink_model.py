@@ -1,7 +1,7 @@
 """Add date_created to ShortLink model
 
 Revision ID: 244ab6d677e7
-Revises: 
+Revises: 1a0c3d9e2b47
 Create Date: 2025-10-24 22:07:12.456769
 
 """
@@ -11,7 +11,7 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision = '244ab6d677e7'
-down_revision = None
+down_revision = '1a0c3d9e2b47'
 branch_labels = None
 depends_on = None
 